@@ -0,0 +1,255 @@
+from __future__ import print_function
+
+# Python 3 only : imported by ingestengine when the asyncio engine is selected
+
+import asyncio
+import collections
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ingestengine
+import partitioning
+
+DEFAULT_IN_FLIGHT = 4
+
+
+def run_batches(connection, cursor, statement, batches, commit):
+    finished = []
+    for rows in batches:
+        cursor.executemany(statement, rows)
+        finished.append(time.time())
+    commit_time = None
+    if commit:
+        start = time.time()
+        connection.commit()
+        commit_time = time.time() - start
+    return finished, commit_time
+
+
+class ExecutorConnection(object):
+    # A blocking DB-API connection (sqlite3, cx_Oracle, oracledb thick) driven from the event loop through
+    # a thread of its own. Calls on the connection stay serialized, and a group of batches costs one hop
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def call(self, function, *args):
+        return self.loop.run_in_executor(self.executor, function, *args)
+
+    async def open(self, username, password, connect_string, async_commit):
+        self.connection = await self.call(ingestengine.connect, username, password, connect_string)
+        if async_commit:
+            await self.call(ingestengine.set_async_commit, self.connection, connect_string)
+        self.cursor = await self.call(self.connection.cursor)
+
+    async def run(self, statement, batches, commit):
+        return await self.call(run_batches, self.connection, self.cursor, statement, batches, commit)
+
+    async def close(self):
+        await self.call(self.connection.close)
+        self.executor.shutdown()
+
+
+class OracleAsyncConnection(object):
+    # python-oracledb's native asyncio connection. Where the driver supports pipelining a group of batches
+    # and its commit go to the database in one round trip, otherwise they are awaited one after another
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pipelined = hasattr(driver, "create_pipeline")
+
+    async def open(self, username, password, connect_string, async_commit):
+        self.connection = await self.driver.connect_async(user=username, password=password, dsn=connect_string)
+        self.cursor = self.connection.cursor()
+        if async_commit:
+            for statement in ingestengine.ASYNC_COMMIT_STATEMENTS:
+                await self.cursor.execute(statement)
+
+    async def run(self, statement, batches, commit):
+        if self.pipelined:
+            pipeline = self.driver.create_pipeline()
+            for rows in batches:
+                pipeline.add_executemany(statement, rows)
+            if commit:
+                pipeline.add_commit()
+            await self.connection.run_pipeline(pipeline)
+            # The commit travels with the batches, so it has no latency of its own to record
+            return [time.time()] * len(batches), None
+        finished = []
+        for rows in batches:
+            await self.cursor.executemany(statement, rows)
+            finished.append(time.time())
+        commit_time = None
+        if commit:
+            start = time.time()
+            await self.connection.commit()
+            commit_time = time.time() - start
+        return finished, commit_time
+
+    async def close(self):
+        await self.connection.close()
+
+
+def open_connection(loop, connect_string):
+    if not connect_string.startswith(ingestengine.SQLITE_PREFIX):
+        driver = ingestengine.get_driver(connect_string)
+        if hasattr(driver, "connect_async"):
+            return OracleAsyncConnection(driver)
+    return ExecutorConnection(loop)
+
+
+class ConnectionWorker(object):
+    # Serves the producers assigned to one connection. Up to in_flight batches are outstanding on the connection
+    # whatever the number of producers : they queue up as producers submit them and are sent together, with a
+    # commit added once commit_size rows are uncommitted
+
+    def __init__(self, loop, connection, statement, commit_size, in_flight, counters, histograms, worker):
+        self.loop = loop
+        self.connection = connection
+        self.statement = statement
+        self.commit_size = commit_size
+        self.in_flight = in_flight
+        self.counters = counters
+        self.histograms = histograms
+        self.worker = worker
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(in_flight)
+        self.error = None
+        self.uncommitted = 0
+        self.producers = 0
+
+    async def submit(self, rows):
+        # Returns once the batch is queued, with a future done when it has been inserted. A producer only waits
+        # here while the connection already has in_flight batches outstanding
+        await self.slots.acquire()
+        if self.error is not None:
+            self.slots.release()
+            raise self.error
+        future = self.loop.create_future()
+        await self.queue.put((rows, time.time(), future))
+        return future
+
+    async def producer_finished(self):
+        # The last producer to finish ends the connection's work, committing what is left straight away
+        # rather than holding its transaction open until every other connection is done too
+        self.producers -= 1
+        if self.producers == 0:
+            await self.queue.put(None)
+
+    async def serve(self, start):
+        finished = False
+        while not finished:
+            group = [await self.queue.get()]
+            while len(group) < self.in_flight and not self.queue.empty():
+                group.append(self.queue.get_nowait())
+            if group[-1] is None:
+                finished = True
+                group.pop()
+            rows = sum(len(item[0]) for item in group)
+            commit = self.uncommitted + rows >= self.commit_size or (finished and self.uncommitted + rows > 0)
+            if not group and not commit:
+                break
+            sent = time.time()
+            try:
+                completions, commit_time = await self.connection.run(self.statement, [item[0] for item in group], commit)
+            except Exception as e:
+                # Producers waiting for a slot give up too rather than waiting on a connection that has stopped
+                self.error = e
+                for item in group:
+                    item[2].set_exception(e)
+                    self.slots.release()
+                raise
+            for (batch, submitted, future), completed in zip(group, completions):
+                # Queue wait is time spent behind other producers' batches on this connection
+                self.histograms.record(self.worker, ingestengine.QUEUE_LATENCY, sent - submitted)
+                self.histograms.record(self.worker, ingestengine.BATCH_LATENCY, completed - sent)
+                future.set_result(None)
+                self.slots.release()
+            if commit_time is not None:
+                self.histograms.record(self.worker, ingestengine.COMMIT_LATENCY, commit_time)
+            self.uncommitted = 0 if commit else self.uncommitted + rows
+            self.counters.add(self.worker, ingestengine.ROWS, rows)
+            self.counters.add(self.worker, ingestengine.BATCHES, len(group))
+            self.counters.set(self.worker, ingestengine.INSERTION_TIME, time.time() - start)
+
+
+async def produce(connection_worker, generate_rows, rng, first_key, row_count, batch_size, image_multiplier, stop):
+    # A logical producer : generates batches and hands them to its connection, going on to the next batch while
+    # earlier ones are still being inserted. A connection completes batches in order, so done ones are at the front
+    rows_inserted = 0
+    pending = collections.deque()
+    while rows_inserted < row_count and not stop.is_set():
+        rows = generate_rows(rng, first_key + rows_inserted, min(batch_size, row_count - rows_inserted), image_multiplier)
+        pending.append(await connection_worker.submit(rows))
+        rows_inserted += len(rows)
+        while pending and pending[0].done():
+            pending.popleft().result()
+    for future in pending:
+        await future
+    await connection_worker.producer_finished()
+
+
+async def ingest(loop, username, password, connect_string, test_type, process, row_count, batch_size, commit_size, connection_count, async_commit, image_multiplier, counters, histograms, stop,
+                 table_generator, dataset, producers, in_flight, key_offset, go, document_encoding, routing, worker_count):
+    table_name, columns = ingestengine.target_table(test_type, document_encoding)
+    statement = ingestengine.insert_statement(ingestengine.get_driver(connect_string), table_name, columns)
+    # One row source for the whole process, thousands of producers each mapping the dataset would be wasteful.
+    # With affinity the process's producers share its partitions
+    router = None
+    if routing not in (None, partitioning.DEFAULT_ROUTING):
+        router = partitioning.Router(test_type, routing, process, worker_count // connection_count)
+    generate_rows, rng = ingestengine.row_source(test_type, table_generator, dataset, document_encoding, histograms, process * connection_count, router)
+
+    connection_workers = []
+    for number in range(connection_count):
+        worker = process * connection_count + number
+        start = time.time()
+        connection = open_connection(loop, connect_string)
+        await connection.open(username, password, connect_string, async_commit)
+        counters.set(worker, ingestengine.CONNECTION_TIME, time.time() - start)
+        histograms.record(worker, ingestengine.CONNECT_LATENCY, time.time() - start)
+        connection_workers.append(ConnectionWorker(loop, connection, statement, commit_size, in_flight, counters, histograms, worker))
+    if test_type in ingestengine.DOCUMENT_TYPES:
+        # Binary documents are encoded on the loop by the first connection's driver
+        generate_rows.use_connection(connection_workers[0].connection.connection)
+    try:
+        for connection_worker in connection_workers:
+            counters.set(connection_worker.worker, ingestengine.READY, 1)
+        if go is not None:
+            # Nothing else runs on the loop yet, so waiting at the barrier can block it
+            go.wait()
+        start = time.time()
+        servers = [loop.create_task(connection_worker.serve(start)) for connection_worker in connection_workers]
+        rows_per_producer = row_count // producers
+        tasks = []
+        for producer in range(producers):
+            producer_rows = rows_per_producer + (row_count % producers if producer == producers - 1 else 0)
+            first_key = key_offset + process * row_count + producer * rows_per_producer + 1
+            connection_workers[producer % connection_count].producers += 1
+            tasks.append(produce(connection_workers[producer % connection_count], generate_rows, rng, first_key, producer_rows, batch_size, image_multiplier, stop))
+        for connection_worker in connection_workers:
+            if connection_worker.producers == 0:
+                await connection_worker.queue.put(None)
+        await asyncio.gather(*(tasks + servers))
+    finally:
+        for connection_worker in connection_workers:
+            await connection_worker.connection.close()
+
+
+def run_process(username, password, connect_string, test_type, process, row_count, batch_size, commit_size, thread_count, async_commit, image_multiplier, counters, histograms, stop,
+                table_generator=None, dataset=None, producers=None, in_flight=DEFAULT_IN_FLIGHT, key_offset=0, go=None, document_encoding=None,
+                routing=None, worker_count=None):
+    # Same shape as ingestengine.run_process, but thread_count connections are shared by producers logical
+    # producers on one event loop instead of one thread per connection
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(ingest(loop, username, password, connect_string, test_type, process, row_count, batch_size, commit_size, thread_count, async_commit, image_multiplier, counters, histograms, stop,
+                                       table_generator, dataset, producers or thread_count, in_flight, key_offset, go, document_encoding,
+                                       routing, worker_count or thread_count))
+    except Exception:
+        logging.exception("Worker process {} failed".format(process))
+        counters.add(process * thread_count, ingestengine.FAILURES, 1)
+    finally:
+        loop.close()
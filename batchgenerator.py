@@ -0,0 +1,231 @@
+from __future__ import print_function
+
+import logging
+import string
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+NS = "{http://www.domincgiles.com/datagen}"
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+CHARACTER_CLASSES = {
+    "Uppercase Alpha Numeric": string.ascii_uppercase + string.digits,
+    "Lowercase Alpha Numeric": string.ascii_lowercase + string.digits,
+    "Alpha Numeric": string.ascii_letters + string.digits,
+    "Uppercase Alpha": string.ascii_uppercase,
+    "Lowercase Alpha": string.ascii_lowercase,
+    "Alpha": string.ascii_letters,
+    "Numeric": string.digits,
+}
+
+
+def child_text(element, name, default=None):
+    child = element.find(NS + name)
+    if child is None or child.text is None:
+        return default
+    return child.text
+
+
+def child_bool(element, name):
+    return child_text(element, name, "false").strip().lower() == "true"
+
+
+def child_number(element, name, default=0):
+    text = child_text(element, name)
+    if text is None:
+        return default
+    return float(text) if "." in text else int(text)
+
+
+class ColumnGenerator(object):
+    # Base for the datagenerator element types. Each subclass's generate(rng, first_key, count, columns) returns
+    # a NumPy array of count values
+
+    def __init__(self, element):
+        self.id = child_text(element, "id")
+        self.percentage_null = float(child_text(element, "PercentageNull", "0"))
+        self.prefix = child_text(element, "prefix", "")
+        self.postfix = child_text(element, "postfix", "")
+
+    def null_mask(self, rng, count):
+        if self.percentage_null <= 0:
+            return None
+        return rng.random_sample(count) * 100 < self.percentage_null
+
+
+class NumberGenerator(ColumnGenerator):
+
+    def __init__(self, element):
+        super(NumberGenerator, self).__init__(element)
+        self.start = child_number(element, "Start")
+        self.end = child_number(element, "End")
+        self.ordered = child_bool(element, "OrderedSequence")
+        self.normal = child_bool(element, "NormalDistribution")
+        self.is_float = isinstance(self.start, float) or isinstance(self.end, float)
+
+    def generate(self, rng, first_key, count, columns):
+        if self.ordered:
+            return np.arange(first_key, first_key + count, dtype=np.int64)
+        if self.normal:
+            values = rng.normal((self.start + self.end) / 2.0, (self.end - self.start) / 6.0, count)
+            values = np.clip(values, self.start, self.end)
+            return values if self.is_float else np.rint(values).astype(np.int64)
+        if self.is_float:
+            return rng.uniform(self.start, self.end, count)
+        return rng.randint(self.start, self.end + 1, count, dtype=np.int64)
+
+
+class DateGenerator(ColumnGenerator):
+
+    def __init__(self, element):
+        super(DateGenerator, self).__init__(element)
+        self.start = np.datetime64(datetime.strptime(child_text(element, "Start"), DATE_FORMAT), "us")
+        self.end = np.datetime64(datetime.strptime(child_text(element, "End"), DATE_FORMAT), "us")
+
+    def generate(self, rng, first_key, count, columns):
+        seconds = int((self.end - self.start) / np.timedelta64(1, "s"))
+        return self.start + rng.randint(0, seconds, count, dtype=np.int64).astype("timedelta64[s]")
+
+
+class EnumerationGenerator(ColumnGenerator):
+    # Repeated entries in EnumerationValues act as weights, Min/MaximumRepetitions repeat the chosen value
+
+    def __init__(self, element):
+        super(EnumerationGenerator, self).__init__(element)
+        values = child_text(element, "EnumerationValues", "").split(",")
+        self.values, counts = np.unique(np.array(values), return_counts=True)
+        self.weights = counts / float(counts.sum())
+        self.normal = child_bool(element, "NormalDistribution")
+        self.set_repetitions(child_number(element, "MinimumRepetitions", 1), child_number(element, "MaximumRepetitions", 1))
+
+    def set_repetitions(self, minimum, maximum):
+        self.minimum_repetitions = int(minimum)
+        self.maximum_repetitions = int(maximum)
+        # Precompute every repeated form so a batch is a single gather
+        self.repeated = [np.array([value * repetitions for value in self.values.tolist()])
+                         for repetitions in range(self.minimum_repetitions, self.maximum_repetitions + 1)]
+
+    def generate(self, rng, first_key, count, columns):
+        if self.normal:
+            indexes = np.clip(np.rint(rng.normal((len(self.values) - 1) / 2.0, len(self.values) / 6.0, count)), 0, len(self.values) - 1).astype(np.int64)
+        else:
+            indexes = rng.choice(len(self.values), count, p=self.weights)
+        if len(self.repeated) == 1:
+            return self.repeated[0][indexes]
+        repetitions = rng.randint(0, len(self.repeated), count)
+        values = np.empty(count, dtype=object)
+        for offset, repeated in enumerate(self.repeated):
+            selected = repetitions == offset
+            values[selected] = repeated[indexes[selected]]
+        return values
+
+
+class CharacterGenerator(ColumnGenerator):
+
+    def __init__(self, element):
+        super(CharacterGenerator, self).__init__(element)
+        character_class = child_text(element, "CharacterClass", "Alpha Numeric")
+        self.characters = np.frombuffer(CHARACTER_CLASSES[character_class].encode("ascii"), dtype=np.uint8)
+        self.minimum_size = int(child_number(element, "MinimumSize", 1))
+        self.maximum_size = int(child_number(element, "MaximumSize", self.minimum_size))
+
+    def generate(self, rng, first_key, count, columns):
+        codes = self.characters[rng.randint(0, len(self.characters), (count, self.maximum_size))]
+        values = np.ascontiguousarray(codes).view("S{}".format(self.maximum_size)).ravel().astype("U{}".format(self.maximum_size))
+        if self.minimum_size == self.maximum_size:
+            return values
+        sizes = rng.randint(self.minimum_size, self.maximum_size + 1, count)
+        return np.array([value[:size] for value, size in zip(values.tolist(), sizes.tolist())])
+
+
+class RepeatGenerator(ColumnGenerator):
+    # Reuses the value of another column in the same row
+
+    def __init__(self, element):
+        super(RepeatGenerator, self).__init__(element)
+        self.repeat_column = child_text(element, "RepeatColumn").upper()
+
+    def generate(self, rng, first_key, count, columns):
+        return columns[self.repeat_column]
+
+
+GENERATORS = {
+    "NumberGenerator": NumberGenerator,
+    "DateGenerator": DateGenerator,
+    "EnumerationGenerator": EnumerationGenerator,
+    "CharacterGenerator": CharacterGenerator,
+    "RepeatGenerator": RepeatGenerator,
+}
+
+
+def as_text(values):
+    if values.dtype.kind == "M":
+        return np.datetime_as_string(values, unit="s")
+    return values.astype("U")
+
+
+class Column(object):
+
+    def __init__(self, element):
+        self.name = child_text(element, "ColumnName").upper()
+        self.generators = []
+        for data_generator in element.iter(NS + "DataGenerator"):
+            for generator_element in data_generator:
+                generator_type = generator_element.tag.replace(NS, "")
+                if generator_type not in GENERATORS:
+                    raise ValueError("Column {} uses unsupported generator {}".format(self.name, generator_type))
+                self.generators.append(GENERATORS[generator_type](generator_element))
+
+    def generate(self, rng, first_key, count, columns):
+        if len(self.generators) == 1 and not (self.generators[0].prefix or self.generators[0].postfix):
+            generator = self.generators[0]
+            return apply_nulls(generator.generate(rng, first_key, count, columns), generator.null_mask(rng, count))
+        # Several generators (or a prefix/postfix) build a single string column, e.g. the JSON document
+        values = np.zeros(count, dtype="U1")
+        for generator in self.generators:
+            part = as_text(generator.generate(rng, first_key, count, columns))
+            nulls = generator.null_mask(rng, count)
+            if nulls is not None:
+                part = np.where(nulls, "", part)
+            values = np.char.add(np.char.add(np.char.add(values, generator.prefix), part), generator.postfix)
+        return values
+
+
+def apply_nulls(values, nulls):
+    if nulls is None:
+        return values
+    values = values.astype(object)
+    values[nulls] = None
+    return values
+
+
+class TableGenerator(object):
+    # A compiled datagenerator config : parse once, then produce whole batches as columns of NumPy arrays
+
+    def __init__(self, root):
+        table = root.find(NS + "Table")
+        self.table_name = child_text(table, "TableName").upper()
+        self.row_count = int(table.get("RowCount"))
+        self.columns = [Column(column) for column in table.iter(NS + "Column")]
+        self.column_names = [column.name for column in self.columns]
+        logging.debug("Compiled {} with columns {}".format(self.table_name, self.column_names))
+
+    @classmethod
+    def from_file(cls, config_file):
+        return cls(ET.ElementTree(file=config_file).getroot())
+
+    def generate_batch(self, rng, first_key, count):
+        columns = {}
+        for column in self.columns:
+            columns[column.name] = column.generate(rng, first_key, count, columns)
+        return [columns[name] for name in self.column_names]
+
+
+def new_rng():
+    return np.random.RandomState()
+
+
+def batch_to_rows(batch):
+    return list(zip(*[column.tolist() for column in batch]))
@@ -8,6 +8,7 @@ connect anpr/anpr@//ora122server/soe;
 
 TRUNCATE TABLE ANPR_RELATIONAL reuse storage;
 TRUNCATE TABLE ANPR_COLLECTION reuse storage;
+TRUNCATE TABLE ANPR_COLLECTION_OSON reuse storage;
 TRUNCATE TABLE SIMPLETABLE reuse storage;
 TRUNCATE TABLE INSERTABLE reuse storage;
 
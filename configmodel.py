@@ -0,0 +1,103 @@
+from __future__ import print_function
+
+import copy
+import hashlib
+import logging
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+NS = "{http://www.domincgiles.com/datagen}"
+CACHE_DIRECTORY = "config_cache"
+TABLE_ATTRIBUTES = ["RowCount"]
+
+ET.register_namespace("", NS[1:-1])
+
+
+def parse_overrides(overrides):
+    # ["IMAGE_GENERATOR.MinimumRepetitions=5", "ANPR_ID.End=50000"] -> [(target, parameter, value), ...]. One override
+    # per string, so values may contain commas (e.g. EnumerationValues)
+    parsed = []
+    for override in overrides or []:
+        if "=" not in override:
+            raise ValueError("Generator parameter override {} is not of the form [target.]parameter=value".format(override))
+        name, value = override.split("=", 1)
+        target, _, parameter = name.strip().rpartition(".")
+        parsed.append((target or None, parameter, value.strip()))
+    return parsed
+
+
+def image_overrides(image_multiplier):
+    return [("IMAGE_GENERATOR", "MinimumRepetitions", str(image_multiplier)),
+            ("IMAGE_GENERATOR", "MaximumRepetitions", str(image_multiplier))]
+
+
+def matching_generators(root, target):
+    # Generators addressed by their id or by the name of the column they populate. Ids are not unique
+    # in the shipped configs, so an id can match several generators
+    for column in root.iter(NS + "Column"):
+        column_name = column.findtext(NS + "ColumnName", "")
+        for data_generator in column.iter(NS + "DataGenerator"):
+            for generator in data_generator:
+                if generator.findtext(NS + "id") == target or column_name.upper() == target.upper():
+                    yield column_name, generator
+
+
+class ConfigModel(object):
+    # A datagenerator config parsed once. Variants apply overrides to a copy of the tree, and materialized
+    # variants are written to files named by a hash of their content so identical variants are shared
+    # across test points, runs and concurrent sweeps instead of being rewritten
+
+    def __init__(self, config_file, overrides=None, cache_directory=None):
+        self.config_file = config_file
+        self.root = ET.ElementTree(file=config_file).getroot()
+        self.overrides = list(overrides or [])
+        self.cache_directory = cache_directory or os.path.join(os.path.dirname(os.path.realpath(config_file)), CACHE_DIRECTORY)
+        self.materialized = {}
+        # Fail on a bad override now rather than part way through a sweep
+        self.variant()
+
+    def apply(self, root, target, parameter, value):
+        if target is None and parameter in TABLE_ATTRIBUTES:
+            for table in root.iter(NS + "Table"):
+                table.set(parameter, value)
+            return
+        matched = False
+        for column_name, generator in matching_generators(root, target or ""):
+            element = generator.find(NS + parameter)
+            if element is None:
+                raise ValueError("Generator {} in column {} has no parameter {}".format(generator.findtext(NS + "id"), column_name, parameter))
+            element.text = value
+            matched = True
+        if not matched:
+            raise ValueError("No generator or column named {} in {}".format(target, self.config_file))
+
+    def variant(self, overrides=None):
+        root = copy.deepcopy(self.root)
+        for target, parameter, value in self.overrides + list(overrides or []):
+            self.apply(root, target, parameter, value)
+        return root
+
+    def materialize(self, overrides=None):
+        key = tuple(self.overrides + list(overrides or []))
+        if key in self.materialized:
+            return self.materialized[key]
+        content = ET.tostring(self.variant(overrides), encoding="UTF-8")
+        digest = hashlib.sha1(content).hexdigest()[:16]
+        name, extension = os.path.splitext(os.path.basename(self.config_file))
+        path = os.path.join(self.cache_directory, "{}-{}{}".format(name, digest, extension))
+        if not os.path.exists(path):
+            if not os.path.isdir(self.cache_directory):
+                try:
+                    os.makedirs(self.cache_directory)
+                except OSError:
+                    if not os.path.isdir(self.cache_directory):
+                        raise
+            # Write then rename so a concurrent sweep never reads a partial file
+            handle, temporary = tempfile.mkstemp(dir=self.cache_directory, suffix=extension)
+            with os.fdopen(handle, "wb") as temporary_file:
+                temporary_file.write(content)
+            os.rename(temporary, path)
+            logging.debug("Materialized config {}".format(path))
+        self.materialized[key] = path
+        return path
@@ -0,0 +1,140 @@
+from __future__ import print_function
+
+import logging
+import threading
+import time
+
+CONNECTION_MODES = ['dedicated', 'pooled']
+DEFAULT_CONNECTION_MODE = 'dedicated'
+
+# Each source's acquire() returns a connection and the seconds spent waiting for a busy pool to free one
+
+
+class DedicatedConnections(object):
+    # Every acquire opens a new physical connection and release closes it
+
+    def __init__(self, connect):
+        self.connect = connect
+
+    def acquire(self):
+        return self.connect(), 0.0
+
+    def release(self, connection):
+        connection.close()
+
+    def close(self):
+        pass
+
+
+class WarmConnections(DedicatedConnections):
+    # Connects when no connection is idle, and keeps released connections open for the next acquire
+    # (see workerpool.py). Anything a failed worker left uncommitted is rolled back on release
+
+    def __init__(self, connect):
+        DedicatedConnections.__init__(self, connect)
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), 0.0
+        return self.connect(), 0.0
+
+    def release(self, connection):
+        try:
+            connection.rollback()
+        except Exception:
+            logging.debug("Dropping a connection that failed to roll back", exc_info=True)
+            connection.close()
+            return
+        with self.lock:
+            self.idle.append(connection)
+
+    def close(self):
+        with self.lock:
+            for connection in self.idle:
+                connection.close()
+            self.idle = []
+
+
+class LocalPool(object):
+    # A session pool for drivers without one of their own (the SQLite stand-in). Opens minimum connections
+    # up front, grows by increment up to maximum, and makes callers wait once every connection is busy
+
+    def __init__(self, connect, minimum, maximum, increment):
+        self.connect = connect
+        self.maximum = maximum
+        self.increment = max(1, increment)
+        self.idle = [connect() for _ in range(minimum)]
+        self.opened = minimum
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        waited = 0.0
+        with self.condition:
+            while not self.idle and self.opened >= self.maximum:
+                start = time.time()
+                self.condition.wait()
+                waited += time.time() - start
+            if self.idle:
+                return self.idle.pop(), waited
+            grow = min(self.increment, self.maximum - self.opened)
+            self.opened += grow
+        # Connect outside the lock so other callers can take connections released meanwhile
+        try:
+            connections = [self.connect() for _ in range(grow)]
+        except Exception:
+            with self.condition:
+                self.opened -= grow
+                self.condition.notify_all()
+            raise
+        logging.debug("Pool grown by {} to {} connections".format(grow, self.opened))
+        with self.condition:
+            self.idle.extend(connections[1:])
+            self.condition.notify_all()
+        return connections[0], waited
+
+    def release(self, connection):
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            for connection in self.idle:
+                connection.close()
+            self.idle = []
+
+
+class DriverPool(object):
+    # The driver's own session pool (python-oracledb or cx_Oracle). The driver doesn't report how long an
+    # acquire waited, so an acquire that started with every session busy counts as waiting throughout
+
+    def __init__(self, driver, username, password, connect_string, minimum, maximum, increment):
+        if hasattr(driver, "create_pool"):
+            self.pool = driver.create_pool(user=username, password=password, dsn=connect_string, min=minimum, max=maximum, increment=increment, getmode=driver.POOL_GETMODE_WAIT)
+        else:
+            self.pool = driver.SessionPool(username, password, connect_string, min=minimum, max=maximum, increment=increment, threaded=True, getmode=driver.SPOOL_ATTRVAL_WAIT)
+
+    def acquire(self):
+        start = time.time()
+        exhausted = self.pool.busy >= self.pool.max
+        connection = self.pool.acquire()
+        return connection, time.time() - start if exhausted else 0.0
+
+    def release(self, connection):
+        self.pool.release(connection)
+
+    def close(self):
+        self.pool.close()
+
+
+def parse_pool_size(pool_size, thread_count):
+    # "minimum,maximum,increment", defaulting to a pool that grows one at a time to a session per thread
+    if not pool_size:
+        return 1, thread_count, 1
+    minimum, maximum, increment = [int(value) for value in pool_size.split(",")]
+    if not 0 <= minimum <= maximum or maximum < 1:
+        raise ValueError("Pool size {} needs 0 <= minimum <= maximum and maximum >= 1".format(pool_size))
+    return minimum, maximum, increment
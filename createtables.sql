@@ -6,6 +6,7 @@
 
 DROP TABLE ANPR_RELATIONAL PURGE;
 DROP TABLE ANPR_COLLECTION PURGE;
+DROP TABLE ANPR_COLLECTION_OSON PURGE;
 DROP TABLE SIMPLETABLE PURGE;
 DROP TABLE INSERTABLE PURGE;
 
@@ -60,6 +61,31 @@ INTERVAL (1000
     )
 );
 
+-- Documents in OSON (Oracle's binary JSON) as python-oracledb encodes them, for runtests.py -de binary
+
+CREATE TABLE anpr_collection_oson (
+  anprid          NUMBER(10) NOT NULL,
+  collection_time DATE       NOT NULL,
+  json_data       BLOB       NOT NULL
+)
+INITRANS 64
+STORAGE (INITIAL 1G NEXT 1G
+)
+LOB (json_data
+) STORE AS SECUREFILE (
+  CACHE READS
+  NOLOGGING
+)
+PARTITION BY RANGE (anprid
+)
+INTERVAL (1000
+)
+(
+  PARTITION part_01
+    VALUES LESS THAN (1000
+    )
+);
+
 
 CREATE TABLE SIMPLETABLE (
 COLUMN1		NUMBER(12)	NOT NULL,
@@ -97,4 +123,9 @@ CREATE INDEX anpr_r_idx
 DROP INDEX anpr_d_idx;
 
 CREATE INDEX anpr_d_idx
-  ON anpr_collection (anprid, collection_time);
\ No newline at end of file
+  ON anpr_collection (anprid, collection_time);
+
+DROP INDEX anpr_o_idx;
+
+CREATE INDEX anpr_o_idx
+  ON anpr_collection_oson (anprid, collection_time);
\ No newline at end of file
@@ -0,0 +1,222 @@
+from __future__ import print_function
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+import batchgenerator
+
+MAGIC = b"ORAINGESTDATA2\n"
+ALIGNMENT = 64
+BUILD_BATCH_SIZE = 10000
+# String columns of few distinct values (enumerations, the image), at most this many and fewer than half the
+# rows, are stored as uint32 codes into a dictionary of the values. Replay decodes the dictionary once, so a batch
+# is a gather of shared python strings rather than a decode of every row's bytes, and rows share one image
+DICTIONARY_LIMIT = 4096
+CODE_DTYPE = np.dtype("<u4")
+DEFAULT_SEED = 0
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), "dataset_cache")
+
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def column_layout(values):
+    # Storage dtype and width for one batch of a column. Strings are stored as fixed width bytes
+    present = [value for value in values.tolist() if value is not None] if values.dtype.kind == "O" else None
+    if values.dtype.kind == "O":
+        if present and all(isinstance(value, (int, np.integer)) for value in present):
+            return "int64", 0
+        if present and all(isinstance(value, (float, np.floating)) for value in present):
+            return "float64", 0
+        return "bytes", max([len(value.encode("utf-8")) for value in present] or [1])
+    if values.dtype.kind in "US":
+        return "bytes", max(1, np.char.encode(values.astype("U"), "utf-8").dtype.itemsize)
+    if values.dtype.kind == "M":
+        return "datetime64[us]", 0
+    if values.dtype.kind == "f":
+        return "float64", 0
+    return "int64", 0
+
+
+def storage_dtype(kind, width):
+    return np.dtype("S{}".format(width)) if kind == "bytes" else np.dtype(kind)
+
+
+def null_mask(values):
+    if values.dtype.kind != "O":
+        return None
+    return np.array([value is None for value in values.tolist()], dtype=bool)
+
+
+def distinct_values(values, known):
+    # known grown by the batch's distinct non null values, None once there are more than DICTIONARY_LIMIT
+    if known is None:
+        return None
+    known.update(value for value in values.tolist() if value is not None)
+    return known if len(known) <= DICTIONARY_LIMIT else None
+
+
+def stored_values(values, kind, width):
+    if values.dtype.kind == "O":
+        filled = [("" if kind == "bytes" else 0) if value is None else value for value in values.tolist()]
+        values = np.array(filled)
+    if kind == "bytes":
+        return np.char.encode(values.astype("U"), "utf-8").astype(storage_dtype(kind, width))
+    return values.astype(storage_dtype(kind, width))
+
+
+def build(table_generator, row_count, path, seed=DEFAULT_SEED):
+    # Two passes over the same seeded generator : the first finds each column's type, width, whether it has
+    # nulls and, for strings, its distinct values, the second writes the batches straight into the memory-mapped file
+    layout = {}
+    for first_row in range(0, row_count, BUILD_BATCH_SIZE):
+        batch = table_generator.generate_batch(np.random.RandomState(seed + first_row), first_row + 1, min(BUILD_BATCH_SIZE, row_count - first_row))
+        for name, values in zip(table_generator.column_names, batch):
+            kind, width = column_layout(values)
+            nulls = null_mask(values)
+            previous_kind, previous_width, previous_nulls, known = layout.get(name, (kind, 0, False, set() if kind == "bytes" else None))
+            layout[name] = (previous_kind, max(previous_width, width), previous_nulls or (nulls is not None and bool(nulls.any())), distinct_values(values, known))
+
+    columns = []
+    dictionaries = {}
+    offset = 0
+    for name in table_generator.column_names:
+        kind, width, nullable, known = layout[name]
+        column = {"name": name, "kind": kind, "width": width, "offset": offset, "nulls": None, "dictionary": None, "entries": 0}
+        if known and len(known) < row_count / 2.0:
+            # Sorted so the same data always builds the same file
+            dictionaries[name] = sorted(known)
+            column["entries"] = len(known)
+            offset = aligned(offset + CODE_DTYPE.itemsize * row_count)
+            column["dictionary"] = offset
+            offset = aligned(offset + storage_dtype(kind, width).itemsize * len(known))
+        else:
+            offset = aligned(offset + storage_dtype(kind, width).itemsize * row_count)
+        if nullable:
+            column["nulls"] = offset
+            offset = aligned(offset + row_count)
+        columns.append(column)
+    header = json.dumps({"table_name": table_generator.table_name, "rows": row_count, "columns": columns}).encode("utf-8")
+    data_offset = aligned(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, "wb") as data_file:
+        data_file.write(MAGIC)
+        data_file.write(struct.pack("<Q", len(header)))
+        data_file.write(header)
+        data_file.truncate(data_offset + offset)
+    mapped = np.memmap(temporary, dtype=np.uint8, mode="r+")
+    codes = {}
+    for column in columns:
+        if column["dictionary"] is not None:
+            entries = dictionaries[column["name"]]
+            target = np.ndarray((len(entries),), dtype=storage_dtype(column["kind"], column["width"]), buffer=mapped, offset=data_offset + column["dictionary"])
+            target[:] = stored_values(np.array(entries, dtype=object), column["kind"], column["width"])
+            codes[column["name"]] = dict((value, code) for code, value in enumerate(entries))
+    for first_row in range(0, row_count, BUILD_BATCH_SIZE):
+        count = min(BUILD_BATCH_SIZE, row_count - first_row)
+        batch = table_generator.generate_batch(np.random.RandomState(seed + first_row), first_row + 1, count)
+        for column, values in zip(columns, batch):
+            if column["dictionary"] is not None:
+                code_for = codes[column["name"]]
+                target = np.ndarray((row_count,), dtype=CODE_DTYPE, buffer=mapped, offset=data_offset + column["offset"])
+                target[first_row:first_row + count] = [0 if value is None else code_for[value] for value in values.tolist()]
+            else:
+                dtype = storage_dtype(column["kind"], column["width"])
+                target = np.ndarray((row_count,), dtype=dtype, buffer=mapped, offset=data_offset + column["offset"])
+                target[first_row:first_row + count] = stored_values(values, column["kind"], column["width"])
+            if column["nulls"] is not None:
+                nulls = null_mask(values)
+                flags = np.ndarray((row_count,), dtype=bool, buffer=mapped, offset=data_offset + column["nulls"])
+                flags[first_row:first_row + count] = nulls if nulls is not None else False
+    mapped.flush()
+    del mapped
+    os.rename(temporary, path)
+    logging.debug("Built dataset {} with {} rows of {}".format(path, row_count, table_generator.table_name))
+
+
+def cached_dataset(config, row_count, cache_directory=DEFAULT_CACHE_DIRECTORY, seed=DEFAULT_SEED):
+    # Named by the config content, row count, seed and file format, so the same point always replays the same bytes
+    content = ET.tostring(config, encoding="UTF-8")
+    digest = hashlib.sha1(content + "{}:{}".format(row_count, seed).encode("utf-8") + MAGIC).hexdigest()[:16]
+    path = os.path.join(cache_directory, "{}.dat".format(digest))
+    if not os.path.exists(path):
+        if not os.path.isdir(cache_directory):
+            try:
+                os.makedirs(cache_directory)
+            except OSError:
+                if not os.path.isdir(cache_directory):
+                    raise
+        build(batchgenerator.TableGenerator(config), row_count, path, seed)
+    return path
+
+
+class Dataset(object):
+    # A built dataset mapped read only. batch() returns views onto the mapping, so slicing costs nothing
+    # and every worker process shares the same page cache. Each batch is converted to python values as it is
+    # replayed, dictionary encoded columns by looking their codes up in values decoded when the dataset is opened
+
+    def __init__(self, path):
+        with open(path, "rb") as data_file:
+            if data_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} is not a dataset file".format(path))
+            header_length = struct.unpack("<Q", data_file.read(8))[0]
+            header = json.loads(data_file.read(header_length).decode("utf-8"))
+        data_offset = aligned(len(MAGIC) + 8 + header_length)
+        self.path = path
+        self.table_name = header["table_name"]
+        self.rows = header["rows"]
+        self.column_names = [column["name"] for column in header["columns"]]
+        mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        self.columns = []
+        for column in header["columns"]:
+            dtype = storage_dtype(column["kind"], column["width"])
+            dictionary = None
+            if column["dictionary"] is not None:
+                entries = np.ndarray((column["entries"],), dtype=dtype, buffer=mapped, offset=data_offset + column["dictionary"])
+                dictionary = np.char.decode(entries, "utf-8").tolist()
+                dtype = CODE_DTYPE
+            values = np.ndarray((self.rows,), dtype=dtype, buffer=mapped, offset=data_offset + column["offset"])
+            nulls = None
+            if column["nulls"] is not None:
+                nulls = np.ndarray((self.rows,), dtype=bool, buffer=mapped, offset=data_offset + column["nulls"])
+            self.columns.append((values, nulls, dictionary))
+
+    def batch(self, first_row, count):
+        return [(values[first_row:first_row + count], None if nulls is None else nulls[first_row:first_row + count], dictionary) for values, nulls, dictionary in self.columns]
+
+    def rows_for_keys(self, first_key, count):
+        # Keys start at 1 as they do in the engine, wrapping if the dataset is smaller than the load
+        rows = []
+        first_row = (first_key - 1) % self.rows
+        while count > 0:
+            chunk = min(count, self.rows - first_row)
+            rows.extend(batch_to_rows(self.batch(first_row, chunk)))
+            count -= chunk
+            first_row = 0
+        return rows
+
+
+def batch_to_rows(batch):
+    # Binding needs python values, which is the only copy made on the replay path
+    columns = []
+    for values, nulls, dictionary in batch:
+        if dictionary is not None:
+            values = [dictionary[code] for code in values.tolist()]
+        elif values.dtype.kind == "S":
+            values = [value.decode("utf-8") for value in values.tolist()]
+        else:
+            values = values.tolist()
+        if nulls is not None and nulls.any():
+            values = [None if null else value for value, null in zip(values, nulls.tolist())]
+        columns.append(values)
+    return list(zip(*columns))
@@ -0,0 +1,107 @@
+from __future__ import print_function, division
+
+import importlib
+import json
+import logging
+
+import ingestengine
+
+# System statistics and wait events snapshotted around each test point, the deltas stored with the point and
+# normalised per row inserted. A collector is anything with snapshot(), returning {name: number}, and close().
+# Statistics are a diagnostic, so a collector that can't connect or query (no driver, no grant on the v$ views)
+# costs the run a warning and its deltas, never the run itself
+STATISTICS = ["redo size", "redo entries", "user commits", "redo synch writes", "db block changes", "physical writes"]
+WAIT_EVENTS = ["log file sync", "log file parallel write", "buffer busy waits"]
+# Plus every enqueue wait, e.g. enq: TX - index contention and enq: HW - contention
+WAIT_EVENT_PATTERN = "enq: %"
+
+
+class OracleCollector(object):
+    # Keeps one monitoring connection open for the whole run, so a snapshot is just the two queries. They are
+    # tried once up front, so missing grants show before the first point
+
+    def __init__(self, username, password, connect_string):
+        self.connection = ingestengine.connect(username, password, connect_string)
+        self.cursor = self.connection.cursor()
+        self.statistics = "SELECT name, value FROM v$sysstat WHERE name IN ({})".format(", ".join(":{}".format(i + 1) for i in range(len(STATISTICS))))
+        self.events = "SELECT event, total_waits, time_waited_micro FROM v$system_event WHERE event IN ({}) OR event LIKE :{}".format(
+            ", ".join(":{}".format(i + 1) for i in range(len(WAIT_EVENTS))), len(WAIT_EVENTS) + 1)
+        try:
+            self.snapshot()
+        except Exception:
+            self.close()
+            raise
+
+    def snapshot(self):
+        values = {}
+        self.cursor.execute(self.statistics, STATISTICS)
+        for name, value in self.cursor:
+            values[name] = value
+        self.cursor.execute(self.events, WAIT_EVENTS + [WAIT_EVENT_PATTERN])
+        for event, waits, micros in self.cursor:
+            values["{} (waits)".format(event)] = waits
+            values["{} (us)".format(event)] = micros
+        return values
+
+    def close(self):
+        self.cursor.close()
+        self.connection.close()
+
+
+class CannedCollector(object):
+    # Local stand-in serving snapshots from a JSON file (a list of {name: value}) in turn, then the last
+    # one again. For trying the harness without a database to monitor
+
+    def __init__(self, path):
+        with open(path) as canned:
+            self.snapshots = json.load(canned)
+        if not self.snapshots:
+            raise ValueError("No snapshots in {}".format(path))
+        self.served = 0
+
+    def snapshot(self):
+        values = self.snapshots[min(self.served, len(self.snapshots) - 1)]
+        self.served += 1
+        return dict(values)
+
+    def close(self):
+        pass
+
+
+def collector(spec, username, password, connect_string):
+    # spec is oracle, canned:<file> or <module>:<class> for any other collector, which is passed the username,
+    # password and connect string. None or none collects nothing
+    if spec is None or spec == "none":
+        return None
+    if spec == "oracle":
+        try:
+            return OracleCollector(username, password, connect_string)
+        except Exception as e:
+            logging.warning("Unable to collect database statistics, running without them : {}".format(e))
+            return None
+    kind, _, argument = spec.partition(":")
+    if kind == "canned" and argument:
+        return CannedCollector(argument)
+    if not argument:
+        raise ValueError("Unknown statistics collector {}".format(spec))
+    return getattr(importlib.import_module(kind), argument)(username, password, connect_string)
+
+
+def snapshot(collector):
+    # None, with a warning, when the collector fails
+    try:
+        return collector.snapshot()
+    except Exception as e:
+        logging.warning("Unable to snapshot database statistics, skipping the point's deltas : {}".format(e))
+        return None
+
+
+def deltas(before, after, rows_inserted):
+    # name -> (change, change per row inserted) for the values in both snapshots that changed
+    changes = {}
+    for name in sorted(set(before) & set(after)):
+        change = after[name] - before[name]
+        if change:
+            changes[name] = (change, change / rows_inserted if rows_inserted else 0.0)
+    logging.debug("Database statistics deltas : {}".format(changes))
+    return changes
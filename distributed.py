@@ -0,0 +1,262 @@
+from __future__ import print_function
+
+import argparse
+import json
+import logging
+import socket
+import time
+import xml.etree.ElementTree as ET
+from threading import Event, Thread
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+import ingestengine
+import metrics
+import resultstore
+
+DEFAULT_PORT = 5577
+# Time allowed for the start message to reach every agent before they all begin
+DEFAULT_START_DELAY = 2.0
+CLOCK_SAMPLES = 5
+
+# Agents listen on a port and run test points for a coordinator (runtests.py -agents host:port,...).
+# Messages are single lines of JSON : the coordinator measures each agent's clock offset, sends the point
+# to prepare, then a start time in the agent's own clock so every agent begins together. Preparing starts the
+# agent's workers, which connect and wait at their barrier, so only inserting starts at the start time. Each
+# agent replies with its process results, throughput samples and latency histograms, which the coordinator merges
+
+
+def send(stream, message):
+    stream.write((json.dumps(message) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def receive(stream):
+    line = stream.readline()
+    if not line:
+        raise EOFError("Connection closed")
+    return json.loads(line.decode("utf-8"))
+
+
+def set_logging(level):
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    ch = logging.StreamHandler()
+    ch.setLevel(level)
+    formatter = logging.Formatter('%(levelname)s[%(asctime)s]%(module)s:%(funcName)s: %(message)s')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    # One coordinator connection : any number of prepare/start pairs until the coordinator hangs up
+
+    def handle(self):
+        logging.debug("Coordinator connected from {}".format(self.client_address))
+        prepared = None
+        try:
+            while True:
+                try:
+                    message = receive(self.rfile)
+                except EOFError:
+                    return
+                try:
+                    if message["command"] == "clock":
+                        send(self.wfile, {"time": time.time()})
+                    elif message["command"] == "prepare":
+                        if prepared is not None:
+                            prepared.cancel()
+                            prepared = None
+                        prepared = self.prepare(message)
+                        send(self.wfile, {"ready": True})
+                    elif message["command"] == "start":
+                        point, prepared = prepared, None
+                        if point is None:
+                            raise ValueError("Start received before prepare")
+                        send(self.wfile, point.start(message["start_at"]))
+                    else:
+                        raise ValueError("Unknown command {}".format(message["command"]))
+                except Exception as e:
+                    logging.exception("Unable to run {}".format(message.get("command")))
+                    send(self.wfile, {"error": "{}: {}".format(type(e).__name__, e)})
+        finally:
+            # A coordinator that hangs up between prepare and start leaves workers waiting at their barrier
+            if prepared is not None:
+                prepared.cancel()
+
+    def prepare(self, message):
+        # Anything slow (compiling the generator, building a replay dataset, starting and connecting the workers)
+        # happens before the start time
+        parameters = dict(message["parameters"])
+        parameters["key_offset"] = message["key_offset"]
+        if message["config"] is not None:
+            parameters["config"] = ET.fromstring(message["config"])
+        if parameters.get("generator") == "replay":
+            import datasetcache
+            parameters["dataset"] = datasetcache.cached_dataset(parameters["config"], message["key_offset"] + parameters["processes"] * parameters["row_count"])
+        return PreparedPoint(parameters)
+
+
+class PreparedPoint(object):
+    # A point run by run_engine in a thread of its own, held once its workers are connected until start
+    # releases them at the start time
+
+    def __init__(self, parameters):
+        self.series = metrics.ThroughputSeries(time.time())
+        self.latencies = {}
+        self.window = {}
+        self.results = None
+        self.error = None
+        self.start_at = None
+        self.ready = Event()
+        self.released = Event()
+        self.thread = Thread(target=self.run, args=(parameters,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+
+    def run(self, parameters):
+        try:
+            self.results = ingestengine.run_engine(series=self.series, latencies=self.latencies, window=self.window, on_ready=self.wait_for_start, **parameters)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def wait_for_start(self):
+        self.ready.set()
+        self.released.wait()
+        if self.start_at is None:
+            raise RuntimeError("Point cancelled before it started")
+        time.sleep(max(0, self.start_at - time.time()))
+
+    def start(self, start_at):
+        self.start_at = start_at
+        self.released.set()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return {"results": self.results,
+                "window": [self.window["start"], self.window["end"]],
+                "series": self.series.samples,
+                "latencies": dict((operation, resultstore.encode_histogram(histogram)) for operation, histogram in self.latencies.items())}
+
+    def cancel(self):
+        self.released.set()
+        self.thread.join()
+
+
+class AgentServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def parse_agents(agents):
+    addresses = []
+    for agent in agents.split(","):
+        host, _, port = agent.strip().rpartition(":")
+        addresses.append((host or "localhost", int(port) if port else DEFAULT_PORT))
+    return addresses
+
+
+class AgentClient(object):
+
+    def __init__(self, address):
+        self.address = address
+        self.socket = socket.create_connection(address)
+        self.stream = self.socket.makefile("rwb")
+
+    def request(self, message):
+        send(self.stream, message)
+        reply = receive(self.stream)
+        if "error" in reply:
+            raise RuntimeError("Agent {}:{} failed : {}".format(self.address[0], self.address[1], reply["error"]))
+        return reply
+
+    def clock_offset(self):
+        # Agent clock minus ours, taken from the sample with the shortest round trip
+        best = None
+        for _ in range(CLOCK_SAMPLES):
+            sent = time.time()
+            agent_time = self.request({"command": "clock"})["time"]
+            received = time.time()
+            if best is None or received - sent < best[0]:
+                best = (received - sent, agent_time - (sent + received) / 2)
+        return best[1]
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+
+def on_agents(clients, request):
+    # request(index, client) on every agent at once, raising the first failure once all have replied
+    replies = [None] * len(clients)
+    failures = []
+
+    def call(index, client):
+        try:
+            replies[index] = request(index, client)
+        except Exception as e:
+            failures.append(e)
+
+    threads = [Thread(target=call, args=(index, client)) for index, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    return replies
+
+
+def run_point(agents, parameters, config=None, series=None, latencies=None, window=None, start_delay=DEFAULT_START_DELAY):
+    # parameters are run_engine's keyword arguments, run on every agent with its own range of keys.
+    # Returns the process results of all agents, merging their series and histograms into ours, and
+    # window their measured span in our clock
+    clients = [AgentClient(address) for address in agents]
+    try:
+        offsets = on_agents(clients, lambda index, client: client.clock_offset())
+        logging.debug("Agent clock offsets : {}".format(", ".join("{:+.6f}".format(offset) for offset in offsets)))
+        keys_per_agent = parameters["processes"] * parameters["row_count"]
+        content = ET.tostring(config, encoding="UTF-8").decode("utf-8") if config is not None else None
+        on_agents(clients, lambda index, client: client.request({"command": "prepare", "parameters": parameters, "config": content, "key_offset": index * keys_per_agent}))
+        start_at = time.time() + start_delay
+        replies = on_agents(clients, lambda index, client: client.request({"command": "start", "start_at": start_at + offsets[index]}))
+    finally:
+        for client in clients:
+            client.close()
+    process_results = []
+    if window is not None:
+        window["start"] = min(reply["window"][0] - offset for reply, offset in zip(replies, offsets))
+        window["end"] = max(reply["window"][1] - offset for reply, offset in zip(replies, offsets))
+    for index, reply in enumerate(replies):
+        process_results.extend(tuple(result) for result in reply["results"])
+        if series is not None:
+            series.merge(reply["series"], index)
+        if latencies is not None:
+            for operation, encoded in reply["latencies"].items():
+                latencies.setdefault(operation, metrics.LatencyHistogram()).merge(resultstore.decode_histogram(encoded))
+    return process_results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest Test Agent')
+    parser.add_argument("-host", "--host", help="address to listen on (default=all)", default="")
+    parser.add_argument("-port", "--port", help="port to listen on (default={})".format(DEFAULT_PORT), type=int, default=DEFAULT_PORT)
+    parser.add_argument("-debug", help="output debug to stdout", dest='debug_on', action='store_true')
+
+    args = parser.parse_args()
+
+    if args.debug_on:
+        set_logging(level=logging.DEBUG)
+
+    server = AgentServer((args.host, args.port), AgentHandler)
+    print("Agent listening on port {}".format(args.port))
+    server.serve_forever()
@@ -0,0 +1,145 @@
+from __future__ import print_function
+
+import json
+import sqlite3
+import time
+from datetime import timedelta
+
+import ingestengine
+
+DOCUMENT_ENCODINGS = ['text', 'binary']
+DEFAULT_DOCUMENT_ENCODING = 'text'
+
+# Documents for ANPR_COLLECTION, with the fields anpr_documentv2.xml builds (document_light leaves out the
+# image). A batch's random field values are generated first, then encoded by an encoder compiled once per
+# worker, so the time spent encoding can be recorded apart from generating and inserting :
+#   text   - JSON text from a template holding the keys, punctuation, image and every enumerated value
+#            already encoded, leaving one format call per document
+#   binary - OSON, Oracle's binary JSON, encoded by python-oracledb (2.1 or later) and bound as is into the
+#            BLOB of ANPR_COLLECTION_OSON. Encoding needs an open connection, so a worker's source is given its
+#            connection before the first batch. SQLite has no OSON, its stand-in stores the documents' JSON text
+
+
+def generate_fields(rng, row_count):
+    # ANPRId, seconds into the collection year, location, plate, pass id and indexes into the value lists
+    return [(rng.randint(1000, 30000),
+             rng.randrange(ingestengine.COLLECTION_SECONDS),
+             rng.randint(1, 1000),
+             "".join(rng.choice(ingestengine.PLATE_CHARACTERS) for _ in range(8)),
+             str(rng.randint(10000000000, 99000000000)),
+             rng.randrange(len(ingestengine.PAYMENTS)),
+             rng.randrange(len(ingestengine.VEHICLE_COLOURS)),
+             rng.randrange(len(ingestengine.VEHICLE_TYPES)),
+             rng.randrange(len(ingestengine.WATCH_LIST))) for _ in range(row_count)]
+
+
+def collection_time(seconds):
+    return ingestengine.COLLECTION_START + timedelta(seconds=seconds)
+
+
+class TextEncoder(object):
+
+    def __init__(self, image_multiplier, light):
+        image = "" if light else ',"NumberPlateImage":{}'.format(json.dumps(ingestengine.IMAGE_DATA * int(image_multiplier)).replace("%", "%%"))
+        # Plates and pass ids are letters and digits, so they need no escaping
+        self.template = '{"ANPRId":%d,"CollectionTime":"%s","LocationId":%d,"NumberPlate":"%s","OraCarPassID":"%s","Payment":%s,"VehicleColour":%s,"VehicleType":%s,"WatchList":%s' + image + '}'
+        self.payments = [json.dumps(payment) for payment in ingestengine.PAYMENTS]
+        self.colours = [json.dumps(colour) for colour in ingestengine.VEHICLE_COLOURS]
+        self.types = [json.dumps(vehicle_type) for vehicle_type in ingestengine.VEHICLE_TYPES]
+        self.watch_list = [json.dumps(watch) for watch in ingestengine.WATCH_LIST]
+
+    def encode(self, fields):
+        template, payments, colours, types, watch_list = self.template, self.payments, self.colours, self.types, self.watch_list
+        rows = []
+        for anpr_id, seconds, location_id, plate, pass_id, payment, colour, vehicle_type, watch in fields:
+            collected = collection_time(seconds)
+            rows.append((anpr_id, collected, template % (anpr_id, collected.isoformat(), location_id, plate, pass_id, payments[payment], colours[colour], types[vehicle_type], watch_list[watch])))
+        return rows
+
+
+def supported(encoding, connect_string):
+    if encoding != 'binary' or connect_string.startswith(ingestengine.SQLITE_PREFIX):
+        return True
+    try:
+        driver = ingestengine.get_driver(connect_string)
+    except ImportError:
+        return False
+    return hasattr(getattr(driver, "Connection", None), "encode_oson")
+
+
+def oson_encoder(connection):
+    if hasattr(connection, "encode_oson"):
+        return connection.encode_oson
+    if isinstance(connection, sqlite3.Connection):
+        return lambda document: json.dumps(document, default=lambda value: value.isoformat()).encode("utf-8")
+    raise ValueError("Binary documents are OSON, which needs python-oracledb 2.1 or later")
+
+
+class BinaryEncoder(object):
+    # One document dict, holding the image, is filled in again for every row rather than built per row.
+    # Encoding itself stays one call per document : python-oracledb has no batch OSON encoding and returns each
+    # document as bytes of its own rather than writing into a buffer we could reuse, but those bytes are bound
+    # without another copy
+
+    def __init__(self, image_multiplier, light, encode_oson):
+        self.document = {"ANPRId": None, "CollectionTime": None, "LocationId": None, "NumberPlate": None, "OraCarPassID": None,
+                         "Payment": None, "VehicleColour": None, "VehicleType": None, "WatchList": None}
+        if not light:
+            self.document["NumberPlateImage"] = ingestengine.IMAGE_DATA * int(image_multiplier)
+        self.encode_oson = encode_oson
+
+    def encode(self, fields):
+        document, encode_oson = self.document, self.encode_oson
+        payments, colours, types, watch_list = ingestengine.PAYMENTS, ingestengine.VEHICLE_COLOURS, ingestengine.VEHICLE_TYPES, ingestengine.WATCH_LIST
+        rows = []
+        for anpr_id, seconds, location_id, plate, pass_id, payment, colour, vehicle_type, watch in fields:
+            collected = collection_time(seconds)
+            document["ANPRId"] = anpr_id
+            document["CollectionTime"] = collected
+            document["LocationId"] = location_id
+            document["NumberPlate"] = plate
+            document["OraCarPassID"] = pass_id
+            document["Payment"] = payments[payment]
+            document["VehicleColour"] = colours[colour]
+            document["VehicleType"] = types[vehicle_type]
+            document["WatchList"] = watch_list[watch]
+            rows.append((anpr_id, collected, encode_oson(document)))
+        return rows
+
+
+class DocumentSource(object):
+    # The row generator for the document schemas, recording each batch's encode time in histograms. A router
+    # (see partitioning.py) picks the ANPRIds before the documents are encoded and orders the encoded rows
+
+    def __init__(self, encoding, light, histograms=None, worker=None, router=None):
+        if encoding not in DOCUMENT_ENCODINGS:
+            raise ValueError("Unknown document encoding {}".format(encoding))
+        self.encoding = encoding
+        self.light = light
+        self.histograms = histograms
+        self.worker = worker
+        self.router = router
+        self.connection = None
+        self.encoder = None
+        self.image_multiplier = None
+
+    def use_connection(self, connection):
+        self.connection = connection
+        self.encoder = None
+
+    def compile(self, image_multiplier):
+        if self.encoding == 'text':
+            return TextEncoder(image_multiplier, self.light)
+        return BinaryEncoder(image_multiplier, self.light, oson_encoder(self.connection))
+
+    def __call__(self, rng, first_key, row_count, image_multiplier):
+        if self.encoder is None or image_multiplier != self.image_multiplier:
+            self.encoder, self.image_multiplier = self.compile(image_multiplier), image_multiplier
+        fields = generate_fields(rng, row_count)
+        if self.router is not None:
+            fields = [(self.router.assign(field[0]),) + field[1:] for field in fields]
+        start = time.time()
+        rows = self.encoder.encode(fields)
+        if self.histograms is not None:
+            self.histograms.record(self.worker, ingestengine.ENCODE_LATENCY, time.time() - start)
+        return self.router.group(rows) if self.router is not None else rows
@@ -0,0 +1,622 @@
+from __future__ import print_function
+
+import ctypes
+import logging
+import multiprocessing
+import random
+import string
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from threading import Thread
+
+import connectionpool
+import metrics
+import partitioning
+
+SQLITE_PREFIX = "sqlite:"
+ROWS_PER_SCALE = 100000
+
+IMAGE_DATA = "ADFEWOJFSDMXOWELKWFJRWE90FOPKW9KCSSLKEFWEOKWFE0WFPWEOFI23PFWJWEFWK0FWE0FWEJWEF9FWMSFHQ2QKOPAVMXXSKZI"
+PLATE_CHARACTERS = string.ascii_uppercase + string.digits
+PAYMENTS = [1, 1, 1, 1, 1, 1, 1, 1.5, 1.5, 2, 2, 2, 5]
+VEHICLE_COLOURS = ["Red", "Green", "Yellow", "Silver", "Unknown", "Black", "Gray", "White", "Black", "Blue", "Gray", "Black", "Gray", "Red", "Gray", "Gray"]
+VEHICLE_TYPES = ["SUV", "SUV", "SUV", "Unknown", "Compact", "Compact", "Compact", "Compact", "Compact", "Compact", "Pickup", "Lorry"]
+WATCH_LIST = ["N"] * 107 + ["Y"]
+COLLECTION_START = datetime(2017, 1, 1, 14, 17, 20)
+COLLECTION_SECONDS = 364 * 24 * 3600
+
+# Schema types the engine can load, mapped to the table they populate in createtables.sql
+TABLES = {
+    'simple': ("SIMPLETABLE", ["COLUMN1", "COLUMN2", "COLUMN3", "COLUMN4", "COLUMN5", "COLUMN6"]),
+    'light': ("INSERTABLE", ["COLUMN1", "COLUMN2", "COLUMN3", "COLUMN4", "COLUMN5", "COLUMN6", "COLUMN7"]),
+    'relational': ("ANPR_RELATIONAL", ["ANPR_ID", "COLLECTION_TIME", "LOCATION_ID", "NUMBER_PLATE", "ORACAR_PASS_ID", "PAYMENT", "VEHICLE_COLOUR", "VEHICLE_TYPE", "WATCH_LIST", "NUMBER_PLATE_IMAGE"]),
+    'document': ("ANPR_COLLECTION", ["ANPRID", "COLLECTION_TIME", "JSON_DATA"]),
+    'document_light': ("ANPR_COLLECTION", ["ANPRID", "COLLECTION_TIME", "JSON_DATA"]),
+}
+# Schema types whose rows are documents built by documentencoder.py
+DOCUMENT_TYPES = ['document', 'document_light']
+# Binary documents are OSON, kept in a BLOB rather than anpr_collection's CLOB
+BINARY_DOCUMENT_TABLE = "ANPR_COLLECTION_OSON"
+
+# Local stand-ins for the Oracle DDL so the engine can be validated against SQLite
+SQLITE_DDL = [
+    "CREATE TABLE IF NOT EXISTS SIMPLETABLE (COLUMN1 INTEGER NOT NULL, COLUMN2 INTEGER NOT NULL, COLUMN3 INTEGER NOT NULL, COLUMN4 INTEGER NOT NULL, COLUMN5 INTEGER NOT NULL, COLUMN6 TIMESTAMP NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS INSERTABLE (COLUMN1 INTEGER NOT NULL, COLUMN2 INTEGER NOT NULL, COLUMN3 INTEGER NOT NULL, COLUMN4 INTEGER NOT NULL, COLUMN5 INTEGER NOT NULL, COLUMN6 INTEGER NOT NULL, COLUMN7 TIMESTAMP NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS ANPR_RELATIONAL (ANPR_ID INTEGER NOT NULL, COLLECTION_TIME TIMESTAMP NOT NULL, LOCATION_ID INTEGER NOT NULL, NUMBER_PLATE TEXT, ORACAR_PASS_ID TEXT, PAYMENT REAL, VEHICLE_COLOUR TEXT, VEHICLE_TYPE TEXT, WATCH_LIST TEXT, NUMBER_PLATE_IMAGE TEXT)",
+    "CREATE TABLE IF NOT EXISTS ANPR_COLLECTION (ANPRID INTEGER NOT NULL, COLLECTION_TIME TIMESTAMP NOT NULL, JSON_DATA TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS ANPR_COLLECTION_OSON (ANPRID INTEGER NOT NULL, COLLECTION_TIME TIMESTAMP NOT NULL, JSON_DATA BLOB NOT NULL)",
+]
+
+
+ASYNC_COMMIT_STATEMENTS = ["ALTER SESSION SET COMMIT_LOGGING = BATCH", "ALTER SESSION SET COMMIT_WAIT = NOWAIT"]
+
+
+def get_driver(connect_string):
+    if connect_string.startswith(SQLITE_PREFIX):
+        import sqlite3
+        return sqlite3
+    try:
+        import oracledb
+        return oracledb
+    except ImportError:
+        import cx_Oracle
+        return cx_Oracle
+
+
+def connect(username, password, connect_string):
+    driver = get_driver(connect_string)
+    if connect_string.startswith(SQLITE_PREFIX):
+        driver.register_adapter(datetime, lambda d: d.isoformat(" "))
+        connection = driver.connect(connect_string[len(SQLITE_PREFIX):], timeout=600, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in SQLITE_DDL:
+            connection.execute(statement)
+        connection.commit()
+        return connection
+    return driver.connect(user=username, password=password, dsn=connect_string)
+
+
+def set_async_commit(connection, connect_string):
+    cursor = connection.cursor()
+    if connect_string.startswith(SQLITE_PREFIX):
+        cursor.execute("PRAGMA synchronous=OFF")
+    else:
+        for statement in ASYNC_COMMIT_STATEMENTS:
+            cursor.execute(statement)
+    cursor.close()
+
+
+def target_table(test_type, document_encoding=None):
+    table_name, columns = TABLES[test_type]
+    if test_type in DOCUMENT_TYPES and document_encoding == 'binary':
+        return BINARY_DOCUMENT_TABLE, columns
+    return table_name, columns
+
+
+def insert_statement(driver, table_name, columns):
+    if driver.paramstyle == 'qmark':
+        binds = ["?"] * len(columns)
+    else:
+        binds = [":{}".format(i + 1) for i in range(len(columns))]
+    return "INSERT INTO {} ({}) VALUES ({})".format(table_name, ", ".join(columns), ", ".join(binds))
+
+
+def random_time(rng):
+    return COLLECTION_START + timedelta(seconds=rng.randrange(COLLECTION_SECONDS))
+
+
+def generate_simple_rows(rng, first_key, row_count, image_multiplier):
+    return [(first_key + i,
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9000),
+             random_time(rng)) for i in range(row_count)]
+
+
+def generate_light_rows(rng, first_key, row_count, image_multiplier):
+    return [(first_key + i,
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9999),
+             rng.randint(1000, 9000),
+             random_time(rng)) for i in range(row_count)]
+
+
+def generate_relational_rows(rng, first_key, row_count, image_multiplier):
+    image = IMAGE_DATA * int(image_multiplier)
+    return [(rng.randint(1000, 30000),
+             random_time(rng),
+             rng.randint(1, 1000),
+             "".join(rng.choice(PLATE_CHARACTERS) for _ in range(8)),
+             str(rng.randint(10000000000, 99000000000)),
+             rng.choice(PAYMENTS),
+             rng.choice(VEHICLE_COLOURS),
+             rng.choice(VEHICLE_TYPES),
+             rng.choice(WATCH_LIST),
+             image) for _ in range(row_count)]
+
+
+ROW_GENERATORS = {
+    'simple': generate_simple_rows,
+    'light': generate_light_rows,
+    'relational': generate_relational_rows,
+}
+
+# Schema types whose rows can be produced by the vectorized generator from their datagenerator config
+VECTOR_GENERATED = ['simple', 'relational']
+
+
+def generate_vector_rows(table_generator, rng, first_key, row_count, image_multiplier):
+    import batchgenerator
+    return batchgenerator.batch_to_rows(table_generator.generate_batch(rng, first_key, row_count))
+
+
+def generate_replay_rows(dataset, rng, first_key, row_count, image_multiplier):
+    return dataset.rows_for_keys(first_key, row_count)
+
+
+def row_source(test_type, table_generator, dataset, document_encoding=None, histograms=None, worker=None, router=None):
+    # The row generating function and its random state for one worker. Documents are encoded in document_encoding,
+    # with the encode time recorded against worker, and a router orders each batch by partition
+    if test_type in DOCUMENT_TYPES:
+        import documentencoder
+        return documentencoder.DocumentSource(document_encoding or documentencoder.DEFAULT_DOCUMENT_ENCODING, test_type == 'document_light', histograms, worker, router), random.Random()
+    if router is not None:
+        generate_rows, rng = row_source(test_type, table_generator, dataset)
+        return partial(partitioning.routed_rows, generate_rows, router), rng
+    if dataset is not None:
+        import datasetcache
+        return partial(generate_replay_rows, datasetcache.Dataset(dataset)), None
+    if table_generator is not None:
+        import batchgenerator
+        return partial(generate_vector_rows, table_generator), batchgenerator.new_rng()
+    return ROW_GENERATORS[test_type], random.Random()
+
+
+def compile_generator(config):
+    # config is the datagenerator config's root element, with any overrides (image size etc.) already applied
+    import batchgenerator
+    return batchgenerator.TableGenerator(config)
+
+
+class SharedCounters(object):
+    # One row of counters per worker in shared memory. Each worker is the only writer of its own row,
+    # so no locking is needed and the parent can read live totals while the workers run
+
+    def __init__(self, workers, values=None):
+        # values, if given, is an array of at least workers rows that outlives this point (see workerpool.py)
+        self.workers = workers
+        self.values = values if values is not None else multiprocessing.RawArray('d', workers * len(COUNTERS))
+
+    def add(self, worker, counter, amount):
+        self.values[worker * len(COUNTERS) + counter] += amount
+
+    def set(self, worker, counter, value):
+        self.values[worker * len(COUNTERS) + counter] = value
+
+    def get(self, worker, counter):
+        return self.values[worker * len(COUNTERS) + counter]
+
+    def total(self, counter):
+        return sum(self.get(worker, counter) for worker in range(self.workers))
+
+    def snapshot(self):
+        return list(self.values)
+
+    def rows(self, workers, baseline=None, final=None):
+        # Rows inserted by workers between two snapshots, None meaning the start of the run or now
+        values = final if final is not None else self.values
+        return sum(values[worker * len(COUNTERS) + ROWS] - (baseline[worker * len(COUNTERS) + ROWS] if baseline is not None else 0) for worker in workers)
+
+
+COUNTERS = (ROWS, BATCHES, CONNECTION_TIME, INSERTION_TIME, FAILURES, READY) = range(6)
+POLL_INTERVAL = 1.0
+BARRIER_POLL = 0.05
+
+
+class SharedHistograms(object):
+    # Latency histograms per worker in shared memory, laid out like SharedCounters and merged by the parent
+
+    def __init__(self, workers, counts=None):
+        self.workers = workers
+        self.counts = counts if counts is not None else multiprocessing.RawArray(ctypes.c_int64, workers * len(LATENCIES) * metrics.BUCKET_COUNT)
+
+    def offset(self, worker, latency):
+        return (worker * len(LATENCIES) + latency) * metrics.BUCKET_COUNT
+
+    def record(self, worker, latency, seconds):
+        self.counts[self.offset(worker, latency) + metrics.bucket_index(seconds * 1000000)] += 1
+
+    def snapshot(self):
+        return list(self.counts)
+
+    def histogram(self, latency, baseline=None, final=None):
+        # Merged across workers, optionally only what was recorded between two snapshots
+        counts = final if final is not None else self.counts
+        merged = metrics.LatencyHistogram()
+        for worker in range(self.workers):
+            offset = self.offset(worker, latency)
+            worker_counts = counts[offset:offset + metrics.BUCKET_COUNT]
+            if baseline is not None:
+                worker_counts = [count - before for count, before in zip(worker_counts, baseline[offset:offset + metrics.BUCKET_COUNT])]
+            merged.merge(metrics.LatencyHistogram(worker_counts))
+        return merged
+
+
+# Queue wait is only recorded by the asyncio engine, where batches from many producers share a connection,
+# pool acquire and wait only when connections come from a session pool, LOB write in a LOB mode, document
+# encode for the document schemas and intended response (from when a batch was due until it was inserted and
+# any commit after it done) under a rate schedule
+LATENCIES = (CONNECT_LATENCY, BATCH_LATENCY, COMMIT_LATENCY, QUEUE_LATENCY, ACQUIRE_LATENCY, POOL_WAIT_LATENCY, LOB_WRITE_LATENCY, ENCODE_LATENCY, INTENDED_LATENCY) = range(9)
+LATENCY_NAMES = ("Connect", "Batch Insert", "Commit", "Batch Queue", "Pool Acquire", "Pool Wait", "LOB Write", "Document Encode", "Intended Response")
+
+
+def commit(connection, histograms, worker):
+    start = time.time()
+    connection.commit()
+    histograms.record(worker, COMMIT_LATENCY, time.time() - start)
+
+
+def acquire_connection(connections, connect_string, async_commit, counters, histograms, worker):
+    start = time.time()
+    connection, waited = connections.acquire()
+    elapsed = time.time() - start
+    counters.add(worker, CONNECTION_TIME, elapsed)
+    if isinstance(connections, connectionpool.DedicatedConnections):
+        histograms.record(worker, CONNECT_LATENCY, elapsed)
+    else:
+        histograms.record(worker, ACQUIRE_LATENCY, elapsed)
+        histograms.record(worker, POOL_WAIT_LATENCY, waited)
+    if async_commit:
+        set_async_commit(connection, connect_string)
+    return connection
+
+
+def wait_to_start(counters, worker, go):
+    # Connected and prepared : wait at the barrier so every worker starts inserting together
+    counters.set(worker, READY, 1)
+    if go is not None:
+        go.wait()
+
+
+def insert_batch(connection, cursor, statement, rows, histograms, worker, writer=None):
+    batch_start = time.time()
+    if writer is None:
+        cursor.executemany(statement, rows)
+    else:
+        # insert returns the seconds spent writing LOBs, None when they were bound inline
+        lob_time = writer.insert(connection, cursor, rows)
+        if lob_time is not None:
+            histograms.record(worker, LOB_WRITE_LATENCY, lob_time)
+    histograms.record(worker, BATCH_LATENCY, time.time() - batch_start)
+
+
+def insert_rows(username, password, connect_string, test_type, first_key, row_count, batch_size, commit_size, async_commit, image_multiplier, counters, histograms, worker, stop, table_generator=None, dataset=None,
+                connections=None, storm=False, go=None, lob_mode=None, lob_chunk_size=None, document_encoding=None, routing=None, worker_count=1, schedule=None):
+    table_name, columns = target_table(test_type, document_encoding)
+    router = partitioning.Router(test_type, routing, worker, worker_count) if routing not in (None, partitioning.DEFAULT_ROUTING) else None
+    generate_rows, rng = row_source(test_type, table_generator, dataset, document_encoding, histograms, worker, router)
+    statement = insert_statement(get_driver(connect_string), table_name, columns)
+    writer = None
+    if lob_mode is not None:
+        # The image column is written by the LOB mode from one payload built up front, see lobwriter.py
+        import lobwriter
+        writer = lobwriter.lob_writer(lob_mode, connect_string, table_name, columns, lobwriter.LobPayload(image_multiplier, lob_chunk_size or lobwriter.DEFAULT_CHUNK_SIZE))
+    if connections is None:
+        connections = connectionpool.DedicatedConnections(partial(connect, username, password, connect_string))
+
+    if storm:
+        # Connection storm : every batch comes from a short-lived producer that connects (or acquires a
+        # pooled session), inserts and commits its one batch, then disconnects
+        wait_to_start(counters, worker, go)
+        rows_inserted = 0
+        start = time.time()
+        while rows_inserted < row_count and not stop.is_set():
+            rows = generate_rows(rng, first_key + rows_inserted, min(batch_size, row_count - rows_inserted), image_multiplier)
+            connection = acquire_connection(connections, connect_string, async_commit, counters, histograms, worker)
+            try:
+                cursor = connection.cursor()
+                insert_batch(connection, cursor, statement, rows, histograms, worker, writer)
+                commit(connection, histograms, worker)
+                cursor.close()
+            finally:
+                connections.release(connection)
+            rows_inserted += len(rows)
+            counters.add(worker, ROWS, len(rows))
+            counters.add(worker, BATCHES, 1)
+            counters.set(worker, INSERTION_TIME, time.time() - start)
+        return
+
+    connection = acquire_connection(connections, connect_string, async_commit, counters, histograms, worker)
+    try:
+        if test_type in DOCUMENT_TYPES:
+            generate_rows.use_connection(connection)
+        cursor = connection.cursor()
+        wait_to_start(counters, worker, go)
+        rows_inserted, uncommitted = 0, 0
+        start = time.time()
+        pacer = None
+        if schedule is not None:
+            # Open loop : each batch waits until the schedule has produced it, see ratecontrol.py
+            import ratecontrol
+            pacer = ratecontrol.Pacer(schedule, worker, worker_count, batch_size, start)
+        while rows_inserted < row_count and not stop.is_set():
+            if pacer is not None:
+                due = pacer.due(rows_inserted)
+                if due is None:
+                    break
+            rows = generate_rows(rng, first_key + rows_inserted, min(batch_size, row_count - rows_inserted), image_multiplier)
+            if pacer is not None and stop.wait(max(0, due - time.time())):
+                break
+            insert_batch(connection, cursor, statement, rows, histograms, worker, writer)
+            rows_inserted += len(rows)
+            uncommitted += len(rows)
+            if uncommitted >= commit_size:
+                commit(connection, histograms, worker)
+                uncommitted = 0
+            if pacer is not None:
+                histograms.record(worker, INTENDED_LATENCY, time.time() - due)
+            counters.add(worker, ROWS, len(rows))
+            counters.add(worker, BATCHES, 1)
+            counters.set(worker, INSERTION_TIME, time.time() - start)
+        if uncommitted > 0:
+            commit(connection, histograms, worker)
+        counters.set(worker, INSERTION_TIME, time.time() - start)
+        cursor.close()
+    finally:
+        connections.release(connection)
+
+
+def run_worker(counters, worker, args):
+    # Threads swallow exceptions, so record the failure where the parent will see it
+    try:
+        insert_rows(*args)
+    except Exception:
+        logging.exception("Worker {} failed".format(worker))
+        counters.add(worker, FAILURES, 1)
+
+
+def connection_source(username, password, connect_string, connection_mode, pool_size):
+    connect_function = partial(connect, username, password, connect_string)
+    if connection_mode == 'dedicated':
+        return connectionpool.DedicatedConnections(connect_function)
+    minimum, maximum, increment = pool_size
+    if connect_string.startswith(SQLITE_PREFIX):
+        return connectionpool.LocalPool(connect_function, minimum, maximum, increment)
+    return connectionpool.DriverPool(get_driver(connect_string), username, password, connect_string, minimum, maximum, increment)
+
+
+def run_process(username, password, connect_string, test_type, process, row_count, batch_size, commit_size, thread_count, async_commit, image_multiplier, counters, histograms, stop, table_generator=None, dataset=None,
+                connection_mode=connectionpool.DEFAULT_CONNECTION_MODE, pool_size=None, storm=False, lob_mode=None, lob_chunk_size=None, key_offset=0, go=None, document_encoding=None,
+                routing=None, worker_count=None, connections=None, schedule=None):
+    # Mirrors a single SimpleOraTest JVM : row_count rows shared across thread_count threads, each with its own
+    # connection, or sharing a session pool created per process (a pool can't span processes). connections,
+    # if given, is a source kept open across points by the caller
+    start = time.time()
+    owned = connections is None
+    if owned:
+        connections = connection_source(username, password, connect_string, connection_mode, pool_size)
+    if owned and connection_mode != 'dedicated':
+        # Creating the pool opens its minimum sessions, recorded before any worker thread writes its slot
+        histograms.record(process * thread_count, CONNECT_LATENCY, time.time() - start)
+    threads = []
+    rows_per_thread = row_count // thread_count
+    for thread_number in range(thread_count):
+        thread_rows = rows_per_thread + (row_count % thread_count if thread_number == thread_count - 1 else 0)
+        first_key = key_offset + process * row_count + thread_number * rows_per_thread + 1
+        worker = process * thread_count + thread_number
+        thread = Thread(target=run_worker, args=(counters, worker, (username, password, connect_string, test_type, first_key, thread_rows, batch_size, commit_size, async_commit, image_multiplier, counters, histograms, worker, stop, table_generator, dataset, connections, storm, go, lob_mode, lob_chunk_size, document_encoding,
+                                                                 routing, worker_count or thread_count, schedule)))
+        threads.append(thread)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if owned:
+        connections.close()
+
+
+def process_result(counters, process, thread_count):
+    workers = range(process * thread_count, (process + 1) * thread_count)
+    connection_time = max(counters.get(worker, CONNECTION_TIME) for worker in workers)
+    rows_inserted = int(sum(counters.get(worker, ROWS) for worker in workers))
+    insertion_time = max(counters.get(worker, INSERTION_TIME) for worker in workers)
+    rows_per_sec = int(rows_inserted / insertion_time) if insertion_time != 0 else 0
+    return (connection_time, rows_inserted, insertion_time, rows_per_sec,)
+
+
+def window_result(counters, process, thread_count, baseline, final, seconds):
+    # As process_result, counting only the rows inserted in the measurement window
+    workers = range(process * thread_count, (process + 1) * thread_count)
+    connection_time = max(counters.get(worker, CONNECTION_TIME) for worker in workers)
+    rows_inserted = int(counters.rows(workers, baseline, final))
+    rows_per_sec = int(rows_inserted / seconds) if seconds > 0 else 0
+    return (connection_time, rows_inserted, seconds, rows_per_sec,)
+
+
+def sample_progress(counters, series, processes, thread_count, baseline=None):
+    now = time.time()
+    if series is not None:
+        for process in range(processes):
+            series.add(process, now, counters.rows(range(process * thread_count, (process + 1) * thread_count), baseline))
+    logging.debug("Rows inserted so far : {:,.0f} in {:,.0f} batches".format(counters.total(ROWS), counters.total(BATCHES)))
+
+
+def run_engine(username, password, connect_string, test_type, processes, row_count, batch_size, commit_size, thread_count, async_commit, image_multiplier, generator='python', config=None, series=None, latencies=None, converged=None, dataset=None, producers=None, in_flight=None,
+               connection_mode=connectionpool.DEFAULT_CONNECTION_MODE, pool_size=None, storm=False, key_offset=0, warmup=0, measure=None, rampdown=0, window=None,
+               lob_mode=None, lob_chunk_size=None, document_encoding=None, routing=None, on_measure=None, pool=None, schedule=None, steps=None, on_ready=None):
+    # key_offset moves every key past those inserted by other load generators, see distributed.py.
+    # Workers connect and wait at a barrier before inserting. With a warm-up or a measurement window only the
+    # rows and latencies between warmup seconds after the start and measure seconds later are counted, and the
+    # workers are stopped rampdown seconds after that, so neither ramp-up nor ramp-down skews the numbers.
+    # window, if given, is filled with the start and end of what was measured, and on_measure is called with
+    # "start" and "end" as the measurement starts and ends (e.g. to snapshot database statistics). on_ready, if
+    # given, is called once every worker has connected and the workers only go on when it returns (e.g. at a start
+    # time agreed with other load generators, see distributed.py), if it raises they stop without inserting. With a pool
+    # (see workerpool.py) the point runs in its warm worker processes instead of processes started for it.
+    # With a rate schedule (see ratecontrol.py) rows are offered at the schedule's rate until it ends, and steps,
+    # if given, is filled with the target and achieved rates and intended response times of each of its steps
+    if test_type not in TABLES:
+        raise ValueError("The python engine does not support schema type {}".format(test_type))
+    table_generator = None
+    if generator == 'numpy' or generator == 'replay':
+        if test_type not in VECTOR_GENERATED:
+            raise ValueError("The {} generator does not support schema type {}".format(generator, test_type))
+    if generator == 'numpy':
+        table_generator = compile_generator(config)
+    if generator == 'replay' and dataset is None:
+        raise ValueError("The replay generator needs a dataset built by datasetcache")
+    if connection_mode not in connectionpool.CONNECTION_MODES:
+        raise ValueError("Unknown connection mode {}".format(connection_mode))
+    if lob_mode is not None and test_type != 'relational':
+        raise ValueError("LOB modes write the relational schema's image column")
+    if document_encoding is not None and test_type not in DOCUMENT_TYPES:
+        raise ValueError("Document encodings only apply to the document schemas")
+    if document_encoding == 'binary' and storm:
+        raise ValueError("Binary documents are encoded by a worker's connection, which a connection storm doesn't keep")
+    if routing is not None and routing not in partitioning.ROUTING_MODES:
+        raise ValueError("Unknown routing mode {}".format(routing))
+    if routing not in (None, partitioning.DEFAULT_ROUTING) and not partitioning.routable(test_type):
+        raise ValueError("Schema type {} is hash partitioned, so its rows can only be routed randomly".format(test_type))
+    target, extra_args = run_process, (connection_mode, connectionpool.parse_pool_size(pool_size, thread_count), storm, lob_mode, lob_chunk_size)
+    if in_flight is not None:
+        if connection_mode != 'dedicated' or storm or lob_mode is not None:
+            raise ValueError("The asyncio engine only supports dedicated connections without a LOB mode")
+        # asyncio engine : thread_count connections per process shared by producers logical producers
+        import asyncingest
+        target, extra_args = asyncingest.run_process, (producers, in_flight)
+    if schedule is not None and (in_flight is not None or storm or warmup > 0 or measure is not None):
+        raise ValueError("Rate schedules run the threaded engine without connection storms, and measure their own steps rather than a window")
+    if schedule is not None and schedule.total_rows() > processes * row_count:
+        logging.warning("The schedule offers {:,.0f} rows but the point only has {:,}, increase the scale".format(schedule.total_rows(), processes * row_count))
+    if pool is not None and (in_flight is not None or storm):
+        raise ValueError("Worker pools run the threaded engine without connection storms")
+    logging.debug("Python engine : {} processes of {} {} inserting {} rows each into {}".format(processes, thread_count, "threads" if in_flight is None else "connections", row_count, TABLES[test_type][0]))
+    if pool is not None:
+        # stop ends the point early, e.g. once converged(series) reports the throughput is known well enough
+        counters, histograms, stop, go = pool.prepare(processes, thread_count)
+        workers = pool.run_point({"username": username, "password": password, "connect_string": connect_string, "test_type": test_type, "row_count": row_count, "batch_size": batch_size,
+                                  "commit_size": commit_size, "thread_count": thread_count, "async_commit": async_commit, "image_multiplier": image_multiplier,
+                                  "config": config if generator == 'numpy' else None, "dataset": dataset,
+                                  "connection_mode": connection_mode, "pool_size": extra_args[1], "lob_mode": lob_mode, "lob_chunk_size": lob_chunk_size, "key_offset": key_offset,
+                                  "document_encoding": document_encoding, "routing": routing, "worker_count": processes * thread_count, "schedule": schedule})
+    else:
+        counters = SharedCounters(processes * thread_count)
+        histograms = SharedHistograms(processes * thread_count)
+        # Set to end the point early, e.g. once converged(series) reports the throughput is known well enough
+        stop = multiprocessing.Event()
+        go = multiprocessing.Event()
+        kwargs = {"key_offset": key_offset, "go": go, "document_encoding": document_encoding, "routing": routing, "worker_count": processes * thread_count}
+        if schedule is not None:
+            kwargs["schedule"] = schedule
+        workers = []
+        for process in range(processes):
+            worker = multiprocessing.Process(target=target, args=(username, password, connect_string, test_type, process, row_count, batch_size, commit_size, thread_count, async_commit, image_multiplier, counters, histograms, stop, table_generator, dataset) + extra_args,
+                                             kwargs=kwargs)
+            workers.append(worker)
+        for worker in workers:
+            worker.start()
+    running = list(workers)
+    while running and counters.total(READY) + counters.total(FAILURES) < counters.workers:
+        running[0].join(BARRIER_POLL)
+        running = [worker for worker in running if worker.is_alive()]
+    if on_ready is not None:
+        try:
+            on_ready()
+        except Exception:
+            stop.set()
+            go.set()
+            for worker in running:
+                worker.join()
+            raise
+    windowed = warmup > 0 or measure is not None
+    baseline, final, end = None, None, None
+    if windowed and warmup == 0:
+        baseline = histograms.snapshot(), counters.snapshot()
+    if on_measure is not None and warmup == 0:
+        on_measure("start")
+    go.set()
+    measure_start = time.time() + warmup
+    measure_end = measure_start + measure if measure is not None else None
+    logging.debug("All workers ready, measuring from {:.3f}s to {}".format(warmup, "the end" if measure is None else "{:.3f}s".format(warmup + measure)))
+    if series is not None:
+        series.start = measure_start
+    next_sample = measure_start + POLL_INTERVAL
+    # Snapshots as each step of the schedule but the last ends. The last runs on until the workers have sent any
+    # backlog, so rows that were due but couldn't be sent in time are still counted
+    step_ends = [measure_start + offset + seconds for offset, seconds in schedule.steps[:-1]] if schedule is not None else []
+    step_snapshots = []
+    while running:
+        deadline = next_sample
+        if len(step_snapshots) < len(step_ends):
+            deadline = min(deadline, step_ends[len(step_snapshots)])
+        if windowed and baseline is None:
+            deadline = min(deadline, measure_start)
+        if measure_end is not None and not stop.is_set():
+            deadline = min(deadline, measure_end if final is None else measure_end + rampdown)
+        running[0].join(max(0, deadline - time.time()))
+        running = [worker for worker in running if worker.is_alive()]
+        now = time.time()
+        if len(step_snapshots) < len(step_ends) and now >= step_ends[len(step_snapshots)]:
+            snapshot = histograms.snapshot(), counters.snapshot(), now
+            while len(step_snapshots) < len(step_ends) and now >= step_ends[len(step_snapshots)]:
+                step_snapshots.append(snapshot)
+        if windowed and baseline is None and now >= measure_start:
+            baseline = histograms.snapshot(), counters.snapshot()
+            if on_measure is not None:
+                on_measure("start")
+        if measure_end is not None and final is None and now >= measure_end:
+            final, end = (histograms.snapshot(), counters.snapshot()), now
+            if on_measure is not None:
+                on_measure("end")
+        if measure_end is not None and not stop.is_set() and now >= measure_end + rampdown:
+            logging.debug("Ramp-down over, stopping workers")
+            stop.set()
+        if now >= next_sample or not running:
+            next_sample += POLL_INTERVAL
+            if final is None and now >= measure_start:
+                sample_progress(counters, series, processes, thread_count, baseline[1] if baseline else None)
+                if converged is not None and series is not None and not stop.is_set() and converged(series):
+                    logging.debug("Throughput has converged, stopping workers")
+                    stop.set()
+    for worker in workers:
+        if worker.exitcode != 0:
+            raise RuntimeError("Worker process {} failed with exit code {}".format(worker.pid, worker.exitcode))
+    if counters.total(FAILURES) > 0:
+        raise RuntimeError("{:.0f} of {} workers failed".format(counters.total(FAILURES), counters.workers))
+    if final is None:
+        final, end = (histograms.snapshot(), counters.snapshot()), time.time()
+        if baseline is None and windowed:
+            logging.warning("Workers finished during the warm-up, nothing was measured")
+            baseline, end = final, measure_start
+            if on_measure is not None:
+                on_measure("start")
+        elif measure_end is not None:
+            logging.warning("Workers finished {:.1f}s into the {:.1f}s measurement window, increase the scale".format(end - measure_start, measure))
+        if on_measure is not None:
+            on_measure("end")
+    if window is not None:
+        window["start"], window["end"] = measure_start, end
+    if steps is not None and schedule is not None:
+        # A step the workers finished part way through ends with them, any after it weren't run
+        if len(step_snapshots) < len(schedule.steps) and end > measure_start + schedule.steps[len(step_snapshots)][0]:
+            step_snapshots.append((final[0], final[1], end))
+        previous = None, None, measure_start
+        for (offset, seconds), snapshot in zip(schedule.steps, step_snapshots):
+            rows = counters.rows(range(counters.workers), previous[1], snapshot[1])
+            elapsed = snapshot[2] - previous[2]
+            steps.append({"offset": offset, "seconds": seconds, "target": schedule.target(offset, seconds), "rows": int(rows), "achieved": rows / elapsed if elapsed > 0 else 0.0,
+                          "latency": histograms.histogram(INTENDED_LATENCY, previous[0], snapshot[0])})
+            previous = snapshot
+    if latencies is not None:
+        for latency in LATENCIES:
+            # Connections are made before the barrier, so connect latencies are kept whatever the window
+            histogram = histograms.histogram(latency, baseline[0] if baseline and latency != CONNECT_LATENCY else None, final[0])
+            if histogram.count() > 0:
+                latencies[LATENCY_NAMES[latency]] = histogram
+    if windowed:
+        return [window_result(counters, process, thread_count, baseline[1], final[1], end - measure_start) for process in range(processes)]
+    return [process_result(counters, process, thread_count) for process in range(processes)]
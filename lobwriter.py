@@ -0,0 +1,124 @@
+from __future__ import print_function
+
+import time
+
+import ingestengine
+
+LOB_MODES = ['inline', 'templob', 'chunked']
+DEFAULT_CHUNK_SIZE = 32768
+
+# LOB ingest for the relational schema's NUMBER_PLATE_IMAGE, the last column of the table. The image for a
+# point is built once into a LobPayload, and every row binds or streams that same buffer :
+#   inline  - the image is bound as a value in the array insert (what the datagenerator does)
+#   templob - a temporary LOB is written per row from the buffer and the LOBs are bound
+#   chunked - rows are inserted with an empty LOB and the image streamed into each in chunk sized writes
+
+
+class LobPayload(object):
+    # Chunks are cut from the payload once, so writing a LOB never copies any of it
+
+    def __init__(self, image_multiplier, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.text = ingestengine.IMAGE_DATA * int(image_multiplier)
+        self.data = self.text.encode("ascii")
+        self.size = len(self.data)
+        self.text_chunks = [(offset, self.text[offset:offset + chunk_size]) for offset in range(0, self.size, chunk_size)]
+        view = memoryview(self.data)
+        self.data_chunks = [view[offset:offset + chunk_size] for offset in range(0, self.size, chunk_size)]
+
+
+def clob_type(driver):
+    return getattr(driver, "DB_TYPE_CLOB", None) or driver.CLOB
+
+
+class InlineWriter(object):
+
+    def __init__(self, driver, table_name, columns, payload):
+        self.statement = ingestengine.insert_statement(driver, table_name, columns)
+        self.payload = payload
+
+    def insert(self, connection, cursor, rows):
+        cursor.executemany(self.statement, [row[:-1] + (self.payload.text,) for row in rows])
+        return None
+
+
+class TemporaryLobWriter(object):
+
+    def __init__(self, driver, table_name, columns, payload):
+        self.driver = driver
+        self.statement = ingestengine.insert_statement(driver, table_name, columns)
+        self.payload = payload
+
+    def insert(self, connection, cursor, rows):
+        start = time.time()
+        lobs = []
+        for _ in rows:
+            lob = connection.createlob(clob_type(self.driver))
+            lob.write(self.payload.text)
+            lobs.append(lob)
+        lob_time = time.time() - start
+        cursor.executemany(self.statement, [row[:-1] + (lob,) for row, lob in zip(rows, lobs)])
+        return lob_time
+
+
+class ChunkedWriter(object):
+    # The empty LOBs come back from the array insert through DML returning, then each is filled in turn
+
+    def __init__(self, driver, table_name, columns, payload):
+        self.driver = driver
+        self.payload = payload
+        self.statement = "INSERT INTO {} ({}) VALUES ({}, EMPTY_CLOB()) RETURNING {} INTO :{}".format(
+            table_name, ", ".join(columns), ", ".join(":{}".format(i + 1) for i in range(len(columns) - 1)), columns[-1], len(columns))
+
+    def insert(self, connection, cursor, rows):
+        locators = cursor.var(clob_type(self.driver), arraysize=len(rows))
+        cursor.setinputsizes(*([None] * (len(rows[0]) - 1) + [locators]))
+        cursor.executemany(self.statement, [row[:-1] for row in rows])
+        start = time.time()
+        for index in range(len(rows)):
+            lob = locators.getvalue(index)[0]
+            for offset, chunk in self.payload.text_chunks:
+                # LOB offsets count from 1
+                lob.write(chunk, offset + 1)
+        return time.time() - start
+
+
+class SqliteChunkedWriter(object):
+    # Stand-in for ChunkedWriter : a zeroblob of the image's size is inserted, then written through SQLite's
+    # incremental blob I/O (Python 3.11 and later)
+
+    def __init__(self, driver, table_name, columns, payload):
+        self.table_name = table_name
+        self.column = columns[-1]
+        self.payload = payload
+        self.statement = "INSERT INTO {} ({}) VALUES ({}, zeroblob(?))".format(table_name, ", ".join(columns), ", ".join(["?"] * (len(columns) - 1)))
+
+    def insert(self, connection, cursor, rows):
+        lob_time = 0.0
+        for row in rows:
+            cursor.execute(self.statement, row[:-1] + (self.payload.size,))
+            start = time.time()
+            with connection.blobopen(self.table_name, self.column, cursor.lastrowid) as blob:
+                for chunk in self.payload.data_chunks:
+                    blob.write(chunk)
+            lob_time += time.time() - start
+        return lob_time
+
+
+def supported(lob_mode, connect_string):
+    if not connect_string.startswith(ingestengine.SQLITE_PREFIX):
+        return True
+    import sqlite3
+    return lob_mode == 'inline' or (lob_mode == 'chunked' and hasattr(sqlite3.Connection, "blobopen"))
+
+
+def lob_writer(lob_mode, connect_string, table_name, columns, payload):
+    if not supported(lob_mode, connect_string):
+        raise ValueError("LOB mode {} is not supported by this database or python version".format(lob_mode))
+    driver = ingestengine.get_driver(connect_string)
+    if lob_mode == 'inline':
+        return InlineWriter(driver, table_name, columns, payload)
+    if lob_mode == 'templob':
+        return TemporaryLobWriter(driver, table_name, columns, payload)
+    if connect_string.startswith(ingestengine.SQLITE_PREFIX):
+        return SqliteChunkedWriter(driver, table_name, columns, payload)
+    return ChunkedWriter(driver, table_name, columns, payload)
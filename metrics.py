@@ -0,0 +1,200 @@
+from __future__ import division
+
+import bisect
+import math
+
+DEFAULT_INTERVAL = 1.0
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2 == 1:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+class ThroughputSeries(object):
+    # Cumulative row counts sampled from each worker, turned into rows/sec per fixed interval.
+    # Samples can arrive at any time (scraped stdout lines or polled counters), so the cumulative
+    # count is interpolated at each interval boundary
+
+    def __init__(self, start, interval=DEFAULT_INTERVAL):
+        self.start = start
+        self.interval = interval
+        self.samples = {}
+
+    def add(self, worker, timestamp, cumulative_rows):
+        self.samples.setdefault(worker, [(0.0, 0)]).append((timestamp - self.start, cumulative_rows))
+
+    def merge(self, samples, prefix):
+        # Samples from another series with the same start, e.g. from a remote agent, keyed apart by prefix
+        for worker, worker_samples in samples.items():
+            self.samples["{}:{}".format(prefix, worker)] = [tuple(sample) for sample in worker_samples]
+
+    def rows_at(self, worker, elapsed):
+        samples = self.samples[worker]
+        index = bisect.bisect_left(samples, (elapsed,))
+        if index >= len(samples):
+            return samples[-1][1]
+        sample_time, sample_rows = samples[index]
+        if index == 0 or sample_time == elapsed:
+            return sample_rows
+        previous_time, previous_rows = samples[index - 1]
+        return previous_rows + (sample_rows - previous_rows) * (elapsed - previous_time) / (sample_time - previous_time)
+
+    def intervals(self):
+        # Only complete intervals, a trailing partial one would understate the rate
+        if not self.samples:
+            return 0
+        last_sample = max(samples[-1][0] for samples in self.samples.values())
+        return int(last_sample // self.interval)
+
+    def worker_rates(self, worker):
+        rates = []
+        for interval in range(self.intervals()):
+            rows = self.rows_at(worker, (interval + 1) * self.interval) - self.rows_at(worker, interval * self.interval)
+            rates.append(rows / self.interval)
+        return rates
+
+    def aggregate_rates(self):
+        rates = [0.0] * self.intervals()
+        for worker in self.samples:
+            for interval, rate in enumerate(self.worker_rates(worker)):
+                rates[interval] += rate
+        return rates
+
+    def summary(self):
+        rates = self.aggregate_rates()
+        if not rates:
+            return 0, 0, 0
+        return min(rates), median(rates), max(rates)
+
+
+# Log-linear buckets in the style of HdrHistogram : values below 2 * HALF_BUCKETS microseconds get their
+# own bucket, above that each power of two is split into HALF_BUCKETS buckets, so every recorded value
+# is within 1% of its bucket. Histograms with the same layout merge by adding their counts
+HALF_BUCKETS = 128
+MAX_SHIFT = 32
+BUCKET_COUNT = (MAX_SHIFT + 2) * HALF_BUCKETS
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(microseconds):
+    value = max(0, int(microseconds))
+    shift = max(0, value.bit_length() - HALF_BUCKETS.bit_length())
+    if shift == 0:
+        return value
+    return min(BUCKET_COUNT - 1, (shift + 1) * HALF_BUCKETS + (value >> shift) - HALF_BUCKETS)
+
+
+def bucket_value(index):
+    # Highest value that falls in the bucket
+    if index < 2 * HALF_BUCKETS:
+        return index
+    shift = index // HALF_BUCKETS - 1
+    mantissa = index - shift * HALF_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram(object):
+
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts is not None else [0] * BUCKET_COUNT
+
+    def record(self, seconds):
+        self.counts[bucket_index(seconds * 1000000)] += 1
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        return self
+
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, percentile):
+        # In seconds, None when nothing has been recorded
+        total = self.count()
+        if total == 0:
+            return None
+        target = max(1, total * percentile / 100.0)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return bucket_value(index) / 1000000.0
+        return self.maximum()
+
+    def count_above(self, seconds):
+        # Values in buckets above the one seconds falls in
+        return sum(self.counts[bucket_index(seconds * 1000000) + 1:])
+
+    def maximum(self):
+        for index in range(BUCKET_COUNT - 1, -1, -1):
+            if self.counts[index] != 0:
+                return bucket_value(index) / 1000000.0
+        return None
+
+    def summary(self):
+        return [self.percentile(percentile) for percentile in PERCENTILES] + [self.maximum()]
+
+    def statistics(self):
+        # As sample_statistics, taking each recorded value as its bucket's value
+        count = self.count()
+        if count == 0:
+            return 0, 0.0, 0.0
+        mean = sum(bucket_value(index) * recorded for index, recorded in enumerate(self.counts) if recorded) / 1000000.0 / count
+        variance = sum((bucket_value(index) / 1000000.0 - mean) ** 2 * recorded for index, recorded in enumerate(self.counts) if recorded) / max(1, count - 1)
+        return count, mean, variance
+
+
+def sample_statistics(values):
+    # Count, mean and sample variance
+    if not values:
+        return 0, 0.0, 0.0
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1) if len(values) > 1 else 0.0
+    return len(values), mean, variance
+
+
+def confidence_interval(values, z=1.96):
+    # Mean and half width of the (normal approximation) confidence interval
+    count, mean, variance = sample_statistics(values)
+    if count < 2:
+        return mean, float("inf")
+    return mean, z * math.sqrt(variance / count)
+
+
+def significant_difference(statistics, other_statistics, z=1.96):
+    # Welch's test with a normal approximation, statistics as returned by sample_statistics
+    count, mean, variance = statistics
+    other_count, other_mean, other_variance = other_statistics
+    if count < 2 or other_count < 2:
+        return False
+    standard_error = math.sqrt(variance / count + other_variance / other_count)
+    if standard_error == 0:
+        return mean != other_mean
+    return abs(mean - other_mean) / standard_error > z
+
+
+def binomial_tail(count, successes, probability):
+    # P(X >= successes) for X ~ Binomial(count, probability), summed in logs so large counts don't underflow
+    if successes <= 0:
+        return 1.0
+    if probability <= 0:
+        return 0.0
+    log_p, log_q = math.log(probability), math.log1p(-probability)
+    total = 0.0
+    for value in range(successes, count + 1):
+        term = math.exp(math.lgamma(count + 1) - math.lgamma(value + 1) - math.lgamma(count - value + 1) + value * log_p + (count - value) * log_q)
+        total += term
+        if value > count * probability and term < total * 1e-12:
+            break
+    return min(1.0, total)
+
+
+def tail_increase(histogram, seconds, share, significance=0.01):
+    # Whether significantly more than share of the histogram's values lie above seconds, a one-sided binomial
+    # test. E.g. with a baseline's p99 and share 0.01, whether this run's p99 has really moved up
+    return binomial_tail(histogram.count(), histogram.count_above(seconds), share) < significance
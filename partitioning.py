@@ -0,0 +1,78 @@
+from __future__ import print_function
+
+ROUTING_MODES = ['random', 'grouped', 'affinity']
+DEFAULT_ROUTING = 'random'
+
+# Batch routing by the partitioning in createtables.sql :
+#   random   - rows go in the order generated, spraying every batch across the partitions
+#   grouped  - each batch is ordered by target partition, so the array insert visits every partition once
+#   affinity - as grouped, with each worker's keys moved into partitions of its own so no two workers
+#              insert into (and contend for the index blocks of) the same partition
+
+
+class IntervalPartitioning(object):
+    # PARTITION BY RANGE (key) INTERVAL (interval) : one partition per interval of keys
+
+    def __init__(self, interval, low, high):
+        self.interval = interval
+        self.partitions = list(range(low // interval, high // interval + 1))
+
+    def partition(self, key):
+        return int(key) // self.interval
+
+    def key_for(self, key, partition):
+        # key moved into partition, keeping its offset within the interval
+        return partition * self.interval + int(key) % self.interval
+
+
+# Partition key column and partitioning of each schema type's table that rows can be routed by. The ANPR ids
+# are drawn from 1000 to 30000. SIMPLETABLE and INSERTABLE are hash partitioned, and the hash Oracle places
+# rows with isn't one the engines can compute, so their rows are only ever sent in random order
+ANPR_PARTITIONING = IntervalPartitioning(1000, 1000, 30000)
+PARTITIONING = {
+    'relational': (0, ANPR_PARTITIONING),
+    'document': (0, ANPR_PARTITIONING),
+    'document_light': (0, ANPR_PARTITIONING),
+}
+
+
+def owned_partitions(partitions, worker, workers):
+    # Partitions dealt out round robin, workers sharing them once there are more workers than partitions
+    if workers > len(partitions):
+        return [partitions[worker % len(partitions)]]
+    return partitions[worker::workers]
+
+
+def routable(test_type):
+    return test_type in PARTITIONING
+
+
+class Router(object):
+
+    def __init__(self, test_type, routing, worker, workers):
+        if routing not in ROUTING_MODES:
+            raise ValueError("Unknown routing mode {}".format(routing))
+        if not routable(test_type):
+            raise ValueError("Schema type {} is hash partitioned, so its rows can only be routed randomly".format(test_type))
+        self.column, self.scheme = PARTITIONING[test_type]
+        self.owned = owned_partitions(self.scheme.partitions, worker, workers) if routing == 'affinity' else None
+
+    def assign(self, key):
+        if self.owned is None:
+            return key
+        return self.scheme.key_for(key, self.owned[int(key) % len(self.owned)])
+
+    def group(self, rows):
+        # Stable, so rows keep their generated order within a partition
+        rows.sort(key=lambda row: self.scheme.partition(row[self.column]))
+        return rows
+
+    def route(self, rows):
+        if self.owned is not None:
+            column = self.column
+            rows = [row[:column] + (self.assign(row[column]),) + row[column + 1:] for row in rows]
+        return self.group(list(rows))
+
+
+def routed_rows(generate_rows, router, rng, first_key, row_count, image_multiplier):
+    return router.route(generate_rows(rng, first_key, row_count, image_multiplier))
@@ -0,0 +1,100 @@
+from __future__ import print_function, division
+
+DEFAULT_STEP_SECONDS = 10.0
+TRACE_PREFIX = "trace:"
+
+# Open-loop load for the python engine : rows are offered at the rate a schedule sets, as cameras produce them,
+# rather than as fast as the database takes them. A schedule is a list of (seconds, rows/sec) segments :
+#   constant - one rate held for a step, e.g. 5000
+#   stepped  - rates held for a step each, e.g. 1000,2000,4000
+#   trace    - trace:<file> with the rows/sec of each second of recorded traffic, one per line (or the last
+#              field of a CSV line), reported in steps of the step length
+# Every worker offers an equal share, its batches interleaved with the other workers'. A batch is due once
+# the schedule has produced its last row, and its latency is measured from then rather than from when it
+# was actually sent, so a database that falls behind is charged for the backlog (no coordinated omission)
+
+
+class RateSchedule(object):
+
+    def __init__(self, segments, steps=None):
+        self.segments = [(float(seconds), float(rate)) for seconds, rate in segments]
+        self.duration = sum(seconds for seconds, rate in self.segments)
+        # (offset, seconds) of each step reported on, by default each segment
+        self.steps = steps or []
+        if not steps:
+            offset = 0.0
+            for seconds, rate in self.segments:
+                self.steps.append((offset, seconds))
+                offset += seconds
+
+    def rows_at(self, elapsed):
+        # Rows offered in the first elapsed seconds
+        rows, start = 0.0, 0.0
+        for seconds, rate in self.segments:
+            if elapsed <= start:
+                break
+            rows += rate * min(seconds, elapsed - start)
+            start += seconds
+        return rows
+
+    def total_rows(self):
+        return self.rows_at(self.duration)
+
+    def target(self, offset, seconds):
+        return (self.rows_at(offset + seconds) - self.rows_at(offset)) / seconds if seconds > 0 else 0.0
+
+    def time_for(self, rows):
+        # Seconds into the schedule at which rows rows have been offered, None once it is over
+        offered, start = 0.0, 0.0
+        for seconds, rate in self.segments:
+            if rate > 0 and offered + rate * seconds >= rows:
+                return start + max(0.0, rows - offered) / rate
+            offered += rate * seconds
+            start += seconds
+        return None
+
+
+def read_trace(path):
+    rates = []
+    with open(path) as trace:
+        for line in trace:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                rates.append(float(line.split(",")[-1]))
+    return rates
+
+
+def parse_schedule(spec, step_seconds=DEFAULT_STEP_SECONDS):
+    if step_seconds <= 0:
+        raise ValueError("Rate steps must last more than 0 seconds")
+    if spec.startswith(TRACE_PREFIX):
+        rates = read_trace(spec[len(TRACE_PREFIX):])
+        segments = [(1, rate) for rate in rates]
+        steps = []
+        offset = 0.0
+        while offset < len(rates):
+            steps.append((offset, min(step_seconds, len(rates) - offset)))
+            offset += step_seconds
+    else:
+        rates = [float(rate) for rate in spec.split(",")]
+        segments = [(step_seconds, rate) for rate in rates]
+        steps = None
+    if not rates or min(rates) < 0 or max(rates) <= 0:
+        raise ValueError("Rate schedule {} needs rates of at least 0 rows/sec and one above 0".format(spec))
+    return RateSchedule(segments, steps)
+
+
+class Pacer(object):
+    # When each of one worker's batches is due, as an absolute time, given the time the schedule started
+
+    def __init__(self, schedule, worker, workers, batch_size, start):
+        self.schedule = schedule
+        self.worker = worker
+        self.workers = workers
+        self.batch_size = batch_size
+        self.start = start
+
+    def due(self, rows_sent):
+        # The batch after the worker's first rows_sent rows, None once the schedule is over
+        offset = self.schedule.time_for(rows_sent * self.workers + (self.worker + 1) * self.batch_size)
+        return None if offset is None else self.start + offset
@@ -0,0 +1,193 @@
+from __future__ import print_function, division
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+
+import metrics
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "ingest_results.db")
+DEFAULT_THRESHOLD = 0.05
+# Fewer latencies than this in either run and a p99 says too little to compare, e.g. connect latencies with one
+# sample per worker
+MINIMUM_LATENCY_SAMPLES = 100
+POINT_KEY = ("processes", "thread_count", "commit_size", "batch_size", "image_multiplier", "async", "connection_mode", "lob_mode", "document_encoding", "routing")
+
+DDL = [
+    "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started TEXT, git_revision TEXT, host TEXT, schema_type TEXT, engine TEXT, parameters TEXT)",
+    "CREATE TABLE IF NOT EXISTS points (run_id TEXT, point INTEGER, processes INTEGER, thread_count INTEGER, commit_size INTEGER, batch_size INTEGER, image_multiplier INTEGER, async INTEGER, "
+    "rows_inserted INTEGER, real_time REAL, insert_time REAL, rows_per_sec REAL, interval_rates TEXT, latencies TEXT, connection_mode TEXT DEFAULT 'dedicated', lob_mode TEXT DEFAULT '', document_encoding TEXT DEFAULT '', routing TEXT DEFAULT 'random', client TEXT, db_stats TEXT, reset_time REAL, rate_steps TEXT, PRIMARY KEY (run_id, point))",
+    "CREATE TABLE IF NOT EXISTS baselines (name TEXT PRIMARY KEY, run_id TEXT)",
+]
+
+
+def git_revision():
+    try:
+        output = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.realpath(__file__)), stderr=subprocess.STDOUT)
+        return output.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def encode_histogram(histogram):
+    # Only the occupied buckets, most of a latency histogram is empty
+    return dict((index, count) for index, count in enumerate(histogram.counts) if count != 0)
+
+
+def decode_histogram(encoded):
+    histogram = metrics.LatencyHistogram()
+    for index, count in encoded.items():
+        histogram.counts[int(index)] = count
+    return histogram
+
+
+class Run(object):
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+        self.points = 0
+
+    def add_point(self, processes, thread_count, commit_size, batch_size, image_multiplier, async_commit, rows_inserted, real_time, insert_time, rows_per_sec, series, latencies, connection_mode='dedicated', lob_mode=None, document_encoding=None, routing='random', client=None, db_stats=None, reset_time=None, rate_steps=None):
+        # Committed straight away so a crash part way through a sweep keeps every completed point. Points
+        # without a LOB mode or document encoding store an empty one, so keys still sort and compare
+        self.points += 1
+        self.store.connection.execute("INSERT INTO points (run_id, point, processes, thread_count, commit_size, batch_size, image_multiplier, async, rows_inserted, real_time, insert_time, rows_per_sec, "
+                                      "interval_rates, latencies, connection_mode, lob_mode, document_encoding, routing, client, db_stats, reset_time, rate_steps) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                      (self.run_id, self.points, int(processes), int(thread_count), int(commit_size), int(batch_size), int(image_multiplier), int(bool(async_commit)),
+                                       rows_inserted, real_time, insert_time, rows_per_sec,
+                                       json.dumps(series.aggregate_rates()),
+                                       json.dumps(dict((operation, encode_histogram(histogram)) for operation, histogram in latencies.items())),
+                                       connection_mode, lob_mode or '', document_encoding or '', routing,
+                                       json.dumps(client) if client is not None else None,
+                                       json.dumps(db_stats) if db_stats is not None else None,
+                                       reset_time,
+                                       json.dumps(rate_steps) if rate_steps is not None else None))
+        self.store.connection.commit()
+
+
+class ResultStore(object):
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.connection = sqlite3.connect(path)
+        for statement in DDL:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def start_run(self, schema_type, engine, parameters):
+        run_id = "{}-{}".format(time.strftime("%Y%m%d%H%M%S"), uuid.uuid4().hex[:6])
+        self.connection.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (run_id, time.strftime("%Y-%m-%d %H:%M:%S"), git_revision(), socket.gethostname(), schema_type, engine, json.dumps(parameters, sort_keys=True)))
+        self.connection.commit()
+        logging.debug("Recording results as run {}".format(run_id))
+        return Run(self, run_id)
+
+    def name_baseline(self, name, run_id):
+        self.connection.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?)", (name, run_id))
+        self.connection.commit()
+
+    def baseline_run(self, name):
+        row = self.connection.execute("SELECT run_id FROM baselines WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError("No baseline named {}".format(name))
+        return row[0]
+
+    def run_kind(self, run_id):
+        row = self.connection.execute("SELECT schema_type, engine FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError("No run {}".format(run_id))
+        return tuple(row)
+
+    def runs(self):
+        return self.connection.execute("SELECT r.run_id, r.started, r.git_revision, r.host, r.schema_type, r.engine, COUNT(p.point), "
+                                       "(SELECT GROUP_CONCAT(b.name) FROM baselines b WHERE b.run_id = r.run_id) "
+                                       "FROM runs r LEFT JOIN points p ON p.run_id = r.run_id GROUP BY r.run_id ORDER BY r.started").fetchall()
+
+    def points(self, run_id):
+        points = {}
+        cursor = self.connection.execute("SELECT {}, rows_per_sec, interval_rates, latencies FROM points WHERE run_id = ? ORDER BY point".format(", ".join(POINT_KEY)), (run_id,))
+        for row in cursor:
+            # A point repeated within a run keeps its last measurement
+            points[tuple(row[:len(POINT_KEY)])] = (row[len(POINT_KEY)],
+                                                   json.loads(row[len(POINT_KEY) + 1]),
+                                                   dict((operation, decode_histogram(encoded)) for operation, encoded in json.loads(row[len(POINT_KEY) + 2]).items()))
+        return points
+
+    def compare(self, run_id, baseline, threshold=DEFAULT_THRESHOLD):
+        # Throughput regresses when the change is beyond threshold and the interval samples differ significantly.
+        # A p99 regresses when it is up by more than threshold and significantly more than 1% of this run's
+        # latencies are above the baseline's p99, a test on the tail itself rather than on the histograms' means.
+        # p99s of fewer than MINIMUM_LATENCY_SAMPLES latencies aren't compared. Only runs of the same schema type
+        # and engine are compared
+        baseline_run = self.baseline_run(baseline)
+        if self.run_kind(run_id) != self.run_kind(baseline_run):
+            raise ValueError("Run {} ({} schema, {} engine) can't be compared with baseline {} ({} schema, {} engine)".format(run_id, *(self.run_kind(run_id) + (baseline,) + self.run_kind(baseline_run))))
+        baseline_points = self.points(baseline_run)
+        comparison = []
+        for key, (rows_per_sec, rates, latencies) in sorted(self.points(run_id).items()):
+            if key not in baseline_points:
+                continue
+            baseline_rows_per_sec, baseline_rates, baseline_latencies = baseline_points[key]
+            change = (rows_per_sec - baseline_rows_per_sec) / baseline_rows_per_sec if baseline_rows_per_sec else 0
+            significant = metrics.significant_difference(metrics.sample_statistics(rates), metrics.sample_statistics(baseline_rates))
+            comparison.append(key + ("Rows/sec", "{0:,.0f}".format(baseline_rows_per_sec), "{0:,.0f}".format(rows_per_sec), "{0:+.1%}".format(change),
+                                     "REGRESSION" if change < -threshold and significant else ""))
+            for operation in sorted(set(latencies) & set(baseline_latencies)):
+                histogram, baseline_histogram = latencies[operation], baseline_latencies[operation]
+                if min(histogram.count(), baseline_histogram.count()) < MINIMUM_LATENCY_SAMPLES:
+                    continue
+                p99, baseline_p99 = histogram.percentile(99), baseline_histogram.percentile(99)
+                if not baseline_p99:
+                    continue
+                change = (p99 - baseline_p99) / baseline_p99
+                comparison.append(key + ("{} p99 (ms)".format(operation), "{0:,.3f}".format(baseline_p99 * 1000), "{0:,.3f}".format(p99 * 1000), "{0:+.1%}".format(change),
+                                         "REGRESSION" if change > threshold and metrics.tail_increase(histogram, baseline_p99, 0.01) else ""))
+        return comparison
+
+
+def print_results(results, *description):
+    # prettytable is only needed to print, so the store can be used without it
+    from prettytable import PrettyTable
+    table = PrettyTable(description)
+    table.align = 'r'
+    for row in results:
+        table.add_row(row)
+    print(table)
+
+
+def print_comparison(store, run_id, baseline, threshold=DEFAULT_THRESHOLD):
+    comparison = store.compare(run_id, baseline, threshold)
+    print("Run {} compared with baseline {}".format(run_id, baseline))
+    print_results(comparison, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Image Multiplier", "Async", "Connection Mode", "LOB Mode", "Document Encoding", "Routing", "Measure", "Baseline", "This Run", "Change", "Status")
+    return sum(1 for row in comparison if row[-1] == "REGRESSION")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest Test Results Store')
+    parser.add_argument("-store", "--store", help="results database (default={})".format(DEFAULT_STORE), default=DEFAULT_STORE)
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("list", help="list recorded runs")
+    baseline_parser = subparsers.add_parser("baseline", help="name a run as a baseline")
+    baseline_parser.add_argument("-n", "--name", help="baseline name", required=True)
+    baseline_parser.add_argument("-r", "--run", help="run id", required=True)
+    compare_parser = subparsers.add_parser("compare", help="compare a run with a named baseline")
+    compare_parser.add_argument("-r", "--run", help="run id", required=True)
+    compare_parser.add_argument("-b", "--baseline", help="baseline name", required=True)
+    compare_parser.add_argument("-t", "--threshold", help="relative change treated as a regression (default={})".format(DEFAULT_THRESHOLD), type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args()
+    store = ResultStore(args.store)
+    if args.command == "baseline":
+        store.name_baseline(args.name, args.run)
+    elif args.command == "compare":
+        if print_comparison(store, args.run, args.baseline, args.threshold) > 0:
+            sys.exit(1)
+    else:
+        print_results(store.runs(), "Run", "Started", "Git Revision", "Host", "Schema Type", "Engine", "Points", "Baselines")
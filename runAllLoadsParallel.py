@@ -1,15 +1,39 @@
-from __future__ import print_function
+from __future__ import print_function, division
 
 import argparse
 import logging
+import mmap
+import multiprocessing
 import os
+import re
+import shutil
 import subprocess
 import sys
+import tempfile
+import time
 from threading import Thread
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from prettytable import PrettyTable
+
 
 path_to_executable = '/Users/dgiles/sqlcl/bin/sql'
 runCommand = "{path_to_command} {user_name}/{pass_word}@{connect_string} rows=5000 control={control_file} direct=false"
+# A chunk is loaded from a file of its own, with the control file's SKIP already applied when it was split. Chunks
+# of a control file load at the same time, so each writes a log and bad file of its own next to the control file
+# (the chunk files are deleted once the load is over) rather than all sharing the control file's
+chunkParameters = " data={data_file} skip=0 log={log_file} bad={bad_file}"
+
+DEFAULT_CONCURRENCY = multiprocessing.cpu_count()
+DEFAULT_CHUNK_SIZE = 64
+INFILE_PATTERN = re.compile(r"INFILE\s+(?:'([^']+)'|\"([^\"]+)\"|(\S+))", re.IGNORECASE)
+SKIP_PATTERN = re.compile(r"OPTIONS\s*\([^)]*\bSKIP\s*=\s*(\d+)", re.IGNORECASE)
+LOADED_PATTERN = re.compile(r"([0-9,]+) Rows? successfully loaded", re.IGNORECASE)
+MEGABYTE = 1024 * 1024
 
 
 def set_logging(level):
@@ -22,38 +46,211 @@ def set_logging(level):
     logger.addHandler(ch)
 
 
+def print_results(results, *description):
+    table = PrettyTable(description)
+    table.align = 'r'
+    for row in results:
+        table.add_row(row)
+    print(table)
+
+
 def executeCommand(working_directory, command):
-    p = subprocess.Popen(command, shell=True, cwd=working_directory)
+    p = subprocess.Popen(command, shell=True, cwd=working_directory, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     (output, err) = p.communicate()
+    output = output.decode("utf-8", "replace")
     logging.debug(output)
+    return p.returncode, output
+
+
+def data_file(control_file, working_directory):
+    # The INFILE named by the control file, None when the data is inline (INFILE * / BEGINDATA) or missing
+    with open(control_file) as control:
+        text = control.read()
+    match = INFILE_PATTERN.search(text)
+    skip = SKIP_PATTERN.search(text)
+    if match is None:
+        return None, 0
+    path = next(group for group in match.groups() if group is not None)
+    if path == "*":
+        return None, 0
+    path = os.path.join(working_directory, path)
+    if not os.path.isfile(path):
+        logging.debug("Data file {} for {} not found, loading it unsplit".format(path, control_file))
+        return None, 0
+    return path, int(skip.group(1)) if skip else 0
+
+
+def split_chunks(path, chunk_size, skip=0):
+    # Byte ranges of about chunk_size ending on record boundaries, each with the number of its first record
+    # and its record count. Assumes newline terminated records, i.e. no quoted fields containing newlines
+    size = os.path.getsize(path)
+    if size == 0:
+        return [(0, 0, skip, 0)]
+    chunks = []
+    with open(path, "rb") as data:
+        mapped = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = 0
+            for _ in range(skip):
+                start = mapped.find(b"\n", start) + 1 or size
+            record = skip
+            while start < size:
+                end = mapped.find(b"\n", min(size, start + chunk_size) - 1) + 1 or size
+                records = mapped[start:end].count(b"\n") + (0 if mapped[end - 1:end] == b"\n" else 1)
+                chunks.append((start, end, record, records))
+                record += records
+                start = end
+        finally:
+            mapped.close()
+    return chunks
+
+
+def write_chunk(path, start, end, chunk_path):
+    # Each loader reads only its own bytes, rather than every loader reading the file up to its chunk
+    with open(path, "rb") as data, open(chunk_path, "wb") as chunk:
+        data.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = data.read(min(remaining, MEGABYTE))
+            if not block:
+                break
+            chunk.write(block)
+            remaining -= len(block)
+
+
+class LoadJob(object):
+    # One SQL*Loader invocation : a whole control file, or one chunk of its data file copied to chunk_file
 
+    def __init__(self, control_file, data_file, size, chunk=None, first_record=0, records=None, chunk_file=None):
+        self.control_file = control_file
+        self.data_file = data_file
+        self.chunk_file = chunk_file
+        self.size = size
+        self.chunk = chunk
+        self.first_record = first_record
+        self.records = records
+        self.start = None
+        self.end = None
+        self.rows_loaded = None
+        self.returncode = None
 
-def run_tests(path_to_executable, username, password, connect_string, working_directory, control_files):
+    def command(self, path_to_executable, username, password, connect_string):
+        command = runCommand.format(path_to_command=path_to_executable,
+                                    user_name=username,
+                                    pass_word=password,
+                                    connect_string=connect_string,
+                                    control_file=self.control_file)
+        if self.chunk is not None:
+            name = "{}-{}".format(os.path.splitext(self.control_file)[0], self.chunk)
+            command += chunkParameters.format(data_file=self.chunk_file, log_file=name + ".log", bad_file=name + ".bad")
+        return command
+
+    def run(self, working_directory, command):
+        logging.debug("Command to execute : {}".format(command))
+        self.start = time.time()
+        self.returncode, output = executeCommand(working_directory, command)
+        self.end = time.time()
+        loaded = LOADED_PATTERN.findall(output)
+        if loaded:
+            self.rows_loaded = sum(int(rows.replace(",", "")) for rows in loaded)
+        elif self.returncode == 0:
+            self.rows_loaded = self.records
+
+
+def plan_jobs(control_files, working_directory, chunk_size, chunk_directory):
+    # Data files larger than chunk_size are split into files in chunk_directory so no single file becomes the
+    # tail of the load, then everything is ordered largest first so the big pieces start while there are
+    # workers to spare
+    jobs = []
+    for control_file in control_files:
+        path, skip = data_file(control_file, working_directory)
+        if path is None:
+            jobs.append(LoadJob(control_file, None, os.path.getsize(control_file)))
+            continue
+        chunks = split_chunks(path, chunk_size, skip)
+        if len(chunks) == 1:
+            start, end, first_record, records = chunks[0]
+            jobs.append(LoadJob(control_file, path, end, None, first_record, records))
+            continue
+        name, extension = os.path.splitext(os.path.basename(path))
+        for chunk, (start, end, first_record, records) in enumerate(chunks):
+            chunk_path = os.path.join(chunk_directory, "{}-{}{}".format(name, chunk, extension))
+            write_chunk(path, start, end, chunk_path)
+            jobs.append(LoadJob(control_file, path, end - start, chunk, first_record, records, chunk_path))
+    jobs.sort(key=lambda job: job.size, reverse=True)
+    return jobs
+
+
+def load_worker(path_to_executable, username, password, connect_string, working_directory, jobs):
+    while True:
+        try:
+            job = jobs.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            job.run(working_directory, job.command(path_to_executable, username, password, connect_string))
+        except Exception:
+            logging.exception("Unable to run load of {}".format(job.control_file))
+
+
+def rate(amount, elapsed):
+    return amount / elapsed if amount is not None and elapsed > 0 else 0
+
+
+def file_results(jobs):
+    results = []
+    for control_file in sorted(set(job.control_file for job in jobs)):
+        file_jobs = [job for job in jobs if job.control_file == control_file and job.start is not None]
+        if not file_jobs:
+            continue
+        elapsed = max(job.end for job in file_jobs) - min(job.start for job in file_jobs)
+        rows = sum(job.rows_loaded or 0 for job in file_jobs)
+        size = sum(job.size for job in file_jobs)
+        failures = sum(1 for job in file_jobs if job.returncode != 0)
+        results.append((os.path.basename(control_file), len(file_jobs), failures, "{0:,}".format(rows), "{0:,.1f}".format(size / MEGABYTE), "{0:.2f}".format(elapsed),
+                        "{0:,.0f}".format(rate(rows, elapsed)), "{0:,.2f}".format(rate(size / MEGABYTE, elapsed))))
+    return results
+
+
+def run_tests(path_to_executable, username, password, connect_string, working_directory, control_files, concurrency=DEFAULT_CONCURRENCY, chunk_size=DEFAULT_CHUNK_SIZE * MEGABYTE):
     results = []
 
     logging.debug("\nusername : {}\npassword : {}\nconnect string : {}\ndirecotries : {}\n".format(
         username, password, connect_string, control_files))
     threads = []
+    chunk_directory = tempfile.mkdtemp(prefix="chunks", dir=working_directory)
     try:
-        for control_file in control_files:
-            executeCommandString = runCommand.format(path_to_command=path_to_executable,
-                                                     user_name=username,
-                                                     pass_word=password,
-                                                     connect_string=connect_string,
-                                                     control_file=control_file)
-            logging.debug("Command to execute : {}".format(executeCommandString))
-            thread = Thread(target=executeCommand, args=(working_directory, executeCommandString,))
+        # Split before timing starts
+        jobs = plan_jobs(control_files, working_directory, chunk_size, chunk_directory)
+        pending = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+        logging.debug("{} load jobs from {} control files on {} workers".format(len(jobs), len(control_files), concurrency))
+        start = time.time()
+        for _ in range(min(concurrency, len(jobs))):
+            thread = Thread(target=load_worker, args=(path_to_executable, username, password, connect_string, working_directory, pending))
             threads.append(thread)
         for thread in threads:
             thread.start()
         for thread in threads:
             thread.join()
+        elapsed = time.time() - start
 
         logging.debug("Finished all threads")
 
+        results = file_results(jobs)
+        rows = sum(job.rows_loaded or 0 for job in jobs)
+        size = sum(job.size for job in jobs if job.start is not None)
+        results.append(("Total", len(jobs), sum(1 for job in jobs if job.returncode != 0), "{0:,}".format(rows), "{0:,.1f}".format(size / MEGABYTE), "{0:.2f}".format(elapsed),
+                        "{0:,.0f}".format(rate(rows, elapsed)), "{0:,.2f}".format(rate(size / MEGABYTE, elapsed))))
+        print_results(results, "Control File", "Loads", "Failed", "Rows Loaded", "MB", "Elapsed", "Rows/sec", "MB/sec")
+
     except Exception as e:
-        print("Unable to run test : {}".format(e.message), file=sys.stderr)
+        print("Unable to run test : {}".format(e), file=sys.stderr)
         logging.exception("Unable to run test")
+    finally:
+        shutil.rmtree(chunk_directory, ignore_errors=True)
+    return results
 
 
 if __name__ == '__main__':
@@ -62,6 +259,8 @@ if __name__ == '__main__':
     parser.add_argument("-p", "--password", help="password", required=True)
     parser.add_argument("-cs", "--connectstring", help="connectstring", required=True)
     parser.add_argument("-d", "--directory", help="directory containing control files", required=True)
+    parser.add_argument("-c", "--concurrency", help="maximum loads running at once (default={})".format(DEFAULT_CONCURRENCY), type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("-chunk", "--chunksize", help="data files larger than this many MB are split into chunk files loaded in parallel (default={})".format(DEFAULT_CHUNK_SIZE), type=float, default=DEFAULT_CHUNK_SIZE)
     parser.add_argument("-debug", help="output debug to stdout", dest='debug_on', action='store_true')
 
     args = parser.parse_args()
@@ -79,4 +278,5 @@ if __name__ == '__main__':
         if file.endswith(".ctl"):
             controlfiles.append(os.path.join(args.directory, file))
 
-    run_tests(path_to_executable, username, password, connect_string, working_directory=args.directory, control_files=controlfiles)
+    run_tests(path_to_executable, username, password, connect_string, working_directory=args.directory, control_files=controlfiles,
+              concurrency=args.concurrency, chunk_size=int(args.chunksize * MEGABYTE))
@@ -1,13 +1,13 @@
 from __future__ import print_function
 
 import argparse
+import itertools
 import logging
 import os
 import re
 import subprocess
 import sys
 import time
-import xml.etree.ElementTree as ET
 from datetime import datetime
 from os.path import expanduser
 from threading import Thread
@@ -15,8 +15,24 @@ from threading import Thread
 from prettytable import PrettyTable
 from tqdm import tqdm
 
-datagen_run_command = "{path_to_command} -c {config_file} -u {user_name} -p {pass_word} -cs {connect_string} -bs {batch_size} -commit {commit_size} -scale {scale} -db -cl -nodrop -noddl -tc {threads} {async}"
-javatest_run_command = 'java -jar ' + expanduser("~") + '/PycharmProjects/OraIngestTests/SimpleOraTest.jar -u {user_name} -p {pass_word} -cs {connect_string} -bs {batch_size} -cf {commit_size} -rc {row_count} -tc {thread_count} {async} -st {benchmark_type}'
+import configmodel
+import connectionpool
+import dbstats
+import distributed
+import documentencoder
+import ingestengine
+import lobwriter
+import metrics
+import partitioning
+import ratecontrol
+import resultstore
+import sweep
+import tablereset
+import telemetry
+import workerpool
+
+datagen_run_command = "{path_to_command} -c {config_file} -u {user_name} -p {pass_word} -cs {connect_string} -bs {batch_size} -commit {commit_size} -scale {scale} -db -cl -nodrop -noddl -tc {threads} {async_flag}"
+javatest_run_command = 'java -jar ' + expanduser("~") + '/PycharmProjects/OraIngestTests/SimpleOraTest.jar -u {user_name} -p {pass_word} -cs {connect_string} -bs {batch_size} -cf {commit_size} -rc {row_count} -tc {thread_count} {async_flag} -st {benchmark_type}'
 
 SCRIPT_RUNNER = expanduser("~") + "/sqlcl/bin/sql"
 DEFAULT_BATCH_SIZE = 100
@@ -29,9 +45,29 @@ DEFAULT_REL_CONFIG = "anpr_relationalv2.xml"
 DEFAULT_DOC_CONFIG = "anpr_documentv2.xml"
 DEFAULT_SIMPLE_CONFIG = "anpr_simple.xml"
 DEFAULT_JVM_COUNT = 1
+DEFAULT_ENGINE = "java"
+DEFAULT_GENERATOR = "python"
+DEFAULT_SWEEP = "grid"
+DEFAULT_IN_FLIGHT = 4
+
+# Periodic progress lines from the external tools report the cumulative number of rows inserted
+PROGRESS_PATTERN = re.compile(r"Rows (?:Inserted|Generated)[\s:]*([0-9,]+)")
 
 process_results = []
 results = []
+# Interval throughput series for each entry in results
+result_series = []
+latency_results = []
+# LOB throughput for points run with a LOB mode
+lob_results = []
+# Encode and insert time for points of the document schemas run by the python engines
+document_results = []
+# Load box resources used during each point, sampled from /proc
+client_results = []
+# Database statistics deltas for each point, when a collector is monitoring the database
+db_results = []
+# Target and achieved rates and intended response times of each step of a rate schedule
+rate_results = []
 
 
 def timingtoseconds(timingstring):
@@ -50,6 +86,10 @@ def print_results(results, *description):
         table.add_row(row)
     print(table)
 
+def format_latency(seconds):
+    return "-" if seconds is None else "{0:,.3f}".format(seconds * 1000)
+
+
 def run_script(script_name, supress_script_output):
     print ("Running script {}".format(script_name))
     runcommand = '{} /nolog @{}'.format(SCRIPT_RUNNER, script_name)
@@ -61,15 +101,23 @@ def run_script(script_name, supress_script_output):
         print(output)
 
 
-def executeCommand(command):
+def executeCommand(command, series=None, worker=0):
     rows_processed, rows_inserted, connection_time, insertion_time = 0, 0, 0, 0
     logging.debug("Command to execute : {}".format(command))
     p = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
-    (output, err) = p.communicate()
-    s = re.findall("(Rows Inserted per sec[\s]*)([0-9,]*)", output.decode("utf-8"))
-    t = re.findall("(Actual Rows Generated[\s]*)([0-9,]*)", output.decode("utf-8"))
-    c = re.findall("(Connection Time[\s]*)([0-9.:]*)", output.decode("utf-8"))
-    i = re.findall("(Data Generation Time[\s]*)([0-9.:]*)", output.decode("utf-8"))
+    lines = []
+    for line in iter(p.stdout.readline, b''):
+        line = line.decode("utf-8")
+        lines.append(line)
+        progress = PROGRESS_PATTERN.search(line)
+        if progress is not None and series is not None:
+            series.add(worker, time.time(), int(progress.group(1).replace(',', '')))
+    p.wait()
+    output = "".join(lines)
+    s = re.findall(r"(Rows Inserted per sec[\s]*)([0-9,]*)", output)
+    t = re.findall(r"(Actual Rows Generated[\s]*)([0-9,]*)", output)
+    c = re.findall(r"(Connection Time[\s]*)([0-9.:]*)", output)
+    i = re.findall(r"(Data Generation Time[\s]*)([0-9.:]*)", output)
     if (len(s) != 0):
         rows_processed = int(s[0][1].replace(',', ''))
     if (len(t) != 0):
@@ -91,103 +139,292 @@ def set_logging(level):
     logger.addHandler(ch)
 
 
-def changeImageSize(configfile, new_size):
-    tree = ET.ElementTree(file=configfile)
-
-    root = tree.getroot()
-
-    ns = "{http://www.domincgiles.com/datagen}"
-
-    minimum_element = root.find(".//{}EnumerationGenerator[{}id='IMAGE_GENERATOR']/{}MinimumRepetitions".format(ns, ns, ns))
-    maximum_element = root.find(".//{}EnumerationGenerator[{}id='IMAGE_GENERATOR']/{}MaximumRepetitions".format(ns, ns, ns))
-
-    minimum_element.text = str(new_size)
-    maximum_element.text = str(new_size)
-
-    new_file = '{}/copy_{}'.format(os.path.dirname(configfile), os.path.basename(configfile))
-    tree.write(new_file)
-    return new_file
-
-
-def run_tests(path_to_executable, config, username, password, connect_string, commit_sizes, batch_sizes, image_multipliers, thread_counts, scale, async, test_type, processes, jvm_display, script_name, supress_script_output):
-    logging.debug("\nconfig : {}\nusername : {}\npassword : {}\nconnect string : {}\ncommit_sizes : {}\nbatch_sizes : {}\npath : {}\nscale : {}\nasync : {}\nimage_sizes : {}\nthread_counts : {}\njvms started : {}".format(
-        config, username, password, connect_string, commit_sizes, batch_sizes, path, scale, async, image_multipliers, thread_counts, processes[0]))
-
+def run_test_point(path_to_executable, config_model, username, password, connect_string, commit_size, batch_size, image_multiplier, thread_count, scale, async_commit, test_type, processes, jvm_display, engine, generator, converged=None, run=None, producers=None, in_flight=DEFAULT_IN_FLIGHT,
+                   connection_mode=connectionpool.DEFAULT_CONNECTION_MODE, pool_size=None, storm=False, agents=None, warmup=0, measure=None, rampdown=0, lob_mode=None, lob_chunk_size=None, document_encoding=None,
+                   routing=partitioning.DEFAULT_ROUTING, telemetry_interval=telemetry.DEFAULT_INTERVAL,
+                   collector=None, table_reset=None, pool=None, schedule=None):
+    overrides = configmodel.image_overrides(image_multiplier) if (test_type == 'relational' or test_type == 'document') else []
+    new_config = config_model.materialize(overrides) if engine == 'java' else None
+    my_threads = []
+    parameters = dict(username=username,
+                      password=password,
+                      connect_string=connect_string,
+                      test_type=test_type,
+                      processes=int(processes[0]),
+                      row_count=int(float(scale) * ingestengine.ROWS_PER_SCALE),
+                      batch_size=int(batch_size),
+                      commit_size=int(commit_size),
+                      thread_count=int(thread_count),
+                      async_commit=async_commit,
+                      image_multiplier=image_multiplier,
+                      generator=generator,
+                      producers=producers if engine == 'asyncio' else None,
+                      in_flight=in_flight if engine == 'asyncio' else None,
+                      connection_mode=connection_mode,
+                      pool_size=pool_size,
+                      storm=storm,
+                      lob_mode=lob_mode,
+                      lob_chunk_size=lob_chunk_size,
+                      document_encoding=document_encoding,
+                      routing=routing if engine != 'java' else None,
+                      warmup=warmup,
+                      measure=measure,
+                      rampdown=rampdown)
+    dataset = None
+    if engine != 'java' and generator == 'replay' and not agents:
+        # Built (or found in the cache) before timing starts, so only the replay is measured. Imported here, as
+        # it needs numpy
+        import datasetcache
+        dataset = datasetcache.cached_dataset(config_model.variant(overrides), parameters['processes'] * parameters['row_count'])
+    # Emptying the tables left by earlier points isn't part of the point's time
+    reset_time = table_reset.reset() if table_reset is not None else None
+    # Agents run the workers elsewhere, so there is nothing on this box to sample
+    sampler = telemetry.ClientSampler(telemetry_interval) if telemetry_interval and not agents else None
+    if sampler is not None:
+        sampler.start()
+    # Database statistics are snapshotted as the python engine starts and stops measuring, otherwise around the point
+    db_snapshots = {}
+
+    def on_measure(phase):
+        db_snapshots[phase] = dbstats.snapshot(collector)
+
+    if collector is not None and (engine == 'java' or agents):
+        on_measure("start")
+    start = time.time()
+    series = metrics.ThroughputSeries(start)
+    latencies = {}
+    # The python engine reports when it actually started measuring, after every worker has connected
+    window = {}
+    steps = []
+    if engine != 'java' and agents:
+        # Each agent runs the point with -proc processes of its own, starting together
+        process_results.extend(distributed.run_point(agents, parameters,
+                                                     config=config_model.variant(overrides) if generator != 'python' else None,
+                                                     series=series,
+                                                     latencies=latencies,
+                                                     window=window))
+    elif engine != 'java':
+        process_results.extend(ingestengine.run_engine(config=config_model.variant(overrides) if generator == 'numpy' else None,
+                                                       series=series,
+                                                       latencies=latencies,
+                                                       converged=converged,
+                                                       dataset=dataset,
+                                                       window=window,
+                                                       on_measure=on_measure if collector is not None else None,
+                                                       pool=pool,
+                                                       schedule=schedule,
+                                                       steps=steps,
+                                                       **parameters))
+    else:
+        for process in range(0, int(processes[0])):
+            if test_type == 'relational' or test_type == 'document' :
+                executeCommandString = datagen_run_command.format(path_to_command=path_to_executable,
+                                                                  config_file=new_config,
+                                                                  user_name=username,
+                                                                  pass_word=password,
+                                                                  connect_string=connect_string,
+                                                                  batch_size=batch_size,
+                                                                  commit_size=commit_size,
+                                                                  threads=thread_count,
+                                                                  scale=scale,
+                                                                  async_flag=('-async' if async_commit else ''))
+            else:
+                executeCommandString = javatest_run_command.format(path_to_command=path_to_executable,
+                                                                 user_name=username,
+                                                                 pass_word=password,
+                                                                 connect_string=connect_string,
+                                                                 batch_size=batch_size,
+                                                                 commit_size=commit_size,
+                                                                 row_count=int(float(scale)*100000),
+                                                                 thread_count=thread_count,
+                                                                 async_flag=('-async' if async_commit else ''),
+                                                                 benchmark_type=('document' if test_type == 'document_light' else 'relational'))
+
+            thread = Thread(target=executeCommand, args=(executeCommandString, series, process))
+            my_threads.append(thread)
+
+        for thread in my_threads:
+            thread.start()
+        for thread in my_threads:
+            thread.join()
+    end = time.time()
+    if collector is not None and "end" not in db_snapshots:
+        on_measure("end")
+    if window:
+        start, end = window["start"], window["end"]
+    client = None
+    if sampler is not None:
+        client = sampler.stop().summary(start, end, gil_bound=engine != 'java')
+    insertion_time, connection_time, rows_inserted, rows_processed, max_insertion_time = 0, 0, 0, 0, 0
+    for ct, ri, it, rp in process_results:
+        insertion_time += it
+        connection_time += ct
+        rows_inserted += ri
+        rows_processed += rp
+        max_insertion_time = max(max_insertion_time, it)
+    db_deltas = None
+    if collector is not None and db_snapshots["start"] is not None and db_snapshots["end"] is not None:
+        db_deltas = dbstats.deltas(db_snapshots["start"], db_snapshots["end"], rows_inserted)
+    rate_min, rate_median, rate_max = series.summary()
+    logging.debug(
+        "insertion time = {}, connection time = {}, rows_inserted = {}, rows_processed = {}, max_insertion_time = {}".format(insertion_time, connection_time, rows_inserted, rows_processed, max_insertion_time))
+
+    results.append((processes[0],
+                    thread_count,
+                    commit_size,
+                    batch_size,
+                    int(0 if (test_type == 'simple' or test_type == 'light') else image_multiplier) * 100, async_commit,
+                    connection_mode,
+                    routing,
+                    rows_inserted,
+                    "{0:,.2f}".format(end - start),
+                    "{0:,.2f}".format(reset_time) if reset_time is not None else "",
+                    "{0:,.2f}".format(insertion_time),
+                    "{0:,.2f}".format(connection_time),
+                    "{0:,.0f}".format((rows_inserted / max_insertion_time) if max_insertion_time != 0 else 0),
+                    "{0:,.0f}".format(rate_min),
+                    "{0:,.0f}".format(rate_median),
+                    "{0:,.0f}".format(rate_max),))
+    result_series.append(series)
+    if run is not None:
+        run.add_point(processes[0], thread_count, commit_size, batch_size, image_multiplier, async_commit, rows_inserted, end - start, insertion_time,
+                      (rows_inserted / max_insertion_time) if max_insertion_time != 0 else 0, series, latencies, connection_mode, lob_mode, document_encoding, routing, client, db_deltas, reset_time,
+                      [dict(step, latency=resultstore.encode_histogram(step["latency"])) for step in steps] if schedule is not None else None)
+    if db_deltas is not None:
+        for name, (change, per_row) in sorted(db_deltas.items()):
+            db_results.append((processes[0], thread_count, commit_size, batch_size, connection_mode, routing, name, "{0:,.0f}".format(change), "{0:,.3f}".format(per_row)))
+    if client is not None:
+        client_results.append((processes[0], thread_count, commit_size, batch_size, connection_mode, routing, "{0:.2f}".format(client["cpu_cores"]), "{0:.0%}".format(client["box_cpu"]),
+                               "{0:.2f}".format(client["worker_cpu_peak"]), "{0:,.0f}".format(client["rss_peak_mb"]), "{0:,.0f}".format(client["context_switches_per_sec"]),
+                               "{0:,.2f}".format(client["net_rx_mb_per_sec"]), "{0:,.2f}".format(client["net_tx_mb_per_sec"]), "CLIENT-BOUND" if client["client_bound"] else ""))
+    if lob_mode is not None:
+        # Every row carries one image, so LOBs/sec is the row rate and MB/sec follows from the image size
+        lob_size = len(ingestengine.IMAGE_DATA) * int(image_multiplier)
+        rows_per_sec = (rows_inserted / max_insertion_time) if max_insertion_time != 0 else 0
+        lob_results.append((processes[0], thread_count, commit_size, batch_size, image_multiplier, lob_mode, "{0:,.1f}".format(lob_size / 1024.0), rows_inserted,
+                            "{0:,.1f}".format(rows_inserted * lob_size / 1048576.0), "{0:,.0f}".format(rows_per_sec), "{0:,.2f}".format(rows_per_sec * lob_size / 1048576.0)))
+    if document_encoding is not None and "Document Encode" in latencies:
+        # Totals from the histograms, each batch's time taken as its bucket's value
+        encodes, encode_mean = latencies["Document Encode"].statistics()[:2]
+        inserts, insert_mean = latencies["Batch Insert"].statistics()[:2] if "Batch Insert" in latencies else (0, 0.0)
+        encode_time, batch_insert_time = encodes * encode_mean, inserts * insert_mean
+        document_results.append((processes[0], thread_count, commit_size, batch_size, image_multiplier, document_encoding, rows_inserted, "{0:,.2f}".format(encode_time), "{0:,.2f}".format(batch_insert_time),
+                                 "{0:.1%}".format(encode_time / (encode_time + batch_insert_time) if encode_time + batch_insert_time > 0 else 0),
+                                 "{0:,.1f}".format(encode_time / rows_inserted * 1000000 if rows_inserted else 0)))
+    for step in steps:
+        rate_results.append((processes[0], thread_count, commit_size, batch_size, connection_mode, routing, "{0:g}-{1:g}".format(step["offset"], step["offset"] + step["seconds"]),
+                             "{0:,.0f}".format(step["target"]), "{0:,.0f}".format(step["achieved"]), "{0:.0%}".format(step["achieved"] / step["target"]) if step["target"] else "-", step["latency"].count()) +
+                            tuple(format_latency(latency) for latency in step["latency"].summary()))
+    for operation in ingestengine.LATENCY_NAMES:
+        if operation in latencies:
+            latency_results.append((processes[0], thread_count, commit_size, batch_size, connection_mode, routing, operation, latencies[operation].count()) +
+                                   tuple(format_latency(latency) for latency in latencies[operation].summary()))
+    if jvm_display:
+        print_results(process_results, "Connection Time", "Rows Processed", "Insert Time", "Rows/sec Inserted")
+    del process_results[:]
+    return (rows_inserted / max_insertion_time) if max_insertion_time != 0 else 0
+
+
+def run_tests(path_to_executable, config, username, password, connect_string, commit_sizes, batch_sizes, image_multipliers, thread_counts, scale, async_commit, test_type, processes, jvm_display, script_name, supress_script_output, engine=DEFAULT_ENGINE, generator=DEFAULT_GENERATOR, sweep_mode=DEFAULT_SWEEP, tolerance=sweep.DEFAULT_TOLERANCE, store_path=resultstore.DEFAULT_STORE, baseline=None, new_baseline=None, overrides=None, producers=None, in_flight=DEFAULT_IN_FLIGHT,
+              connection_modes=None, pool_size=None, storm=False, agents=None, warmup=0, measure=None, rampdown=0, lob_modes=None, lob_chunk_size=None, document_encodings=None, routing_modes=None,
+              telemetry_interval=telemetry.DEFAULT_INTERVAL, db_stats=None, reset=tablereset.DEFAULT_RESET, admin=None, worker_pool=False, rate_schedule=None):
+    connection_modes = connection_modes or [connectionpool.DEFAULT_CONNECTION_MODE]
+    routing_modes = routing_modes or [partitioning.DEFAULT_ROUTING]
+    lob_modes = lob_modes or [None]
+    if not document_encodings:
+        document_encodings = [documentencoder.DEFAULT_DOCUMENT_ENCODING] if engine != 'java' and test_type in ingestengine.DOCUMENT_TYPES else [None]
+    logging.debug("\nconfig : {}\nusername : {}\npassword : {}\nconnect string : {}\ncommit_sizes : {}\nbatch_sizes : {}\npath : {}\nscale : {}\nasync : {}\nimage_sizes : {}\nthread_counts : {}\njvms started : {}\nengine : {}\ngenerator : {}\nsweep : {}\nproducers : {}\nin flight : {}\nconnection modes : {}\npool size : {}\nstorm : {}\nagents : {}\nwarm-up : {}\nmeasure : {}\nramp-down : {}\nlob modes : {}\nlob chunk size : {}\ndocument encodings : {}\nrouting : {}\ntelemetry interval : {}\ndatabase statistics : {}\nreset : {}\nworker pool : {}\nrate schedule : {}".format(
+        config, username, password, connect_string, commit_sizes, batch_sizes, path, scale, async_commit, image_multipliers, thread_counts, processes[0], engine, generator, sweep_mode, producers, in_flight, connection_modes, pool_size, storm, agents, warmup, measure, rampdown, lob_modes, lob_chunk_size, document_encodings, routing_modes, telemetry_interval, db_stats, reset, worker_pool, rate_schedule.segments if rate_schedule is not None else None))
+
+    collector, table_reset, pool = None, None, None
     try:
+        if worker_pool:
+            # Started before any other connection is open, so none is inherited by the worker processes
+            pool = workerpool.WorkerPool(int(processes[0]), max(int(thread_count) for thread_count in thread_counts))
+        config_model = configmodel.ConfigModel(config, overrides)
+        collector = dbstats.collector(db_stats, username, password, connect_string)
+        store = resultstore.ResultStore(store_path)
+        run = store.start_run(test_type, engine, {"commit_sizes": commit_sizes, "batch_sizes": batch_sizes, "image_multipliers": image_multipliers, "thread_counts": thread_counts,
+                                                  "processes": processes[0], "scale": scale, "async": async_commit, "generator": generator, "sweep": sweep_mode, "overrides": overrides,
+                                                  "producers": producers, "in_flight": in_flight, "connection_modes": connection_modes, "pool_size": pool_size, "storm": storm,
+                                                  "agents": ["{}:{}".format(host, port) for host, port in agents or []], "warmup": warmup, "measure": measure, "rampdown": rampdown,
+                                                  "lob_modes": lob_modes, "lob_chunk_size": lob_chunk_size, "document_encodings": document_encodings, "routing_modes": routing_modes,
+                                                  "worker_pool": worker_pool,
+                                                  "rate_schedule": rate_schedule.segments if rate_schedule is not None else None})
         if script_name is not None:
             run_script(script_name, supress_script_output)
-        with tqdm(desc="Tests Run", total=len(commit_sizes) * len(batch_sizes) * len(image_multipliers) * len(thread_counts)) as pbar:
-            for commit_size in commit_sizes:
-                for batch_size in batch_sizes:
-                    for image_multiplier in image_multipliers:
-                        for thread_count in thread_counts:
-                            if test_type == 'relational' or test_type == 'document':
-                                new_config = changeImageSize(config, image_multiplier)
-                            else:
-                                new_config = config
-                            my_threads = []
-                            start = time.time()
-                            for process in range(0, int(processes[0])):
-                                if test_type == 'relational' or test_type == 'document' :
-                                    executeCommandString = datagen_run_command.format(path_to_command=path_to_executable,
-                                                                                      config_file=new_config,
-                                                                                      user_name=username,
-                                                                                      pass_word=password,
-                                                                                      connect_string=connect_string,
-                                                                                      batch_size=batch_size,
-                                                                                      commit_size=commit_size,
-                                                                                      threads=thread_count,
-                                                                                      scale=scale,
-                                                                                      async=('-async' if async else ''))
-                                else:
-                                    executeCommandString = javatest_run_command.format(path_to_command=path_to_executable,
-                                                                                     user_name=username,
-                                                                                     pass_word=password,
-                                                                                     connect_string=connect_string,
-                                                                                     batch_size=batch_size,
-                                                                                     commit_size=commit_size,
-                                                                                     row_count=int(float(scale)*100000),
-                                                                                     thread_count=thread_count,
-                                                                                     async=('-async' if async else ''),
-                                                                                     benchmark_type=('document' if test_type == 'document_light' else 'relational'))
-
-                                thread = Thread(target=executeCommand, args=(executeCommandString,))
-                                my_threads.append(thread)
-
-                            for thread in my_threads:
-                                thread.start()
-                            for thread in my_threads:
-                                thread.join()
-                            end = time.time()
-                            insertion_time, connection_time, rows_inserted, rows_processed, max_insertion_time = 0, 0, 0, 0, 0
-                            for ct, ri, it, rp in process_results:
-                                insertion_time += it
-                                connection_time += ct
-                                rows_inserted += ri
-                                rows_processed += rp
-                                max_insertion_time = max(max_insertion_time, it)
-                            logging.debug(
-                                "insertion time = {}, connection time = {}, rows_inserted = {}, rows_processed = {}, max_insertion_time = {}".format(insertion_time, connection_time, rows_inserted, rows_processed, max_insertion_time))
-
-                            results.append((processes[0],
-                                            thread_count,
-                                            commit_size,
-                                            batch_size,
-                                            int(0 if (test_type == 'simple' or test_type == 'light') else image_multiplier) * 100, async,
-                                            rows_inserted,
-                                            "{0:,.2f}".format(end - start),
-                                            "{0:,.2f}".format(insertion_time),
-                                            "{0:,.0f}".format((rows_inserted / max_insertion_time) if max_insertion_time != 0 else 0),))
-                            if test_type == 'relational' or test_type == 'document':
-                                os.remove(new_config)
-                            pbar.update(1)
-                            if jvm_display:
-                                print_results(process_results, "Connection Time", "Rows Processed", "Insert Time", "Rows/sec Inserted")
-                            del process_results[:]
-        print_results(results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Image Size", "Async", "Total Rows Inserted", "Real Time Taken", "Total Insert Time", "Rows/sec Inserted")
+        if reset != 'none':
+            table_reset = tablereset.TableReset(username, password, connect_string, admin)
+            if reset == 'start':
+                print("Tables reset in {:.2f}s".format(table_reset.reset()))
+        point_reset = table_reset if reset == 'point' else None
+        if sweep_mode == 'adaptive':
+            with tqdm(desc="Tests Run") as pbar:
+                def measure_point(point):
+                    rows_per_sec = run_test_point(path_to_executable, config_model, username, password, connect_string, point['Commit Size'], point['Batch Size'], point['Image Multiplier'], point['Thread Count'], scale, async_commit, test_type, processes, jvm_display, engine, generator,
+                                                  converged=sweep.ConvergenceCheck(tolerance), run=run, producers=producers, in_flight=in_flight,
+                                                  connection_mode=point['Connection Mode'], pool_size=pool_size, storm=storm, agents=agents,
+                                                  warmup=warmup, measure=measure, rampdown=rampdown, lob_mode=point.get('LOB Mode'), lob_chunk_size=lob_chunk_size,
+                                                  document_encoding=point.get('Document Encoding'), routing=point['Routing'],
+                                                  telemetry_interval=telemetry_interval, collector=collector, table_reset=point_reset, pool=pool,
+                                                  schedule=rate_schedule)
+                    pbar.update(1)
+                    return rows_per_sec
+
+                dimensions = [('Commit Size', commit_sizes), ('Batch Size', batch_sizes), ('Image Multiplier', image_multipliers), ('Thread Count', thread_counts), ('Connection Mode', connection_modes), ('Routing', routing_modes)]
+                if lob_modes != [None]:
+                    dimensions.append(('LOB Mode', lob_modes))
+                if document_encodings != [None]:
+                    dimensions.append(('Document Encoding', document_encodings))
+                adaptive_sweep = sweep.AdaptiveSweep(dimensions, measure_point)
+                best_point, best_rate = adaptive_sweep.run()
+        else:
+            modes = list(itertools.product(connection_modes, lob_modes, document_encodings, routing_modes))
+            with tqdm(desc="Tests Run", total=len(commit_sizes) * len(batch_sizes) * len(image_multipliers) * len(thread_counts) * len(modes)) as pbar:
+                for commit_size in commit_sizes:
+                    for batch_size in batch_sizes:
+                        for image_multiplier in image_multipliers:
+                            for thread_count in thread_counts:
+                                for connection_mode, lob_mode, document_encoding, routing in modes:
+                                    run_test_point(path_to_executable, config_model, username, password, connect_string, commit_size, batch_size, image_multiplier, thread_count, scale, async_commit, test_type, processes, jvm_display, engine, generator, run=run, producers=producers, in_flight=in_flight,
+                                                   connection_mode=connection_mode, pool_size=pool_size, storm=storm, agents=agents,
+                                                   warmup=warmup, measure=measure, rampdown=rampdown, lob_mode=lob_mode, lob_chunk_size=lob_chunk_size, document_encoding=document_encoding,
+                                                   routing=routing, telemetry_interval=telemetry_interval, collector=collector, table_reset=point_reset, pool=pool,
+                                                   schedule=rate_schedule)
+                                    pbar.update(1)
+        print_results(results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Image Size", "Async", "Connection Mode", "Routing", "Total Rows Inserted", "Real Time Taken", "Reset Time", "Total Insert Time", "Total Connection Time", "Rows/sec Inserted", "Min Rows/sec", "Median Rows/sec", "Max Rows/sec")
+        if latency_results:
+            print_results(latency_results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Connection Mode", "Routing", "Operation", "Count", "p50 (ms)", "p90 (ms)", "p99 (ms)", "p99.9 (ms)", "Max (ms)")
+        if rate_results:
+            print_results(rate_results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Connection Mode", "Routing", "Step (s)", "Target Rows/sec", "Achieved Rows/sec", "Achieved",
+                          "Batches", "p50 (ms)", "p90 (ms)", "p99 (ms)", "p99.9 (ms)", "Max (ms)")
+        if client_results:
+            print_results(client_results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Connection Mode", "Routing", "Client CPU (cores)", "Box CPU", "Peak Process CPU (cores)", "RSS Peak (MB)",
+                          "Context Switches/sec", "Net RX MB/sec", "Net TX MB/sec", "Client Bound")
+        if db_results:
+            print_results(db_results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Connection Mode", "Routing", "Statistic", "Change", "Per Row")
+        if lob_results:
+            print_results(lob_results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Image Multiplier", "LOB Mode", "LOB Size (KB)", "LOBs", "MB", "LOBs/sec", "MB/sec")
+        if document_results:
+            print_results(document_results, "JVMs Started", "Thread Count", "Commit Size", "Batch Size", "Image Multiplier", "Encoding", "Documents", "Encode Time", "Insert Time", "Encode Share", "Encode us/doc")
+        if sweep_mode == 'adaptive':
+            print("Best configuration found : {} at {:,.0f} rows/sec".format(", ".join("{} {}".format(name, value) for name, value in best_point.items()), best_rate))
+            print_results(adaptive_sweep.knees(), "Dimension", "Values Measured", "Best Value", "Knee Value", "Rows/sec at Knee")
+        print("Results recorded as run {} in {}".format(run.run_id, store_path))
+        if new_baseline is not None:
+            store.name_baseline(new_baseline, run.run_id)
+        if baseline is not None:
+            resultstore.print_comparison(store, run.run_id, baseline)
     except Exception as e:
-        print("Unable to run test : {}".format(e.message), file=sys.stderr)
+        print("Unable to run test : {}".format(e), file=sys.stderr)
         logging.exception("Unable to run test")
+    finally:
+        if collector is not None:
+            collector.close()
+        if table_reset is not None:
+            table_reset.close()
+        if pool is not None:
+            pool.close()
 
 
 if __name__ == '__main__':
@@ -208,9 +445,112 @@ if __name__ == '__main__':
     parser.add_argument("-debug", help="output debug to stdout", dest='debug_on', action='store_true')
     parser.add_argument("-async", help="Use async transactions ", dest='async_on', action='store_true')
     parser.add_argument("-ss", "-suppress", help="Suppress script output", dest='supress_script_output', action='store_true')
+    parser.add_argument("-eng", "--engine", help="run the tests with the external java tools, the in-process python engine or its asyncio variant (default=java)", choices=['java', 'python', 'asyncio'], default=DEFAULT_ENGINE)
+    parser.add_argument("-gen", "--generator", help="row generator used by the python engine, numpy compiles the xml config into vectorized batches, replay inserts a dataset pre-generated from it (default=python)", choices=['python', 'numpy', 'replay'], default=DEFAULT_GENERATOR)
+    parser.add_argument("-prod", "--producers", help="logical producers per process sharing the -tc connections of the asyncio engine (default=one per connection)", type=int)
+    parser.add_argument("-if", "--inflight", help="batches the asyncio engine keeps outstanding on each connection, whatever the number of producers (default={})".format(DEFAULT_IN_FLIGHT), type=int, default=DEFAULT_IN_FLIGHT)
+    parser.add_argument("-cm", "--connectionmodes", help="list of connection modes for the python engine, dedicated connections per thread or a session pool per process (comma seperated, default=dedicated)", default=connectionpool.DEFAULT_CONNECTION_MODE)
+    parser.add_argument("-ps", "--poolsize", help="session pool minimum,maximum,increment (default=1,<thread count>,1)")
+    parser.add_argument("-storm", help="connection storm : every batch connects (or acquires from the pool), inserts, commits and disconnects", dest='storm', action='store_true')
+    parser.add_argument("-lob", "--lobmodes", help="list of ways the python engine writes the relational image column : bound inline, temporary LOBs bound per row, or empty LOBs filled in chunks (comma seperated, default=the generator's inline value)")
+    parser.add_argument("-lobchunk", "--lobchunksize", help="KB written per call in the chunked LOB mode (default={})".format(lobwriter.DEFAULT_CHUNK_SIZE // 1024), type=int, default=lobwriter.DEFAULT_CHUNK_SIZE // 1024)
+    parser.add_argument("-de", "--documentencodings", help="list of encodings the python engines build documents in for the document schemas, JSON text into ANPR_COLLECTION or binary OSON into ANPR_COLLECTION_OSON (comma seperated, default={})".format(documentencoder.DEFAULT_DOCUMENT_ENCODING))
+    parser.add_argument("-route", "--routingmodes", help="list of ways the python engines route rows to partitions, in generated order, grouped by partition within each batch, or grouped with every worker given partitions of its own, the last two for the range partitioned relational and document schemas only (comma seperated, default={})".format(partitioning.DEFAULT_ROUTING), default=partitioning.DEFAULT_ROUTING)
+    parser.add_argument("-ti", "--telemetryinterval", help="seconds between samples of the load box's CPU, memory and network use during each point, 0 to turn sampling off (default={})".format(telemetry.DEFAULT_INTERVAL), type=float, default=telemetry.DEFAULT_INTERVAL)
+    parser.add_argument("-dbstats", "--dbstats", help="collector snapshotting database statistics and waits around each point : oracle (needs select on v$sysstat and v$system_event), none, canned:<json file> or <module>:<class> (default=none)")
+    parser.add_argument("-reset", "--reset", help="truncate the test tables over connections kept open for the run, once before the tests (start) or before every point (point) (default={})".format(tablereset.DEFAULT_RESET), choices=tablereset.RESET_MODES, default=tablereset.DEFAULT_RESET)
+    parser.add_argument("-admin", "--admin", help="sysdba credentials (user/password@connectstring) the reset switches logfiles with, as clean_up.sql does")
+    parser.add_argument("-wp", "--workerpool", help="start the python engine's worker processes once and run every point in them, reusing their connections and compiled generators", dest='worker_pool', action='store_true')
+    parser.add_argument("-rate", "--rate", help="open loop : offer rows at a target rows/sec instead of as fast as possible, one rate, a list of rates stepped through or trace:<file> of the rows/sec of each second, latency being measured from when each batch was due")
+    parser.add_argument("-ratestep", "--ratestep", help="seconds each rate is held for, and the steps a trace is reported in (default={:g})".format(ratecontrol.DEFAULT_STEP_SECONDS), type=float, default=ratecontrol.DEFAULT_STEP_SECONDS)
+    parser.add_argument("-agents", "--agents", help="run the python engine on agents started with distributed.py instead of locally (comma seperated host:port, default port {})".format(distributed.DEFAULT_PORT))
+    parser.add_argument("-warmup", "--warmup", help="seconds the python engine runs after every worker has connected before it starts measuring (default=0)", type=float, default=0)
+    parser.add_argument("-measure", "--measure", help="seconds of steady state the python engine measures, the point's rows permitting (default=until the rows are inserted)", type=float)
+    parser.add_argument("-rampdown", "--rampdown", help="seconds the python engine keeps inserting, unmeasured, after the measurement window (default=0)", type=float, default=0)
+    parser.add_argument("-sw", "--sweep", help="run every combination (grid) or search for the best one (adaptive), stopping each python engine point once its throughput has converged (default=grid)", choices=['grid', 'adaptive'], default=DEFAULT_SWEEP)
+    parser.add_argument("-tol", "--tolerance", help="relative width of the 95%% confidence interval at which an adaptive point has converged (default={})".format(sweep.DEFAULT_TOLERANCE), type=float, default=sweep.DEFAULT_TOLERANCE)
+    parser.add_argument("-gp", "--generatorparameters", help="override a datagenerator config parameter, addressed by generator id or column name (repeat for each override, e.g. -gp ANPR_ID.End=50000 -gp RowCount=200000)", action='append')
+    parser.add_argument("-store", "--store", help="results database every test point is recorded in (default={})".format(resultstore.DEFAULT_STORE), default=resultstore.DEFAULT_STORE)
+    parser.add_argument("-cmp", "--compare", help="compare the results with the named baseline once the tests complete")
+    parser.add_argument("-nb", "--namebaseline", help="record this run as the named baseline")
 
     args = parser.parse_args()
 
+    if args.engine != 'java' and args.schematype not in ingestengine.TABLES:
+        parser.error("the {} engine does not support schema type {}".format(args.engine, args.schematype))
+    if args.engine == 'asyncio' and sys.version_info[0] < 3:
+        parser.error("the asyncio engine needs python 3")
+    if args.inflight < 1:
+        parser.error("the asyncio engine needs at least 1 batch in flight")
+    connection_modes = args.connectionmodes.split(",")
+    if any(mode not in connectionpool.CONNECTION_MODES for mode in connection_modes):
+        parser.error("connection modes must be from {}".format(", ".join(connectionpool.CONNECTION_MODES)))
+    if args.engine != 'python' and (connection_modes != ['dedicated'] or args.storm):
+        parser.error("connection modes and connection storms are only supported by the python engine")
+    if args.engine == 'java' and (args.warmup or args.measure is not None or args.rampdown):
+        parser.error("warm-up, measurement and ramp-down windows are only supported by the python and asyncio engines")
+    lob_modes = args.lobmodes.split(",") if args.lobmodes else None
+    if lob_modes is not None:
+        if any(mode not in lobwriter.LOB_MODES for mode in lob_modes):
+            parser.error("LOB modes must be from {}".format(", ".join(lobwriter.LOB_MODES)))
+        if args.engine != 'python' or args.schematype != 'relational':
+            parser.error("LOB modes are only supported by the python engine with the relational schema")
+        unsupported = [mode for mode in lob_modes if not lobwriter.supported(mode, args.connectstring)]
+        if unsupported and not args.agents:
+            parser.error("LOB modes {} are not supported by this database or python version".format(", ".join(unsupported)))
+    document_encodings = args.documentencodings.split(",") if args.documentencodings else None
+    if document_encodings is not None:
+        if any(encoding not in documentencoder.DOCUMENT_ENCODINGS for encoding in document_encodings):
+            parser.error("document encodings must be from {}".format(", ".join(documentencoder.DOCUMENT_ENCODINGS)))
+        if args.engine == 'java' or args.schematype not in ingestengine.DOCUMENT_TYPES:
+            parser.error("document encodings are only supported by the python and asyncio engines with the document schemas")
+        if 'binary' in document_encodings and args.storm:
+            parser.error("binary documents are encoded by a worker's connection, which connection storms don't keep")
+        if 'binary' in document_encodings and not args.agents and not documentencoder.supported('binary', args.connectstring):
+            parser.error("binary documents are OSON, which needs python-oracledb 2.1 or later")
+    routing_modes = args.routingmodes.split(",")
+    if any(routing not in partitioning.ROUTING_MODES for routing in routing_modes):
+        parser.error("routing modes must be from {}".format(", ".join(partitioning.ROUTING_MODES)))
+    if args.engine == 'java' and routing_modes != [partitioning.DEFAULT_ROUTING]:
+        parser.error("routing modes are only supported by the python and asyncio engines")
+    if routing_modes != [partitioning.DEFAULT_ROUTING] and not partitioning.routable(args.schematype):
+        parser.error("the {} schema is hash partitioned by a hash only the database knows, so its rows can only be routed randomly".format(args.schematype))
+    admin = None
+    if args.admin:
+        try:
+            admin = tablereset.parse_credentials(args.admin)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.worker_pool and (args.engine != 'python' or args.agents or args.storm):
+        parser.error("worker pools run the python engine locally without connection storms")
+    rate_schedule = None
+    if args.rate:
+        try:
+            rate_schedule = ratecontrol.parse_schedule(args.rate, args.ratestep)
+        except (ValueError, IOError) as e:
+            parser.error(str(e))
+        if args.engine != 'python' or args.agents or args.storm or args.warmup or args.measure is not None:
+            parser.error("rate schedules run the python engine locally without connection storms, warm-up or measurement windows")
+    try:
+        overrides = configmodel.parse_overrides(args.generatorparameters)
+    except ValueError as e:
+        parser.error(str(e))
+    # Only the datagenerator and the numpy and replay generators read the config
+    if overrides and args.engine == 'java' and args.schematype not in ('relational', 'document'):
+        parser.error("generator parameters apply to the datagenerator configs, which the java {} test doesn't use".format(args.schematype))
+    if overrides and args.engine != 'java' and args.generator == 'python':
+        parser.error("generator parameters apply to the datagenerator configs, which the python generator doesn't use (try -gen numpy)")
+    if args.engine != 'java' and any(target is None and parameter == 'RowCount' for target, parameter, value in overrides):
+        parser.error("the {} engine takes its row count from -scale, not RowCount".format(args.engine))
+    if args.agents and args.engine == 'java':
+        parser.error("agents run the python or asyncio engine")
+    try:
+        connectionpool.parse_pool_size(args.poolsize, 1)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.engine != 'java' and args.generator != 'python' and args.schematype not in ingestengine.VECTOR_GENERATED:
+        parser.error("the {} generator does not support schema type {}".format(args.generator, args.schematype))
+
     if args.debug_on:
         set_logging(level=logging.DEBUG)
 
@@ -272,9 +612,36 @@ if __name__ == '__main__':
               image_multipliers=image_multipliers,
               thread_counts=thread_counts,
               scale=scale,
-              async=args.async_on,
+              async_commit=args.async_on,
               test_type=test_type,
               processes=process_counts,
               jvm_display=args.jvm_display,
               script_name=script_name,
-              supress_script_output=args.supress_script_output)
+              supress_script_output=args.supress_script_output,
+              engine=args.engine,
+              generator=args.generator,
+              sweep_mode=args.sweep,
+              tolerance=args.tolerance,
+              store_path=args.store,
+              baseline=args.compare,
+              new_baseline=args.namebaseline,
+              overrides=overrides,
+              producers=args.producers,
+              in_flight=args.inflight,
+              connection_modes=connection_modes,
+              pool_size=args.poolsize,
+              storm=args.storm,
+              agents=distributed.parse_agents(args.agents) if args.agents else None,
+              warmup=args.warmup,
+              measure=args.measure,
+              rampdown=args.rampdown,
+              lob_modes=lob_modes,
+              lob_chunk_size=args.lobchunksize * 1024,
+              document_encodings=document_encodings,
+              routing_modes=routing_modes,
+              telemetry_interval=args.telemetryinterval,
+              db_stats=args.dbstats,
+              reset=args.reset,
+              admin=admin,
+              worker_pool=args.worker_pool,
+              rate_schedule=rate_schedule)
@@ -0,0 +1,114 @@
+from __future__ import division
+
+import logging
+import math
+from collections import OrderedDict
+
+import metrics
+
+DEFAULT_TOLERANCE = 0.05
+DEFAULT_MINIMUM_INTERVALS = 5
+DEFAULT_PLATEAU = 0.05
+DEFAULT_KNEE = 0.95
+DEFAULT_PASSES = 2
+
+
+class ConvergenceCheck(object):
+    # Passed to the engine, which stops the point once the aggregate interval throughput is known
+    # to within tolerance. The first interval is ramp-up and is ignored
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, minimum_intervals=DEFAULT_MINIMUM_INTERVALS):
+        self.tolerance = tolerance
+        self.minimum_intervals = minimum_intervals
+
+    def __call__(self, series):
+        rates = series.aggregate_rates()[1:]
+        if len(rates) < self.minimum_intervals:
+            return False
+        mean, half_width = metrics.confidence_interval(rates)
+        return mean > 0 and half_width <= self.tolerance * mean
+
+
+def sort_values(values):
+    # Numeric dimensions are walked in increasing order, others (connection and LOB modes) in the order given
+    try:
+        return sorted(values, key=float)
+    except (TypeError, ValueError):
+        return list(values)
+
+
+class AdaptiveSweep(object):
+    # Coordinate search over the test dimensions. Each dimension in turn is walked over a coarse subset
+    # of its values with the others held at the best point so far, the walk stops once throughput has
+    # plateaued, and the values between the best coarse point's neighbours are then measured. Passes
+    # repeat until the best point stops moving. Every point is measured at most once
+
+    def __init__(self, dimensions, measure, plateau=DEFAULT_PLATEAU, knee=DEFAULT_KNEE, passes=DEFAULT_PASSES):
+        self.dimensions = OrderedDict((name, sort_values(values)) for name, values in dimensions)
+        self.measure = measure
+        self.plateau = plateau
+        self.knee = knee
+        self.passes = passes
+        self.measured = {}
+        self.best = None
+
+    def key(self, point):
+        return tuple(point[name] for name in self.dimensions)
+
+    def evaluate(self, point):
+        key = self.key(point)
+        if key not in self.measured:
+            self.measured[key] = self.measure(point)
+            logging.debug("Measured {} : {:,.0f} rows/sec".format(dict(point), self.measured[key]))
+        return self.measured[key]
+
+    def search_dimension(self, name, best):
+        values = self.dimensions[name]
+        stride = max(1, int(math.sqrt(len(values))))
+        coarse = list(range(0, len(values), stride))
+        if coarse[-1] != len(values) - 1:
+            coarse.append(len(values) - 1)
+        rates = {}
+        best_index, best_rate, flat_steps = None, None, 0
+        for index in coarse:
+            rates[index] = self.evaluate(dict(best, **{name: values[index]}))
+            if best_rate is None or rates[index] > best_rate * (1 + self.plateau):
+                flat_steps = 0
+            else:
+                flat_steps += 1
+            if best_rate is None or rates[index] > best_rate:
+                best_index, best_rate = index, rates[index]
+            if flat_steps >= 2:
+                break
+        position = coarse.index(best_index)
+        low = coarse[position - 1] if position > 0 else best_index
+        high = coarse[position + 1] if position + 1 < len(coarse) else best_index
+        for index in range(low + 1, high):
+            rate = self.evaluate(dict(best, **{name: values[index]}))
+            if rate > best_rate:
+                best_index, best_rate = index, rate
+        return values[best_index]
+
+    def run(self):
+        best = OrderedDict((name, values[0]) for name, values in self.dimensions.items())
+        for sweep_pass in range(self.passes):
+            previous = dict(best)
+            for name in self.dimensions:
+                best[name] = self.search_dimension(name, best)
+            if dict(best) == previous:
+                break
+        self.best = best
+        return best, self.evaluate(best)
+
+    def knees(self):
+        # For each dimension, the smallest value that reaches knee * the best throughput with the other
+        # dimensions held at the best point. Call after run()
+        best = self.best
+        knees = []
+        for name, values in self.dimensions.items():
+            curve = [(value, self.measured[self.key(dict(best, **{name: value}))]) for value in values
+                     if self.key(dict(best, **{name: value})) in self.measured]
+            peak = max(rate for value, rate in curve)
+            knee_value, knee_rate = next((value, rate) for value, rate in curve if rate >= self.knee * peak)
+            knees.append((name, len(curve), best[name], knee_value, "{0:,.0f}".format(knee_rate)))
+        return knees
@@ -0,0 +1,103 @@
+from __future__ import print_function
+
+import logging
+import time
+from threading import Thread
+
+import ingestengine
+
+RESET_MODES = ['none', 'start', 'point']
+DEFAULT_RESET = 'none'
+# The tables clean_up.sql truncates
+RESET_TABLES = ["ANPR_RELATIONAL", "ANPR_COLLECTION", "ANPR_COLLECTION_OSON", "SIMPLETABLE", "INSERTABLE"]
+
+# Does what clean_up.sql does without starting sqlcl or reconnecting : a log switch, the truncates and another
+# log switch. The schema connections (one per table, so the truncates run in parallel) and the admin connection
+# for the log switches stay open for the whole run. Without admin credentials there are no log switches. Tables
+# the schema doesn't have (e.g. ANPR_COLLECTION_OSON before the OSON schema was added) are left out. On the
+# SQLite stand-in the tables are emptied with DELETE and a WAL checkpoint takes the place of the log switch
+
+
+def parse_credentials(credentials):
+    # user/password@connect_string
+    user_password, _, connect_string = credentials.partition("@")
+    username, _, password = user_password.partition("/")
+    if not username or not connect_string:
+        raise ValueError("Credentials {} are not of the form user/password@connect_string".format(credentials))
+    return username, password, connect_string
+
+
+def connect_admin(username, password, connect_string):
+    if connect_string.startswith(ingestengine.SQLITE_PREFIX):
+        return ingestengine.connect(username, password, connect_string)
+    driver = ingestengine.get_driver(connect_string)
+    mode = getattr(driver, "AUTH_MODE_SYSDBA", None) or driver.SYSDBA
+    return driver.connect(user=username, password=password, dsn=connect_string, mode=mode)
+
+
+def existing_tables(connection, sqlite):
+    cursor = connection.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'" if sqlite else "SELECT table_name FROM user_tables")
+    names = set(row[0].upper() for row in cursor.fetchall())
+    cursor.close()
+    return names
+
+
+class TableReset(object):
+
+    def __init__(self, username, password, connect_string, admin=None, tables=None):
+        self.sqlite = connect_string.startswith(ingestengine.SQLITE_PREFIX)
+        connection = ingestengine.connect(username, password, connect_string)
+        existing = existing_tables(connection, self.sqlite)
+        tables = tables or RESET_TABLES
+        missing = [table for table in tables if table.upper() not in existing]
+        if missing:
+            logging.debug("Tables {} are not in the schema and won't be reset".format(", ".join(missing)))
+        self.tables = [table for table in tables if table.upper() in existing]
+        self.connections = [connection] + [ingestengine.connect(username, password, connect_string) for _ in self.tables[1:]]
+        if not self.tables:
+            connection.close()
+            self.connections = []
+        self.admin = connect_admin(*admin) if admin is not None else None
+
+    def switch_logfile(self):
+        if self.admin is None:
+            return
+        cursor = self.admin.cursor()
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)" if self.sqlite else "ALTER SYSTEM SWITCH LOGFILE")
+        cursor.close()
+
+    def truncate(self, connection, table, failures):
+        try:
+            cursor = connection.cursor()
+            if self.sqlite:
+                cursor.execute("DELETE FROM {}".format(table))
+                connection.commit()
+            else:
+                cursor.execute("TRUNCATE TABLE {} REUSE STORAGE".format(table))
+            cursor.close()
+        except Exception as e:
+            failures.append(e)
+
+    def reset(self):
+        # Returns the seconds taken
+        start = time.time()
+        self.switch_logfile()
+        failures = []
+        threads = [Thread(target=self.truncate, args=(connection, table, failures)) for connection, table in zip(self.connections, self.tables)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if failures:
+            raise failures[0]
+        self.switch_logfile()
+        elapsed = time.time() - start
+        logging.debug("Tables {} reset in {:.3f}s".format(", ".join(self.tables), elapsed))
+        return elapsed
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        if self.admin is not None:
+            self.admin.close()
@@ -0,0 +1,163 @@
+from __future__ import print_function, division
+
+import logging
+import os
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.5
+# A point is client-bound once the load box's CPUs are this busy, or when a python worker process (one core
+# at most, the GIL) is this busy
+SATURATION = 0.9
+MEGABYTE = 1024 * 1024
+
+# Samples /proc on Linux for the harness and every process it starts, directly or not (worker processes, the
+# java tools and their shells). Each sample holds the processes' CPU ticks, resident memory and context
+# switches, the box's CPU counters and its network byte counts. /proc/net/dev counts the whole host, as
+# /proc has no per-process network figures. Elsewhere the sampler records nothing
+
+
+def read_file(path):
+    with open(path) as proc_file:
+        return proc_file.read()
+
+
+def process_stats():
+    # pid -> (ppid, CPU ticks including reaped children, resident pages) for every process
+    stats = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            stat = read_file("/proc/{}/stat".format(name))
+        except (IOError, OSError):
+            continue
+        # The command name is in parentheses and may contain spaces
+        fields = stat[stat.rindex(")") + 2:].split()
+        stats[int(name)] = (int(fields[1]), sum(int(ticks) for ticks in fields[11:15]), int(fields[21]))
+    return stats
+
+
+def descendants(stats, root):
+    children = {}
+    for pid, (ppid, ticks, rss) in stats.items():
+        children.setdefault(ppid, []).append(pid)
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def context_switches(pid):
+    # Summed over the process's threads, threads that have exited are no longer counted
+    switches = 0
+    try:
+        for task in os.listdir("/proc/{}/task".format(pid)):
+            for line in read_file("/proc/{}/task/{}/status".format(pid, task)).splitlines():
+                if "ctxt_switches:" in line:
+                    switches += int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return switches
+
+
+def box_cpu():
+    # Busy and total ticks across all CPUs
+    fields = [int(value) for value in read_file("/proc/stat").splitlines()[0].split()[1:]]
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return sum(fields) - idle, sum(fields)
+
+
+def network_bytes():
+    received, transmitted = 0, 0
+    for line in read_file("/proc/net/dev").splitlines()[2:]:
+        interface, counters = line.split(":", 1)
+        if interface.strip() == "lo":
+            continue
+        counters = counters.split()
+        received += int(counters[0])
+        transmitted += int(counters[8])
+    return received, transmitted
+
+
+class Sample(object):
+
+    def __init__(self, root):
+        self.time = time.time()
+        stats = process_stats()
+        tree = descendants(stats, root)
+        self.ticks = dict((pid, stats[pid][1]) for pid in tree if pid in stats)
+        self.rss = sum(stats[pid][2] for pid in tree if pid in stats)
+        self.switches = sum(context_switches(pid) for pid in tree)
+        self.box_busy, self.box_total = box_cpu()
+        self.received, self.transmitted = network_bytes()
+
+
+class ClientSampler(object):
+    # Started before a test point and stopped after it, sampling every interval seconds on a daemon thread
+
+    def __init__(self, interval=DEFAULT_INTERVAL, root=None):
+        self.interval = interval
+        self.root = root or os.getpid()
+        self.available = os.path.exists("/proc/{}/stat".format(self.root)) and os.path.exists("/proc/net/dev")
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = None
+        self.clock_ticks = os.sysconf("SC_CLK_TCK") if self.available else 100
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if self.available else 4096
+
+    def sample(self):
+        try:
+            self.samples.append(Sample(self.root))
+        except (IOError, OSError, ValueError, IndexError):
+            logging.debug("Unable to sample /proc", exc_info=True)
+
+    def run(self):
+        while True:
+            self.sample()
+            if self.stopped.wait(self.interval):
+                return
+
+    def start(self):
+        if not self.available:
+            return self
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.sample()
+        return self
+
+    def summary(self, start=None, end=None, gil_bound=False):
+        # Figures for the samples from start to end (the measured window), None without two samples. With
+        # gil_bound the workers are python processes, saturated at one core each
+        samples = [sample for sample in self.samples if (start is None or sample.time >= start) and (end is None or sample.time <= end)]
+        if len(samples) < 2:
+            samples = self.samples
+        if len(samples) < 2:
+            return None
+        first, last = samples[0], samples[-1]
+        elapsed = last.time - first.time
+        if elapsed <= 0:
+            return None
+        # Processes that exit are reaped within the tree, their ticks moving to the parent's children's ticks
+        cores = (sum(last.ticks.values()) - sum(first.ticks.values())) / self.clock_ticks / elapsed
+        workers = [pid for pid in last.ticks if pid in first.ticks and pid != self.root]
+        worker_peak = max([(last.ticks[pid] - first.ticks[pid]) / self.clock_ticks / elapsed for pid in workers] or [0.0])
+        box = (last.box_busy - first.box_busy) / (last.box_total - first.box_total) if last.box_total > first.box_total else 0.0
+        switches = sum(max(0, after.switches - before.switches) for before, after in zip(samples, samples[1:]))
+        return {"cpu_cores": cores,
+                "box_cpu": box,
+                "worker_cpu_peak": worker_peak,
+                "rss_peak_mb": max(sample.rss for sample in samples) * self.page_size / MEGABYTE,
+                "context_switches_per_sec": switches / elapsed,
+                "net_rx_mb_per_sec": (last.received - first.received) / MEGABYTE / elapsed,
+                "net_tx_mb_per_sec": (last.transmitted - first.transmitted) / MEGABYTE / elapsed,
+                "client_bound": box >= SATURATION or (gil_bound and worker_peak >= SATURATION)}
@@ -0,0 +1,114 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import asyncingest
+import ingestengine
+
+
+class RecordingConnection(asyncingest.ExecutorConnection):
+    # Remembers the largest group of batches sent together
+
+    def __init__(self, loop):
+        super(RecordingConnection, self).__init__(loop)
+        self.largest_group = 0
+
+    async def run(self, statement, batches, commit):
+        self.largest_group = max(self.largest_group, len(batches))
+        return await super(RecordingConnection, self).run(statement, batches, commit)
+
+
+class FailingConnection(object):
+
+    def __init__(self):
+        self.error = RuntimeError("connection lost")
+
+    async def run(self, statement, batches, commit):
+        await asyncio.sleep(0.01)
+        raise self.error
+
+
+def expected_batches(row_count, producers, batch_size):
+    rows_per_producer = row_count // producers
+    batches = 0
+    for producer in range(producers):
+        producer_rows = rows_per_producer + (row_count % producers if producer == producers - 1 else 0)
+        batches += (producer_rows + batch_size - 1) // batch_size
+    return batches
+
+
+def test_counters_add_up_across_producers_and_connections(tmp_path):
+    connect_string = ingestengine.SQLITE_PREFIX + str(tmp_path / "ingest.db")
+    connections, producers, in_flight = 2, 7, 2
+    counters = ingestengine.SharedCounters(connections)
+    histograms = ingestengine.SharedHistograms(connections)
+    asyncingest.run_process("x", "x", connect_string, "simple", 0, 1000, 30, 100, connections, False, 0, counters, histograms, threading.Event(),
+                            producers=producers, in_flight=in_flight)
+    batches = expected_batches(1000, producers, 30)
+    assert counters.total(ingestengine.FAILURES) == 0
+    assert counters.total(ingestengine.ROWS) == 1000
+    assert counters.total(ingestengine.BATCHES) == batches
+    # Both connections served their share of the producers
+    assert all(counters.get(worker, ingestengine.ROWS) > 0 for worker in range(connections))
+    assert histograms.histogram(ingestengine.BATCH_LATENCY).count() == batches
+    assert histograms.histogram(ingestengine.QUEUE_LATENCY).count() == batches
+    connection = sqlite3.connect(connect_string[len(ingestengine.SQLITE_PREFIX):])
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM SIMPLETABLE").fetchone()[0] == 1000
+    finally:
+        connection.close()
+
+
+def test_connection_never_has_more_than_in_flight_batches(tmp_path):
+    connect_string = ingestengine.SQLITE_PREFIX + str(tmp_path / "ingest.db")
+    counters = ingestengine.SharedCounters(1)
+    histograms = ingestengine.SharedHistograms(1)
+    table_name, columns = ingestengine.target_table("simple")
+    statement = ingestengine.insert_statement(ingestengine.get_driver(connect_string), table_name, columns)
+    generate_rows = ingestengine.ROW_GENERATORS["simple"]
+
+    async def run(loop):
+        connection = RecordingConnection(loop)
+        await connection.open("x", "x", connect_string, False)
+        worker = asyncingest.ConnectionWorker(loop, connection, statement, 50, 3, counters, histograms, 0)
+        worker.producers = 8
+        try:
+            await asyncio.gather(worker.serve(0.0), *(asyncingest.produce(worker, generate_rows, ingestengine.random.Random(), producer * 100 + 1, 100, 10, 0, threading.Event())
+                                                      for producer in range(8)))
+        finally:
+            await connection.close()
+        return connection.largest_group
+
+    loop = asyncio.new_event_loop()
+    try:
+        largest_group = loop.run_until_complete(run(loop))
+    finally:
+        loop.close()
+    assert 1 <= largest_group <= 3
+    assert counters.total(ingestengine.ROWS) == 800
+    assert counters.total(ingestengine.BATCHES) == 80
+
+
+def test_failing_connection_makes_waiting_producers_raise():
+    counters = ingestengine.SharedCounters(1)
+    histograms = ingestengine.SharedHistograms(1)
+    connection = FailingConnection()
+    generate_rows = ingestengine.ROW_GENERATORS["simple"]
+
+    async def run(loop):
+        worker = asyncingest.ConnectionWorker(loop, connection, "INSERT", 100, 1, counters, histograms, 0)
+        worker.producers = 4
+        producers = [asyncingest.produce(worker, generate_rows, ingestengine.random.Random(), producer * 100 + 1, 100, 10, 0, threading.Event())
+                     for producer in range(4)]
+        # Without the error being passed on the producers stuck waiting for a slot would never return
+        return await asyncio.wait_for(asyncio.gather(worker.serve(0.0), *producers, return_exceptions=True), 5)
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run(loop))
+    finally:
+        loop.close()
+    assert all(result is connection.error for result in results)
+    assert counters.total(ingestengine.ROWS) == 0
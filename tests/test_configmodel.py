@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+import configmodel
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "anpr_relationalv2.xml")
+
+
+def test_parse_overrides():
+    assert configmodel.parse_overrides(["IMAGE_GENERATOR.MinimumRepetitions=5", " RowCount = 1000 "]) == [("IMAGE_GENERATOR", "MinimumRepetitions", "5"), (None, "RowCount", "1000")]
+
+
+def test_override_values_may_hold_commas_and_equals():
+    assert configmodel.parse_overrides(["VEHICLE_COLOUR.EnumerationValues=Red,Blue", "NUMBER_PLATE.Format=A=B"]) == [("VEHICLE_COLOUR", "EnumerationValues", "Red,Blue"), ("NUMBER_PLATE", "Format", "A=B")]
+
+
+def test_no_overrides():
+    assert configmodel.parse_overrides(None) == []
+    assert configmodel.parse_overrides([]) == []
+
+
+def test_override_without_a_value_is_rejected():
+    with pytest.raises(ValueError):
+        configmodel.parse_overrides(["IMAGE_GENERATOR.MinimumRepetitions"])
+
+
+def test_overrides_are_applied_to_variants_only(tmp_path):
+    model = configmodel.ConfigModel(CONFIG, configmodel.parse_overrides(["RowCount=1000"]), cache_directory=str(tmp_path))
+    variant = model.variant(configmodel.image_overrides(3))
+    assert all(table.get("RowCount") == "1000" for table in variant.iter(configmodel.NS + "Table"))
+    generator = next(generator for column, generator in configmodel.matching_generators(variant, "IMAGE_GENERATOR"))
+    assert generator.findtext(configmodel.NS + "MinimumRepetitions") == "3"
+    original = next(generator for column, generator in configmodel.matching_generators(model.root, "IMAGE_GENERATOR"))
+    assert original.findtext(configmodel.NS + "MinimumRepetitions") == "10"
+
+
+def test_identical_variants_share_a_file(tmp_path):
+    model = configmodel.ConfigModel(CONFIG, cache_directory=str(tmp_path))
+    path = model.materialize(configmodel.image_overrides(2))
+    assert os.path.exists(path)
+    assert configmodel.ConfigModel(CONFIG, cache_directory=str(tmp_path)).materialize(configmodel.image_overrides(2)) == path
+    assert model.materialize(configmodel.image_overrides(4)) != path
+
+
+def test_unknown_targets_and_parameters_fail_up_front(tmp_path):
+    with pytest.raises(ValueError):
+        configmodel.ConfigModel(CONFIG, [("NO_SUCH_GENERATOR", "MinimumRepetitions", "1")], cache_directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        configmodel.ConfigModel(CONFIG, [("IMAGE_GENERATOR", "NoSuchParameter", "1")], cache_directory=str(tmp_path))
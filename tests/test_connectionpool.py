@@ -0,0 +1,25 @@
+import pytest
+
+import connectionpool
+
+
+def test_default_pool_grows_to_a_session_per_thread():
+    assert connectionpool.parse_pool_size(None, 8) == (1, 8, 1)
+    assert connectionpool.parse_pool_size("", 4) == (1, 4, 1)
+
+
+def test_pool_size():
+    assert connectionpool.parse_pool_size("2,16,2", 8) == (2, 16, 2)
+    assert connectionpool.parse_pool_size("0,1,1", 8) == (0, 1, 1)
+
+
+@pytest.mark.parametrize("pool_size", ["4,2,1", "-1,4,1", "0,0,1"])
+def test_impossible_pool_sizes_are_rejected(pool_size):
+    with pytest.raises(ValueError):
+        connectionpool.parse_pool_size(pool_size, 8)
+
+
+@pytest.mark.parametrize("pool_size", ["4", "1,4", "a,b,c"])
+def test_malformed_pool_sizes_are_rejected(pool_size):
+    with pytest.raises(ValueError):
+        connectionpool.parse_pool_size(pool_size, 8)
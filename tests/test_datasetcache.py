@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import batchgenerator
+import configmodel
+import datasetcache
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "anpr_relationalv2.xml")
+
+
+@pytest.fixture
+def config(tmp_path):
+    return configmodel.ConfigModel(CONFIG, cache_directory=str(tmp_path)).variant(configmodel.image_overrides(3))
+
+
+def test_replay_matches_the_generator(config, tmp_path):
+    path = datasetcache.cached_dataset(config, 2500, cache_directory=str(tmp_path))
+    generated = batchgenerator.batch_to_rows(batchgenerator.TableGenerator(config).generate_batch(np.random.RandomState(datasetcache.DEFAULT_SEED), 1, 2500))
+    dataset = datasetcache.Dataset(path)
+    assert dataset.rows_for_keys(1, 2500) == generated
+    assert dataset.rows_for_keys(1001, 10) == generated[1000:1010]
+
+
+def test_keys_past_the_end_wrap(config, tmp_path):
+    dataset = datasetcache.Dataset(datasetcache.cached_dataset(config, 100, cache_directory=str(tmp_path)))
+    rows = dataset.rows_for_keys(91, 20)
+    assert rows == dataset.rows_for_keys(91, 10) + dataset.rows_for_keys(1, 10)
+
+
+def test_low_cardinality_strings_share_a_dictionary(config, tmp_path):
+    dataset = datasetcache.Dataset(datasetcache.cached_dataset(config, 1000, cache_directory=str(tmp_path)))
+    dictionaries = dict((name, dictionary) for name, (values, nulls, dictionary) in zip(dataset.column_names, dataset.columns))
+    assert dictionaries["NUMBER_PLATE_IMAGE"] is not None and len(dictionaries["NUMBER_PLATE_IMAGE"]) == 1
+    assert dictionaries["VEHICLE_COLOUR"] is not None
+    assert dictionaries["NUMBER_PLATE"] is None
+    image = dataset.column_names.index("NUMBER_PLATE_IMAGE")
+    rows = dataset.rows_for_keys(1, 50)
+    assert all(row[image] is rows[0][image] for row in rows)
+    # Every row's image is stored once, not once per row
+    assert os.path.getsize(dataset.path) < 1000 * len(rows[0][image])
+
+
+def test_batches_are_views_of_the_mapping(config, tmp_path):
+    dataset = datasetcache.Dataset(datasetcache.cached_dataset(config, 100, cache_directory=str(tmp_path)))
+    for values, nulls, dictionary in dataset.batch(10, 20):
+        assert len(values) == 20 and not values.flags.owndata
@@ -0,0 +1,102 @@
+import json
+import logging
+
+import pytest
+
+import dbstats
+import ingestengine
+
+
+class RecordingCollector(object):
+    # Stands in for a site's own collector, named by module:class
+
+    def __init__(self, username, password, connect_string):
+        self.arguments = (username, password, connect_string)
+
+    def snapshot(self):
+        return {"redo size": 1}
+
+    def close(self):
+        pass
+
+
+class FailingCollector(object):
+
+    def snapshot(self):
+        raise RuntimeError("ORA-00942: table or view does not exist")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def canned(tmp_path):
+    path = tmp_path / "snapshots.json"
+    path.write_text(json.dumps([{"redo size": 100, "user commits": 5}, {"redo size": 600, "user commits": 9}]))
+    return str(path)
+
+
+def test_canned_collector_serves_its_snapshots_then_repeats_the_last(canned):
+    collector = dbstats.CannedCollector(canned)
+    assert collector.snapshot() == {"redo size": 100, "user commits": 5}
+    assert collector.snapshot() == {"redo size": 600, "user commits": 9}
+    assert collector.snapshot() == {"redo size": 600, "user commits": 9}
+
+
+def test_canned_snapshots_are_copies(canned):
+    collector = dbstats.CannedCollector(canned)
+    collector.snapshot()["redo size"] = 0
+    collector.served = 0
+    assert collector.snapshot()["redo size"] == 100
+
+
+def test_empty_canned_file_is_rejected(tmp_path):
+    path = tmp_path / "snapshots.json"
+    path.write_text("[]")
+    with pytest.raises(ValueError):
+        dbstats.CannedCollector(str(path))
+
+
+@pytest.mark.parametrize("spec", [None, "none"])
+def test_no_collector(spec):
+    assert dbstats.collector(spec, "x", "x", "db") is None
+
+
+def test_canned_spec(canned):
+    assert isinstance(dbstats.collector("canned:" + canned, "x", "x", "db"), dbstats.CannedCollector)
+
+
+def test_module_and_class_spec():
+    collector = dbstats.collector("{}:RecordingCollector".format(__name__), "scott", "tiger", "db")
+    assert isinstance(collector, RecordingCollector)
+    assert collector.arguments == ("scott", "tiger", "db")
+
+
+@pytest.mark.parametrize("spec", ["oracel", "canned"])
+def test_unknown_spec_is_rejected(spec):
+    with pytest.raises(ValueError):
+        dbstats.collector(spec, "x", "x", "db")
+
+
+def test_oracle_collector_that_cannot_query_is_left_out(tmp_path, caplog):
+    # SQLite has no v$ views, much as a schema without grants on them can't query them
+    with caplog.at_level(logging.WARNING):
+        assert dbstats.collector("oracle", "x", "x", ingestengine.SQLITE_PREFIX + str(tmp_path / "ingest.db")) is None
+    assert "Unable to collect database statistics" in caplog.text
+
+
+def test_failed_snapshot_is_missing(caplog):
+    with caplog.at_level(logging.WARNING):
+        assert dbstats.snapshot(FailingCollector()) is None
+    assert "ORA-00942" in caplog.text
+
+
+def test_deltas_are_normalised_per_row():
+    before = {"redo size": 1000, "user commits": 10, "physical writes": 7, "log file sync (waits)": 3}
+    after = {"redo size": 51000, "user commits": 20, "physical writes": 7, "enq: TX - index contention (waits)": 2}
+    # Unchanged values and those missing from either snapshot are left out
+    assert dbstats.deltas(before, after, 1000) == {"redo size": (50000, 50.0), "user commits": (10, 0.01)}
+
+
+def test_deltas_without_rows():
+    assert dbstats.deltas({"redo size": 10}, {"redo size": 30}, 0) == {"redo size": (20, 0.0)}
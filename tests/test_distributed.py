@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import distributed
+import ingestengine
+import metrics
+
+
+@pytest.fixture
+def agents():
+    servers = [distributed.AgentServer(("127.0.0.1", 0), distributed.AgentHandler) for _ in range(2)]
+    for server in servers:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+    yield [server.server_address for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def parameters(connect_string):
+    return {"username": "x", "password": "x", "connect_string": connect_string, "test_type": "simple", "processes": 2, "row_count": 300,
+            "batch_size": 50, "commit_size": 100, "thread_count": 2, "async_commit": False, "image_multiplier": 0}
+
+
+def test_agents_results_are_merged(agents, tmp_path):
+    connect_string = ingestengine.SQLITE_PREFIX + str(tmp_path / "ingest.db")
+    series = metrics.ThroughputSeries(0.0)
+    latencies = {}
+    window = {}
+    before = time.time()
+    process_results = distributed.run_point(agents, parameters(connect_string), series=series, latencies=latencies, window=window, start_delay=0.5)
+    after = time.time()
+
+    # Two agents of two processes, each process inserting its 300 rows in six batches over its two threads
+    assert len(process_results) == 4
+    assert sum(result[1] for result in process_results) == 1200
+    connection = sqlite3.connect(connect_string[len(ingestengine.SQLITE_PREFIX):])
+    try:
+        assert connection.execute("SELECT COUNT(*), COUNT(DISTINCT COLUMN1) FROM SIMPLETABLE").fetchone() == (1200, 1200)
+    finally:
+        connection.close()
+    assert latencies["Batch Insert"].count() == 24
+    assert latencies["Connect"].count() == 8
+    assert sum(samples[-1][1] for samples in series.samples.values()) == 1200
+    assert sorted(series.samples) == ["0:0", "0:1", "1:0", "1:1"]
+
+    # The workers connect while the point is prepared, so the window opens at the start time rather than
+    # after the agents have started their workers
+    assert before + 0.5 <= window["start"] < window["end"] <= after
+    for samples in series.samples.values():
+        assert samples[-1][0] <= window["end"] - window["start"] + 1.0
+
+
+def test_start_before_prepare_is_refused(agents):
+    client = distributed.AgentClient(agents[0])
+    try:
+        with pytest.raises(RuntimeError, match="Start received before prepare"):
+            client.request({"command": "start", "start_at": time.time()})
+    finally:
+        client.close()
@@ -0,0 +1,36 @@
+import json
+import random
+import sqlite3
+
+import documentencoder
+import ingestengine
+
+
+def binary_documents(light):
+    encoder = documentencoder.BinaryEncoder(1, light, documentencoder.oson_encoder(sqlite3.connect(":memory:")))
+    fields = documentencoder.generate_fields(random.Random(0), 20)
+    return fields, encoder.encode(fields)
+
+
+def test_binary_encoder_encodes_every_row_on_its_own():
+    fields, rows = binary_documents(False)
+    assert len(rows) == 20
+    for field, (anpr_id, collected, encoded) in zip(fields, rows):
+        document = json.loads(encoded.decode("utf-8"))
+        assert document["ANPRId"] == anpr_id == field[0]
+        assert document["CollectionTime"] == collected.isoformat()
+        assert document["NumberPlate"] == field[3]
+        assert document["VehicleColour"] == ingestengine.VEHICLE_COLOURS[field[6]]
+        assert document["NumberPlateImage"] == ingestengine.IMAGE_DATA
+
+
+def test_light_documents_have_no_image():
+    _, rows = binary_documents(True)
+    assert all("NumberPlateImage" not in json.loads(encoded.decode("utf-8")) for _, _, encoded in rows)
+
+
+def test_text_and_binary_documents_agree():
+    fields = documentencoder.generate_fields(random.Random(0), 20)
+    text = documentencoder.TextEncoder(1, False).encode(fields)
+    _, binary = binary_documents(False)
+    assert [json.loads(document) for _, _, document in text] == [json.loads(encoded.decode("utf-8")) for _, _, encoded in binary]
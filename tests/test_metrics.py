@@ -0,0 +1,71 @@
+import pytest
+
+import metrics
+
+
+def test_small_values_have_buckets_of_their_own():
+    for value in range(2 * metrics.HALF_BUCKETS):
+        assert metrics.bucket_index(value) == value
+        assert metrics.bucket_value(value) == value
+
+
+def test_buckets_hold_values_within_one_percent():
+    previous = -1
+    for value in list(range(0, 5000)) + [10 ** 5, 123456, 10 ** 6, 987654321, 2 ** 31]:
+        index = metrics.bucket_index(value)
+        assert index >= previous
+        previous = index
+        assert value <= metrics.bucket_value(index) <= value * 1.01
+
+
+def test_values_past_the_last_bucket_are_clamped():
+    assert metrics.bucket_index(2 ** 60) == metrics.BUCKET_COUNT - 1
+
+
+def test_percentiles():
+    histogram = metrics.LatencyHistogram()
+    for milliseconds in range(1, 1001):
+        histogram.record(milliseconds / 1000.0)
+    assert histogram.count() == 1000
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.01)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.01)
+    assert histogram.maximum() == pytest.approx(1.0, rel=0.01)
+    assert histogram.summary()[-1] == histogram.maximum()
+
+
+def test_empty_histogram_has_no_percentiles():
+    histogram = metrics.LatencyHistogram()
+    assert histogram.percentile(99) is None
+    assert histogram.maximum() is None
+    assert histogram.statistics() == (0, 0.0, 0.0)
+
+
+def test_merge_adds_counts():
+    first, second = metrics.LatencyHistogram(), metrics.LatencyHistogram()
+    first.record(0.001)
+    second.record(0.001)
+    second.record(0.5)
+    first.merge(second)
+    assert first.count() == 3
+    assert first.percentile(50) == pytest.approx(0.001, rel=0.01)
+    assert first.maximum() == pytest.approx(0.5, rel=0.01)
+
+
+def test_binomial_tail():
+    assert metrics.binomial_tail(10, 0, 0.5) == 1.0
+    assert metrics.binomial_tail(10, 10, 0.5) == pytest.approx(1 / 1024.0)
+    assert metrics.binomial_tail(100, 3, 0.01) == pytest.approx(0.0794, abs=0.0001)
+    assert metrics.binomial_tail(1000000, 11000, 0.01) < 1e-20
+
+
+def test_tail_increase():
+    baseline = metrics.LatencyHistogram()
+    for milliseconds in range(1, 1001):
+        baseline.record(milliseconds / 1000.0)
+    p99 = baseline.percentile(99)
+    assert not metrics.tail_increase(baseline, p99, 0.01)
+    slower = metrics.LatencyHistogram(baseline.counts)
+    for _ in range(50):
+        slower.record(2.0)
+    assert slower.count_above(p99) == baseline.count_above(p99) + 50
+    assert metrics.tail_increase(slower, p99, 0.01)
@@ -0,0 +1,59 @@
+import pytest
+
+import partitioning
+
+
+def rows(keys):
+    return [(key, "row {}".format(number)) for number, key in enumerate(keys)]
+
+
+def test_grouped_routing_orders_a_batch_by_partition_keeping_generated_order_within_it():
+    router = partitioning.Router('relational', 'grouped', 0, 4)
+    routed = router.route(rows([5500, 1200, 5100, 1900, 2300]))
+    assert [row[0] for row in routed] == [1200, 1900, 2300, 5500, 5100]
+    assert [row[1] for row in routed] == ["row 1", "row 3", "row 4", "row 0", "row 2"]
+
+
+def test_affinity_gives_each_worker_partitions_of_its_own():
+    workers = 4
+    seen = {}
+    for worker in range(workers):
+        router = partitioning.Router('document', 'affinity', worker, workers)
+        routed = router.route(rows(range(1000, 30000, 7)))
+        partitions = set(partitioning.ANPR_PARTITIONING.partition(row[0]) for row in routed)
+        assert partitions <= set(router.owned)
+        for partition in partitions:
+            assert seen.setdefault(partition, worker) == worker
+
+
+def test_affinity_moves_keys_keeping_their_offset_within_the_interval():
+    router = partitioning.Router('relational', 'affinity', 1, 3)
+    for key in range(1000, 5000):
+        assigned = router.assign(key)
+        assert assigned % 1000 == key % 1000
+        assert assigned // 1000 in router.owned
+
+
+def test_grouped_routing_leaves_keys_alone():
+    router = partitioning.Router('relational', 'grouped', 0, 4)
+    assert router.owned is None
+    assert router.assign(5500) == 5500
+
+
+def test_workers_share_partitions_once_there_are_more_workers_than_partitions():
+    partitions = [1, 2, 3]
+    assert [partitioning.owned_partitions(partitions, worker, 5) for worker in range(5)] == [[1], [2], [3], [1], [2]]
+    assert partitioning.owned_partitions(partitions, 0, 2) == [1, 3]
+
+
+@pytest.mark.parametrize("test_type", ["simple", "light"])
+@pytest.mark.parametrize("routing", ["grouped", "affinity"])
+def test_hash_partitioned_schemas_are_only_routed_randomly(test_type, routing):
+    assert not partitioning.routable(test_type)
+    with pytest.raises(ValueError):
+        partitioning.Router(test_type, routing, 0, 1)
+
+
+def test_unknown_routing_mode():
+    with pytest.raises(ValueError):
+        partitioning.Router('relational', 'sorted', 0, 1)
@@ -0,0 +1,59 @@
+import pytest
+
+import ratecontrol
+
+
+def test_constant_rate():
+    schedule = ratecontrol.parse_schedule("1000", 10)
+    assert schedule.duration == 10
+    assert schedule.total_rows() == 10000
+    assert schedule.rows_at(2.5) == 2500
+    assert schedule.time_for(2500) == 2.5
+    assert schedule.time_for(10001) is None
+    assert schedule.steps == [(0.0, 10.0)]
+
+
+def test_stepped_rates():
+    schedule = ratecontrol.parse_schedule("1000,2000,4000", 5)
+    assert schedule.duration == 15
+    assert schedule.total_rows() == 35000
+    assert schedule.rows_at(7) == 5000 + 2 * 2000
+    assert schedule.time_for(9000) == 7
+    assert [schedule.target(offset, seconds) for offset, seconds in schedule.steps] == [1000, 2000, 4000]
+
+
+def test_idle_step_is_skipped_over():
+    schedule = ratecontrol.parse_schedule("1000,0,1000", 1)
+    assert schedule.time_for(1000) == 1
+    assert schedule.time_for(1500) == 2.5
+
+
+def test_trace_is_reported_in_steps(tmp_path):
+    trace = tmp_path / "trace.csv"
+    trace.write_text("# second,rows\n0,100\n1,200\n\n2,300\n3,400\n4,500\n")
+    schedule = ratecontrol.parse_schedule(ratecontrol.TRACE_PREFIX + str(trace), 2)
+    assert schedule.duration == 5
+    assert schedule.total_rows() == 1500
+    assert schedule.steps == [(0.0, 2), (2.0, 2), (4.0, 1)]
+    assert [schedule.target(offset, seconds) for offset, seconds in schedule.steps] == [150, 350, 500]
+
+
+@pytest.mark.parametrize("spec", ["0", "0,0", "-5,10", "1000,abc"])
+def test_bad_schedules_are_rejected(spec):
+    with pytest.raises(ValueError):
+        ratecontrol.parse_schedule(spec)
+
+
+def test_steps_must_last():
+    with pytest.raises(ValueError):
+        ratecontrol.parse_schedule("1000", 0)
+
+
+def test_workers_interleave_their_batches():
+    schedule = ratecontrol.parse_schedule("1000", 10)
+    pacers = [ratecontrol.Pacer(schedule, worker, 2, 100, 50.0) for worker in range(2)]
+    # The schedule produces 100 rows every 0.1s, due to worker 0, 1, 0, 1, ...
+    assert [pacers[0].due(sent) for sent in (0, 100, 200)] == pytest.approx([50.1, 50.3, 50.5])
+    assert [pacers[1].due(sent) for sent in (0, 100, 200)] == pytest.approx([50.2, 50.4, 50.6])
+    assert pacers[1].due(4900) == pytest.approx(60.0)
+    assert pacers[1].due(5000) is None
@@ -0,0 +1,78 @@
+import pytest
+
+import metrics
+import resultstore
+
+
+def series(rates):
+    throughput = metrics.ThroughputSeries(0.0)
+    rows = 0
+    for second, rate in enumerate(rates):
+        rows += rate
+        throughput.add(0, second + 1.0, rows)
+    return throughput
+
+
+def latencies(seconds):
+    histogram = metrics.LatencyHistogram()
+    for value in seconds:
+        histogram.record(value)
+    return {"Batch Insert": histogram}
+
+
+def record(store, rates, batch_latencies, schema_type="simple", engine="python"):
+    run = store.start_run(schema_type, engine, {})
+    run.add_point(1, 4, 1000, 100, 1, False, sum(rates), len(rates), len(rates), sum(rates) / float(len(rates)), series(rates), latencies(batch_latencies))
+    return run.run_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    return resultstore.ResultStore(str(tmp_path / "results.db"))
+
+
+def statuses(comparison):
+    return dict((row[-5], row[-1]) for row in comparison)
+
+
+def test_unchanged_run_has_no_regressions(store):
+    store.name_baseline("base", record(store, [1000, 1010, 990, 1000, 1005], [0.001] * 100))
+    comparison = store.compare(record(store, [1002, 998, 1001, 1003, 995], [0.001] * 100), "base")
+    assert statuses(comparison) == {"Rows/sec": "", "Batch Insert p99 (ms)": ""}
+
+
+def test_significant_throughput_drop_is_a_regression(store):
+    store.name_baseline("base", record(store, [1000, 1010, 990, 1000, 1005], [0.001] * 100))
+    comparison = store.compare(record(store, [800, 810, 790, 805, 795], [0.001] * 100), "base")
+    assert statuses(comparison)["Rows/sec"] == "REGRESSION"
+
+
+def test_tail_only_p99_increase_is_a_regression(store):
+    store.name_baseline("base", record(store, [1000] * 5, [0.001] * 1000))
+    comparison = store.compare(record(store, [1000] * 5, [0.001] * 970 + [0.050] * 30), "base")
+    assert statuses(comparison)["Batch Insert p99 (ms)"] == "REGRESSION"
+
+
+def test_p99_moved_by_a_few_samples_is_not_a_regression(store):
+    # The p99 is up well past the threshold, but 2 of 150 latencies above the baseline's is what chance gives
+    store.name_baseline("base", record(store, [1000] * 5, [0.001] * 150))
+    comparison = store.compare(record(store, [1000] * 5, [0.001] * 148 + [0.050] * 2), "base")
+    row = [row for row in comparison if row[-5] == "Batch Insert p99 (ms)"][0]
+    assert row[-2] != "+0.0%" and row[-1] == ""
+
+
+def test_p99s_of_too_few_latencies_are_not_compared(store):
+    store.name_baseline("base", record(store, [1000] * 5, [0.001] * 10))
+    comparison = store.compare(record(store, [1000] * 5, [0.050] * 10), "base")
+    assert "Batch Insert p99 (ms)" not in statuses(comparison)
+
+
+def test_runs_of_another_schema_or_engine_are_not_compared(store):
+    store.name_baseline("base", record(store, [1000] * 5, [0.001] * 10))
+    with pytest.raises(ValueError):
+        store.compare(record(store, [1000] * 5, [0.001] * 10, engine="asyncio"), "base")
+
+
+def test_unknown_baseline(store):
+    with pytest.raises(KeyError):
+        store.compare(record(store, [1000] * 5, [0.001] * 10), "missing")
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+pytest.importorskip("prettytable")
+
+import runAllLoadsParallel
+
+
+def write_data(tmp_path, records, header=0, trailing_newline=True):
+    lines = ["header {}".format(line) for line in range(header)] + ["{},plate{},{}".format(record, record, "x" * (record % 7)) for record in range(records)]
+    path = tmp_path / "data.csv"
+    path.write_bytes(("\n".join(lines) + ("\n" if trailing_newline else "")).encode("ascii"))
+    return str(path)
+
+
+def chunk_records(path, chunks):
+    with open(path, "rb") as data:
+        content = data.read()
+    return [content[start:end] for start, end, first_record, records in chunks]
+
+
+def test_chunks_cover_the_file_on_record_boundaries(tmp_path):
+    path = write_data(tmp_path, 1000)
+    chunks = runAllLoadsParallel.split_chunks(path, 1024)
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0 and chunks[-1][1] == os.path.getsize(path)
+    for (start, end, first_record, records), (next_start, _, next_first_record, _) in zip(chunks, chunks[1:]):
+        assert end == next_start
+        assert next_first_record == first_record + records
+    pieces = chunk_records(path, chunks)
+    assert all(piece.endswith(b"\n") for piece in pieces)
+    assert [piece.count(b"\n") for piece in pieces] == [chunk[3] for chunk in chunks]
+    assert sum(chunk[3] for chunk in chunks) == 1000
+
+
+def test_skipped_header_records_are_left_out(tmp_path):
+    path = write_data(tmp_path, 100, header=2)
+    chunks = runAllLoadsParallel.split_chunks(path, 256, skip=2)
+    assert chunks[0][2] == 2
+    assert chunk_records(path, chunks)[0].startswith(b"0,plate0,")
+    assert sum(chunk[3] for chunk in chunks) == 100
+
+
+def test_last_record_without_a_newline_is_counted(tmp_path):
+    path = write_data(tmp_path, 50, trailing_newline=False)
+    chunks = runAllLoadsParallel.split_chunks(path, 128)
+    assert chunks[-1][1] == os.path.getsize(path)
+    assert sum(chunk[3] for chunk in chunks) == 50
+
+
+def test_small_and_empty_files_are_one_chunk(tmp_path):
+    path = write_data(tmp_path, 10)
+    assert runAllLoadsParallel.split_chunks(path, 1 << 20) == [(0, os.path.getsize(path), 0, 10)]
+    empty = tmp_path / "empty.csv"
+    empty.write_bytes(b"")
+    assert runAllLoadsParallel.split_chunks(str(empty), 1024, skip=1) == [(0, 0, 1, 0)]
+
+
+def test_chunk_files_hold_their_own_records(tmp_path):
+    path = write_data(tmp_path, 300, header=1)
+    control = tmp_path / "data.ctl"
+    control.write_text("OPTIONS (SKIP=1)\nLOAD DATA\nINFILE 'data.csv'\nINTO TABLE t FIELDS TERMINATED BY ','\n(a, b, c)\n")
+    chunk_directory = tmp_path / "chunks"
+    chunk_directory.mkdir()
+    jobs = runAllLoadsParallel.plan_jobs([str(control)], str(tmp_path), 512, str(chunk_directory))
+    assert len(jobs) > 1
+    loaded = b"".join(open(job.chunk_file, "rb").read() for job in sorted(jobs, key=lambda job: job.first_record))
+    with open(path, "rb") as data:
+        assert loaded == data.read().split(b"\n", 1)[1]
+
+
+def test_chunks_of_a_control_file_log_apart(tmp_path):
+    path = write_data(tmp_path, 300)
+    control = tmp_path / "data.ctl"
+    control.write_text("LOAD DATA\nINFILE 'data.csv'\nINTO TABLE t FIELDS TERMINATED BY ','\n(a, b, c)\n")
+    chunk_directory = tmp_path / "chunks"
+    chunk_directory.mkdir()
+    jobs = runAllLoadsParallel.plan_jobs([str(control)], str(tmp_path), 512, str(chunk_directory))
+    commands = [job.command("sqlldr", "user", "password", "db") for job in jobs]
+    logs = [command.split(" log=")[1].split()[0] for command in commands]
+    bads = [command.split(" bad=")[1].split()[0] for command in commands]
+    assert len(set(logs)) == len(set(bads)) == len(jobs)
+    assert all(os.path.dirname(log) == str(tmp_path) for log in logs + bads)
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+@pytest.mark.parametrize("script", ["runtests.py", "resultstore.py", "distributed.py", "asyncingest.py"])
+def test_scripts_compile(script):
+    # The asyncio engine and the harness that runs it must parse on every python 3 the engine targets
+    with open(os.path.join(ROOT, script)) as source:
+        compile(source.read(), script, "exec")
+
+
+def test_runtests_imports():
+    pytest.importorskip("prettytable")
+    pytest.importorskip("tqdm")
+    import runtests
+    assert "async_flag" in runtests.datagen_run_command and "async_flag" in runtests.javatest_run_command
@@ -0,0 +1,52 @@
+import sweep
+
+
+def surface(point):
+    # Throughput rising to a peak at batch size 500 and 8 threads, and falling away after it
+    batch_penalty = abs(point["Batch Size"] - 500) / 100.0
+    thread_penalty = abs(point["Thread Count"] - 8)
+    return 100000.0 - 5000 * batch_penalty - 3000 * thread_penalty
+
+
+def test_adaptive_sweep_finds_the_peak_measuring_fewer_points_than_the_grid():
+    measured = []
+
+    def measure(point):
+        measured.append((point["Batch Size"], point["Thread Count"]))
+        return surface(point)
+
+    batch_sizes = [50, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 2000]
+    thread_counts = [1, 2, 4, 6, 8, 10, 12, 16, 24, 32]
+    adaptive = sweep.AdaptiveSweep([("Batch Size", batch_sizes), ("Thread Count", thread_counts)], measure)
+    best, rate = adaptive.run()
+    assert best == {"Batch Size": 500, "Thread Count": 8}
+    assert rate == 100000.0
+    assert len(measured) == len(set(measured))
+    assert len(measured) < len(batch_sizes) * len(thread_counts)
+
+
+def test_numeric_values_are_walked_in_order_and_others_as_given():
+    assert sweep.sort_values(["100", "20", "3"]) == ["3", "20", "100"]
+    assert sweep.sort_values(["pooled", "dedicated"]) == ["pooled", "dedicated"]
+
+
+def test_knees_report_the_smallest_value_near_the_peak():
+    adaptive = sweep.AdaptiveSweep([("Thread Count", [1, 2, 4, 8, 16])], lambda point: min(point["Thread Count"], 4) * 1000.0, knee=0.95)
+    best, rate = adaptive.run()
+    assert rate == 4000.0
+    name, measured, best_value, knee_value, knee_rate = adaptive.knees()[0]
+    assert (name, knee_value, knee_rate) == ("Thread Count", 4, "4,000")
+
+
+def test_convergence_waits_for_a_tight_interval():
+    class Series(object):
+        def __init__(self, rates):
+            self.rates = rates
+
+        def aggregate_rates(self):
+            return self.rates
+
+    check = sweep.ConvergenceCheck(tolerance=0.05, minimum_intervals=5)
+    assert not check(Series([0, 1000, 1000, 1000, 1000]))
+    assert check(Series([0, 1000, 1001, 999, 1000, 1000]))
+    assert not check(Series([0, 500, 1500, 500, 1500, 500]))
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+import ingestengine
+import tablereset
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "ingest.db")
+    connection = ingestengine.connect("x", "x", ingestengine.SQLITE_PREFIX + path)
+    connection.execute("INSERT INTO SIMPLETABLE VALUES (1, 2, 3, 4, 5, '2024-01-01 00:00:00')")
+    connection.execute("INSERT INTO INSERTABLE VALUES (1, 2, 3, 4, 5, 6, '2024-01-01 00:00:00')")
+    connection.commit()
+    connection.close()
+    return path
+
+
+def count(path, table):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM {}".format(table)).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_reset_empties_the_tables(database):
+    table_reset = tablereset.TableReset("x", "x", ingestengine.SQLITE_PREFIX + database, admin=("x", "x", ingestengine.SQLITE_PREFIX + database))
+    try:
+        assert table_reset.tables == tablereset.RESET_TABLES
+        table_reset.reset()
+    finally:
+        table_reset.close()
+    assert count(database, "SIMPLETABLE") == 0
+    assert count(database, "INSERTABLE") == 0
+
+
+def test_tables_missing_from_the_schema_are_left_out(database):
+    table_reset = tablereset.TableReset("x", "x", ingestengine.SQLITE_PREFIX + database, tables=["SIMPLETABLE", "ANPR_COLLECTION_V2"])
+    try:
+        assert table_reset.tables == ["SIMPLETABLE"]
+        assert len(table_reset.connections) == 1
+        table_reset.reset()
+    finally:
+        table_reset.close()
+    assert count(database, "SIMPLETABLE") == 0
+    assert count(database, "INSERTABLE") == 1
+
+
+def test_nothing_to_reset(database):
+    table_reset = tablereset.TableReset("x", "x", ingestengine.SQLITE_PREFIX + database, tables=["ANPR_COLLECTION_V2"])
+    try:
+        assert table_reset.tables == []
+        table_reset.reset()
+    finally:
+        table_reset.close()
+    assert count(database, "SIMPLETABLE") == 1
+
+
+@pytest.mark.parametrize("credentials", ["/tiger@db", "scott/tiger", "@db"])
+def test_malformed_credentials_are_rejected(credentials):
+    with pytest.raises(ValueError):
+        tablereset.parse_credentials(credentials)
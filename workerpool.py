@@ -0,0 +1,165 @@
+from __future__ import print_function
+
+import ctypes
+import logging
+import multiprocessing
+import xml.etree.ElementTree as ET
+from functools import partial
+
+import connectionpool
+import ingestengine
+import metrics
+
+# Worker processes started once for a whole run (runtests.py -wp/--workerpool) instead of once per test point.
+# Each keeps its connections (or session pool), compiled numpy generators and everything it has imported from
+# point to point, so only the first point pays for them. The coordinator talks to each process over a local
+# pipe : a point is a dict of run_process's arguments, answered with a dict reporting the process's outcome. Rows,
+# batches, times and latencies come back through counters and histograms shared for the life of the pool,
+# cleared before every point, so run_engine reads them exactly as it does for processes of its own
+
+
+class PointHandle(object):
+    # One process's share of a point, standing in for the multiprocessing.Process that run_engine waits on
+
+    def __init__(self, pid, pipe):
+        self.pid = pid
+        self.pipe = pipe
+        self.reply = None
+
+    def join(self, timeout=None):
+        if self.reply is None and self.pipe.poll(timeout):
+            try:
+                self.reply = self.pipe.recv()
+            except EOFError:
+                self.reply = {"error": "worker process exited"}
+
+    def is_alive(self):
+        return self.reply is None
+
+    @property
+    def exitcode(self):
+        if self.reply is None:
+            return None
+        return 1 if self.reply.get("error") else 0
+
+
+class WarmProcess(object):
+    # The state one pool process keeps between points
+
+    def __init__(self, process, counters, histograms, stop, go):
+        self.process = process
+        self.counters = counters
+        self.histograms = histograms
+        self.stop = stop
+        self.go = go
+        self.connections = {}
+        self.generators = {}
+
+    def connection_source(self, username, password, connect_string, connection_mode, pool_size, async_commit):
+        # Async commit is set on a session when it connects, so sessions with and without it are kept apart
+        key = (username, password, connect_string, connection_mode, pool_size, async_commit)
+        if key not in self.connections:
+            if connection_mode == 'dedicated':
+                self.connections[key] = connectionpool.WarmConnections(partial(ingestengine.connect, username, password, connect_string))
+            else:
+                self.connections[key] = ingestengine.connection_source(username, password, connect_string, connection_mode, pool_size)
+        return self.connections[key]
+
+    def table_generator(self, config):
+        if config is None:
+            return None
+        if config not in self.generators:
+            self.generators[config] = ingestengine.compile_generator(ET.fromstring(config))
+        return self.generators[config]
+
+    def run_point(self, point):
+        counters = ingestengine.SharedCounters(point["worker_count"], self.counters)
+        histograms = ingestengine.SharedHistograms(point["worker_count"], self.histograms)
+        connections = self.connection_source(point["username"], point["password"], point["connect_string"], point["connection_mode"], point["pool_size"], point["async_commit"])
+        ingestengine.run_process(point["username"], point["password"], point["connect_string"], point["test_type"], self.process, point["row_count"], point["batch_size"], point["commit_size"], point["thread_count"],
+                                 point["async_commit"], point["image_multiplier"], counters, histograms, self.stop, self.table_generator(point["config"]), point["dataset"],
+                                 point["connection_mode"], point["pool_size"], False, point["lob_mode"], point["lob_chunk_size"], key_offset=point["key_offset"], go=self.go,
+                                 document_encoding=point["document_encoding"], routing=point["routing"], worker_count=point["worker_count"], connections=connections,
+                                 schedule=point["schedule"])
+
+    def close(self):
+        for connections in self.connections.values():
+            connections.close()
+
+
+def serve(process, pipe, counters, histograms, stop, go):
+    warm = WarmProcess(process, counters, histograms, stop, go)
+    try:
+        while True:
+            try:
+                message = pipe.recv()
+            except EOFError:
+                return
+            if message["command"] == "close":
+                return
+            try:
+                warm.run_point(message["point"])
+                pipe.send({"process": process, "error": None})
+            except Exception as e:
+                logging.exception("Worker process {} failed".format(process))
+                pipe.send({"process": process, "error": "{}: {}".format(type(e).__name__, e)})
+    finally:
+        warm.close()
+
+
+class WorkerPool(object):
+    # processes worker processes with room for up to max_threads threads each
+
+    def __init__(self, processes, max_threads):
+        self.processes = processes
+        self.max_threads = max_threads
+        workers = processes * max_threads
+        self.counters = multiprocessing.RawArray('d', workers * len(ingestengine.COUNTERS))
+        self.histograms = multiprocessing.RawArray(ctypes.c_int64, workers * len(ingestengine.LATENCIES) * metrics.BUCKET_COUNT)
+        self.stop = multiprocessing.Event()
+        self.go = multiprocessing.Event()
+        self.pipes = []
+        self.workers = []
+        for process in range(processes):
+            pipe, worker_pipe = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=serve, args=(process, worker_pipe, self.counters, self.histograms, self.stop, self.go))
+            worker.daemon = True
+            worker.start()
+            self.pipes.append(pipe)
+            self.workers.append(worker)
+        logging.debug("Worker pool of {} processes started".format(processes))
+
+    def prepare(self, processes, thread_count):
+        # Cleared shared state for a point, returned as run_engine's counters, histograms, stop and go
+        if processes != self.processes or thread_count > self.max_threads:
+            raise ValueError("The worker pool runs {} processes of up to {} threads, not {} of {}".format(self.processes, self.max_threads, processes, thread_count))
+        ctypes.memset(self.counters, 0, ctypes.sizeof(self.counters))
+        ctypes.memset(self.histograms, 0, ctypes.sizeof(self.histograms))
+        self.stop.clear()
+        self.go.clear()
+        workers = processes * thread_count
+        return ingestengine.SharedCounters(workers, self.counters), ingestengine.SharedHistograms(workers, self.histograms), self.stop, self.go
+
+    def run_point(self, point):
+        # point holds run_process's arguments, with config the numpy generator's config. It is sent as text and
+        # compiled by the processes themselves, once per config
+        if point["config"] is not None:
+            point = dict(point, config=ET.tostring(point["config"], encoding="UTF-8").decode("utf-8"))
+        handles = []
+        for pipe, worker in zip(self.pipes, self.workers):
+            if not worker.is_alive():
+                raise RuntimeError("Worker process {} has exited".format(worker.pid))
+            pipe.send({"command": "point", "point": point})
+            handles.append(PointHandle(worker.pid, pipe))
+        return handles
+
+    def close(self):
+        for pipe, worker in zip(self.pipes, self.workers):
+            if worker.is_alive():
+                try:
+                    pipe.send({"command": "close"})
+                except (IOError, OSError):
+                    pass
+        for pipe, worker in zip(self.pipes, self.workers):
+            worker.join()
+            pipe.close()